@@ -0,0 +1,119 @@
+# benchmarks/bench_fast_path.py
+"""
+CPU cost per webhook update of the fast path in bot/fast_path.py against
+the regular PTB route (Update.de_json, then Application.process_update),
+for menu button presses.
+
+Two steps are timed for each route, in CPU time of this process:
+- parsing: the request body to what goes on the update queue
+- processing: that item to the finished Bot API calls
+
+Telegram is simulated with a zero-latency fake (see
+bench_webhook_concurrency.py), so only our own work is measured.
+
+Run from the project root (works on a throwaway copy, data/books.db is only
+read):
+    python benchmarks/bench_fast_path.py --updates 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_webhook_concurrency import make_update, simulate_telegram
+
+CALLBACKS = ["menu_main", "menu_category", "menu_author", "menu_about", "menu_popular"]
+
+
+def cpu_per_update(fn, items):
+    start = time.process_time()
+    for item in items:
+        fn(item)
+    return (time.process_time() - start) / len(items) * 1_000_000
+
+
+async def cpu_per_update_async(fn, items):
+    start = time.process_time()
+    for item in items:
+        await fn(item)
+    return (time.process_time() - start) / len(items) * 1_000_000
+
+
+async def bench(updates):
+    from telegram import Update
+
+    from bot import fast_path
+    from bot.bot_app import create_application
+
+    telegram_app = create_application()
+    await telegram_app.initialize()
+    bot = telegram_app.bot
+
+    bodies = []
+    for i in range(updates):
+        update = make_update(i)
+        update["callback_query"]["data"] = CALLBACKS[i % len(CALLBACKS)]
+        bodies.append(json.dumps(update).encode())
+
+    def ptb_parse(body):
+        return Update.de_json(json.loads(body), bot)
+
+    def fast_parse(body):
+        return fast_path.match(fast_path.loads(body))
+
+    # Warm up caches and connections on both routes before timing
+    for body in bodies[:len(CALLBACKS)]:
+        await telegram_app.process_update(ptb_parse(body))
+        await fast_path.process(telegram_app, fast_parse(body))
+
+    ptb_items = [ptb_parse(body) for body in bodies]
+    fast_items = [fast_parse(body) for body in bodies]
+    assert all(fast_items), "every benchmark update should take the fast path"
+
+    print(f"{'':12} {'PTB':>10} {'fast path':>10}")
+    ptb = cpu_per_update(ptb_parse, bodies)
+    fast = cpu_per_update(fast_parse, bodies)
+    print(f"{'parsing':12} {ptb:7.1f} µs {fast:7.1f} µs")
+    ptb_total, fast_total = ptb, fast
+
+    ptb = await cpu_per_update_async(telegram_app.process_update, ptb_items)
+    fast = await cpu_per_update_async(lambda item: fast_path.process(telegram_app, item),
+                                      fast_items)
+    print(f"{'processing':12} {ptb:7.1f} µs {fast:7.1f} µs")
+    ptb_total += ptb
+    fast_total += fast
+    print(f"{'total':12} {ptb_total:7.1f} µs {fast_total:7.1f} µs "
+          f"({ptb_total / fast_total:.1f}x)")
+    print(f"JSON decoder: {'orjson' if fast_path.orjson is not None else 'json'}")
+
+    await telegram_app.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--db", default="data/books.db")
+    parser.add_argument("--updates", type=int, default=2000)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix="fast_path_bench_")
+    db_path = os.path.join(tmp_dir, "books.db")
+    with sqlite3.connect(args.db) as src, sqlite3.connect(db_path) as dst:
+        src.backup(dst)
+    os.environ["BOOKS_DB_PATH"] = db_path
+    os.environ["CATALOG_SNAPSHOT_PATH"] = os.path.join(tmp_dir, "catalog.snap")
+    os.environ.setdefault("BOT_TOKEN", "123456:bench")
+
+    from database.models import create_tables
+    create_tables()
+    simulate_telegram(0)
+    asyncio.run(bench(args.updates))
+
+
+if __name__ == "__main__":
+    main()
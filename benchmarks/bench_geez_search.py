@@ -0,0 +1,131 @@
+# benchmarks/bench_geez_search.py
+"""
+Benchmark Amharic search on a synthetic catalog: the old approach (LIKE
+'%kw%' scans, repeated for every homophone spelling the user tries) versus
+one lookup in the Ge'ez-folded FTS index.
+
+Run from the project root (uses a throwaway database, never data/books.db):
+    python benchmarks/bench_geez_search.py --books 20000
+"""
+import argparse
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Letter families that users type interchangeably
+HOMOPHONES = [["ሀ", "ሐ", "ኀ"], ["ሰ", "ሠ"], ["አ", "ዐ"], ["ጸ", "ፀ"]]
+PLAIN_SYLLABLES = list("በለመረቀተነከወዘየደገጠፈቸጀሸ") + ["ሉ", "ሚ", "ራ", "ቤ", "ት", "ዎ", "ና"]
+
+
+def random_word(rng):
+    word = []
+    for _ in range(rng.randint(2, 5)):
+        if rng.random() < 0.3:
+            word.append(rng.choice(rng.choice(HOMOPHONES)))
+        else:
+            word.append(rng.choice(PLAIN_SYLLABLES))
+    return "".join(word)
+
+
+def spelling_variants(word):
+    """Every spelling of `word` a user might try (one per homophone choice)."""
+    options = []
+    for ch in word:
+        family = next((f for f in HOMOPHONES if ch in f), None)
+        options.append(family or [ch])
+    return ["".join(p) for p in itertools.product(*options)]
+
+
+def build_catalog(n_books, rng):
+    from database.connection import write_transaction
+    from database.db import add_search_terms, search_keys
+    vocabulary = [random_word(rng) for _ in range(2000)]
+    rows = []
+    for _ in range(n_books):
+        title = " ".join(rng.choice(vocabulary) for _ in range(rng.randint(2, 5)))
+        author = " ".join(rng.choice(vocabulary) for _ in range(2))
+        rows.append((title, "", author, "Other", "Amharic",
+                     *search_keys(title, author, "Other", "")))
+    with write_transaction() as conn:
+        conn.executemany('''
+            INSERT INTO books (title, caption, author, category, language,
+                               title_key, author_key, category_key, caption_key)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+        add_search_terms(conn, (key for row in rows for key in row[5:]))
+    return vocabulary
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--books", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix="geez_bench_")
+    os.environ["BOOKS_DB_PATH"] = os.path.join(tmp_dir, "books.db")
+
+    from database.models import create_tables
+    from database.connection import get_read_conn
+    from database.db import search_books_fts
+
+    rng = random.Random(args.seed)
+    create_tables()
+    start = time.perf_counter()
+    vocabulary = build_catalog(args.books, rng)
+    print(f"Built {args.books} synthetic Amharic books in {time.perf_counter() - start:.2f}s")
+
+    # Pick query words that actually contain homophone letters
+    candidates = [w for w in vocabulary if len(spelling_variants(w)) > 1]
+    queries = rng.sample(candidates, min(args.queries, len(candidates)))
+    conn = get_read_conn()
+
+    def like_all_spellings(word):
+        found = set()
+        for variant in spelling_variants(word):
+            pattern = f"%{variant}%"
+            found.update(r[0] for r in conn.execute(
+                "SELECT id FROM books WHERE (title LIKE ? OR author LIKE ?) AND language = ?",
+                (pattern, pattern, "Amharic")))
+        return found
+
+    def folded_lookup(word):
+        # Type the word with a random spelling; the fold makes it irrelevant
+        typed = rng.choice(spelling_variants(word))
+        return {r[0] for r in search_books_fts(typed, "Amharic", limit=args.books)}
+
+    like_total = fts_total = 0.0
+    spellings = inner_only = 0
+    for word in queries:
+        spellings += len(spelling_variants(word))
+        like_time, like_ids = timed(lambda: like_all_spellings(word), 1)
+        fts_time, fts_ids = timed(lambda: folded_lookup(word), 5)
+        like_total += like_time
+        fts_total += fts_time
+        # LIKE matches anywhere inside a word; the index matches word
+        # prefixes plus every word containing the query
+        inner_only += len(like_ids - fts_ids)
+
+    n = len(queries)
+    print(f"Queries: {n}, average spellings per word: {spellings / n:.1f}")
+    print(f"LIKE scan x every spelling : {like_total / n * 1000:8.2f} ms/query")
+    print(f"Folded FTS index lookup    : {fts_total / n * 1000:8.2f} ms/query")
+    print(f"Speed-up                   : {like_total / fts_total:8.1f}x")
+    print(f"Rows only LIKE matched     : {inner_only}")
+
+
+if __name__ == "__main__":
+    main()
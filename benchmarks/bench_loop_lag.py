@@ -0,0 +1,78 @@
+# benchmarks/bench_loop_lag.py
+"""
+Event-loop lag while the database is busy: slow queries called directly from
+a coroutine (the old handlers) versus the same queries awaited through
+database.aio.run_db.
+
+Each "slow query" is a real SQLite statement that burns CPU inside
+sqlite3_step (a recursive CTE), standing in for a heavy search or a commit
+waiting on the write lock. While they run, a LoopLagMonitor probes the loop.
+
+Run from the project root (uses a throwaway database, never data/books.db):
+    python benchmarks/bench_loop_lag.py --queries 40 --rows 300000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SLOW_QUERY = '''
+    WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < ?)
+    SELECT COUNT(*) FROM c
+'''
+
+
+def slow_query(rows):
+    from database.connection import get_read_conn
+    return get_read_conn().execute(SLOW_QUERY, (rows,)).fetchone()[0]
+
+
+async def handler_blocking(rows):
+    # What the handlers used to do: call sqlite3 straight from the coroutine
+    return slow_query(rows)
+
+
+async def handler_async(rows):
+    from database.aio import run_db
+    return await run_db(slow_query, rows)
+
+
+async def run_case(handler, queries, rows):
+    from database.aio import LoopLagMonitor
+    monitor = LoopLagMonitor(interval=0.01, samples=100000)
+    monitor.start()
+    await asyncio.sleep(0.05)
+    started = time.perf_counter()
+    await asyncio.gather(*(handler(rows) for _ in range(queries)))
+    elapsed = time.perf_counter() - started
+    await asyncio.sleep(0.05)
+    monitor.stop()
+    return elapsed, monitor.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=40)
+    parser.add_argument("--rows", type=int, default=300000)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ["BOOKS_DB_PATH"] = os.path.join(tmp, "bench.db")
+    from database.models import create_tables
+    create_tables()
+
+    print(f"{args.queries} concurrent slow queries ({args.rows} CTE rows each)\n")
+    print(f"{'':24}{'wall':>9}{'lag avg':>10}{'lag p99':>10}{'lag max':>10}")
+    for name, handler in (("direct sqlite3 call", handler_blocking),
+                          ("await run_db(...)", handler_async)):
+        elapsed, lag = asyncio.run(run_case(handler, args.queries, args.rows))
+        print(f"{name:24}{elapsed * 1000:7.0f}ms{lag['avg_ms']:8.1f}ms"
+              f"{lag['p99_ms']:8.1f}ms{lag['max_ms']:8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+# benchmarks/bench_multiworker.py
+"""
+Load test of the Flask webhook under gunicorn (gunicorn.conf.py) with 1, 2,
+4, ... worker processes, up to the number of CPU cores.
+
+For each worker count a real gunicorn server is started on a free local
+port. --clients concurrent senders then deliver --updates button presses,
+and we time how long it takes until the bot has made every resulting Bot
+API call. The Bot API is a local fake (fake_bot_api.py) running in this
+process. Throughput should grow with the workers until the cores (or this
+load generator) run out.
+
+Run from the project root with gunicorn installed (works on a throwaway
+copy, data/books.db is only read):
+    python benchmarks/bench_multiworker.py --updates 3000 --clients 64
+"""
+import argparse
+import asyncio
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_webhook_concurrency import make_update, percentile
+from benchmarks.fake_bot_api import FakeBotAPI
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CALLBACKS = ["menu_main", "menu_category", "menu_author", "menu_about"]
+CALLS_PER_UPDATE = 2    # answerCallbackQuery + editMessageText
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_until_up(url, timeout=60):
+    from aiohttp import ClientError, ClientSession
+    deadline = time.perf_counter() + timeout
+    async with ClientSession() as session:
+        while time.perf_counter() < deadline:
+            try:
+                async with session.get(url) as response:
+                    if response.status == 200:
+                        return
+            except ClientError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up")
+
+
+async def deliver(url, first_id, updates, clients):
+    from aiohttp import ClientSession, TCPConnector
+    pending = iter(range(first_id, first_id + updates))
+    responses = []
+    async with ClientSession(connector=TCPConnector(limit=clients)) as session:
+        async def client():
+            for update_id in pending:
+                update = make_update(update_id)
+                update["callback_query"]["data"] = CALLBACKS[update_id % len(CALLBACKS)]
+                sent = time.perf_counter()
+                async with session.post(url, json=update) as response:
+                    assert response.status == 200, response.status
+                responses.append(time.perf_counter() - sent)
+
+        await asyncio.gather(*(client() for _ in range(clients)))
+    return responses
+
+
+async def bench(workers, args, env, api):
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "bot.webhook_app:app"],
+        cwd=PROJECT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        env=dict(env, WEB_CONCURRENCY=str(workers), WEBHOOK_HOST="127.0.0.1",
+                 WEBHOOK_PORT=str(port)))
+    base = f"http://127.0.0.1:{port}"
+    try:
+        await wait_until_up(f"{base}/")
+        # Let every worker finish its warm-up, then warm the catalog caches
+        await asyncio.sleep(1)
+        first_id = workers * 1_000_000
+        await deliver(f"{base}/webhook", first_id + 500_000, workers * 20, workers * 4)
+        await asyncio.sleep(1)
+
+        start_calls = len(api.calls)
+        target = start_calls + args.updates * CALLS_PER_UPDATE
+        start = time.perf_counter()
+        responses = await deliver(f"{base}/webhook", first_id, args.updates, args.clients)
+        while len(api.calls) < target and time.perf_counter() - start < 120:
+            await asyncio.sleep(0.005)
+        elapsed = time.perf_counter() - start
+        handled = (len(api.calls) - start_calls) / CALLS_PER_UPDATE
+        return handled / elapsed, responses
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--db", default="data/books.db")
+    parser.add_argument("--updates", type=int, default=3000)
+    parser.add_argument("--clients", type=int, default=64, help="concurrent Telegram deliveries")
+    parser.add_argument("--api-latency", type=float, default=0.0)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix="multiworker_bench_")
+    db_path = os.path.join(tmp_dir, "books.db")
+    with sqlite3.connect(args.db) as src, sqlite3.connect(db_path) as dst:
+        src.backup(dst)
+    api = FakeBotAPI(args.api_latency)
+    env = dict(os.environ, BOOKS_DB_PATH=db_path,
+               CATALOG_SNAPSHOT_PATH=os.path.join(tmp_dir, "catalog.snap"),
+               TELEGRAM_API_BASE_URL=api.start_in_thread())
+    env.setdefault("BOT_TOKEN", "1:bench")
+    # Migrate the copy once, before the workers race to do it
+    subprocess.run([sys.executable, "-c", "from database.models import create_tables; "
+                    "create_tables()"], cwd=PROJECT_DIR, env=env, check=True)
+
+    counts = [1]
+    while counts[-1] * 2 <= args.max_workers:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != args.max_workers:
+        counts.append(args.max_workers)
+
+    print(f"{args.updates} button presses, {args.clients} at a time, "
+          f"{os.cpu_count()} CPU cores, {args.api_latency * 1000:.0f} ms per Bot API call")
+    print(f"{'workers':>7} {'handled/s':>10} {'speedup':>8} {'response p50':>13} "
+          f"{'response p99':>13}")
+    baseline = None
+    for workers in counts:
+        rate, responses = asyncio.run(bench(workers, args, env, api))
+        baseline = baseline or rate
+        print(f"{workers:7} {rate:10.1f} {rate / baseline:7.2f}x "
+              f"{percentile(responses, 0.5) * 1000:10.2f} ms "
+              f"{percentile(responses, 0.99) * 1000:10.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# benchmarks/bench_snapshot.py
+"""
+Benchmark catalog reads from the mmap snapshot against the database queries
+they replace (menus, book lists and book lookups) for the first calls a
+freshly started worker makes, and the steady-state calls that the catalog
+cache answers once it is warm (bot/handlers.py reads the snapshot only on
+a cache miss).
+
+Run from the project root (works on a throwaway copy, data/books.db is only
+read):
+    python benchmarks/bench_snapshot.py --db data/books.db
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def timed(fn, calls):
+    start = time.perf_counter()
+    for args in calls:
+        fn(*args)
+    return (time.perf_counter() - start) / len(calls) * 1_000_000
+
+
+def timed_cold(fn, calls):
+    """Like timed(), on a new thread, so the database gets a new connection."""
+    result = []
+    thread = threading.Thread(target=lambda: result.append(timed(fn, calls)))
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--db", default="data/books.db")
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--cold-calls", type=int, default=20,
+                        help="calls timed right after a worker starts")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix="snapshot_bench_")
+    db_path = os.path.join(tmp_dir, "books.db")
+    with sqlite3.connect(args.db) as src, sqlite3.connect(db_path) as dst:
+        src.backup(dst)
+    os.environ["BOOKS_DB_PATH"] = db_path
+    os.environ["CATALOG_SNAPSHOT_PATH"] = os.path.join(tmp_dir, "catalog.snap")
+
+    from database import db
+    from database.cache import catalog_cache
+    from database.models import create_tables
+    from database.snapshot import SNAPSHOT_PATH, Snapshot, build_snapshot
+
+    create_tables()
+    start = time.perf_counter()
+    stats = build_snapshot()
+    print(f"Snapshot of {stats['books']} books built in {time.perf_counter() - start:.2f}s "
+          f"({stats['bytes'] / 1024:.0f} KiB)")
+
+    rng = random.Random(args.seed)
+    catalog = db.export_catalog()
+    book_ids = [b[0] for b in catalog["books"]]
+    category_ids = [c[0] for c in catalog["categories"]]
+    languages = ["English", "Amharic"]
+
+    cases = [
+        ("Category menu", [(rng.choice(languages),) for _ in range(args.calls)],
+         db.categories_page, lambda lang: snapshot.facet_page("categories", lang)),
+        ("Author menu", [(rng.choice(languages),) for _ in range(args.calls)],
+         db.authors_page, lambda lang: snapshot.facet_page("authors", lang)),
+        ("Books in category", [(rng.choice(category_ids),) for _ in range(args.calls)],
+         db.books_by_category_page, lambda cid: snapshot.facet_books_page("categories", cid)),
+        ("Book lookup", [(rng.choice(book_ids),) for _ in range(args.calls)],
+         db.get_book_by_id, lambda book_id: snapshot.get_book_by_id(book_id)),
+    ]
+    print(f"{'':18} {'cold database':>14} {'cold snapshot':>14} {'warm database':>14} "
+          f"{'warm cached':>14}")
+    for name, calls, db_fn, snap_fn in cases:
+        cold = calls[:args.cold_calls]
+        cold_db = timed_cold(db_fn, cold)
+        snapshot = Snapshot(SNAPSHOT_PATH)
+        cold_snap = timed(snap_fn, cold)
+        warm_db = timed(db_fn, calls)
+
+        def cached(*call):
+            return catalog_cache.get((name,) + call, lambda: snap_fn(*call))
+
+        timed(cached, calls)
+        warm_cached = timed(cached, calls)
+        print(f"{name:18} {cold_db:11.1f} µs {cold_snap:11.1f} µs {warm_db:11.1f} µs "
+              f"{warm_cached:11.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
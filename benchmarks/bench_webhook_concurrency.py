@@ -0,0 +1,158 @@
+# benchmarks/bench_webhook_concurrency.py
+"""
+Webhook throughput and response time per worker, for the Flask app and the
+aiohttp server in bot/async_webhook_app.py. Both acknowledge an update once
+it is queued (bot/update_queue.py) and process it on a background loop, so
+the response time should stay flat however slow the handlers are.
+
+Telegram is simulated: every Bot API call the handlers make sleeps for
+--api-latency seconds instead of going over the network, which is where a
+real handler spends most of its time.
+
+Run from the project root (works on a throwaway copy, data/books.db is only
+read):
+    python benchmarks/bench_webhook_concurrency.py --updates 300 --clients 50
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CALLBACKS = ["lang_English", "menu_main", "menu_category", "menu_author", "lang_Amharic"]
+
+
+def make_update(update_id):
+    user = {"id": 10_000 + update_id % 500, "is_bot": False, "first_name": "Reader"}
+    chat = {"id": user["id"], "type": "private"}
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id), "chat_instance": "bench", "from": user,
+            "data": CALLBACKS[update_id % len(CALLBACKS)],
+            "message": {"message_id": 1, "date": 0, "chat": chat, "text": "menu"},
+        },
+    }
+
+
+def simulate_telegram(latency):
+    """Replace the Bot API transport with a fixed-latency fake."""
+    from telegram import Bot, User
+
+    async def fake_post(self, endpoint, data=None, *args, **kwargs):
+        await asyncio.sleep(latency)
+        if endpoint in ("sendMessage", "editMessageText"):
+            return {"message_id": 1, "date": 0, "chat": {"id": 1, "type": "private"}, "text": ""}
+        return True
+
+    async def fake_get_me(self, *args, **kwargs):
+        self._bot_user = User(1, "Bench", True, username="bench_bot")
+        return self._bot_user
+
+    Bot._post = fake_post
+    Bot.get_me = fake_get_me
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def wait_processed(dispatcher, target, timeout=120):
+    deadline = time.perf_counter() + timeout
+    while dispatcher.processed < target and time.perf_counter() < deadline:
+        time.sleep(0.005)
+
+
+async def wait_processed_async(dispatcher, target, timeout=120):
+    deadline = time.perf_counter() + timeout
+    while dispatcher.processed < target and time.perf_counter() < deadline:
+        await asyncio.sleep(0.005)
+
+
+def bench_flask(updates):
+    """Sequential deliveries (a WSGI worker serves one request at a time)."""
+    from bot import webhook_app
+    from bot.update_queue import update_dispatcher
+    client = webhook_app.app.test_client()
+    client.post("/webhook", json=make_update(0))    # start the Application outside the timing
+    wait_processed(update_dispatcher, 1)
+    responses = []
+    start = time.perf_counter()
+    for update_id in range(1, updates + 1):
+        sent = time.perf_counter()
+        assert client.post("/webhook", json=make_update(update_id)).status_code == 200
+        responses.append(time.perf_counter() - sent)
+    wait_processed(update_dispatcher, updates + 1)
+    elapsed = time.perf_counter() - start
+    webhook_app._shutdown()
+    return elapsed, responses
+
+
+async def bench_aiohttp(updates, clients, first_id):
+    """`clients` concurrent deliveries of update_ids first_id, first_id + 1, ..."""
+    from aiohttp import ClientSession
+    from aiohttp.test_utils import TestServer
+    from bot.async_webhook_app import create_web_app
+    from bot.update_queue import update_dispatcher
+
+    server = TestServer(create_web_app())
+    await server.start_server()
+    first = update_dispatcher.processed
+    # Fresh ids: the dedup in this process has already seen the Flask run's
+    pending = iter(range(first_id, first_id + updates))
+    responses = []
+    try:
+        async with ClientSession() as session:
+            async def client():
+                for update_id in pending:
+                    sent = time.perf_counter()
+                    async with session.post(server.make_url("/webhook"),
+                                            json=make_update(update_id)) as response:
+                        assert response.status == 200
+                    responses.append(time.perf_counter() - sent)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(client() for _ in range(clients)))
+            await wait_processed_async(update_dispatcher, first + updates)
+            return time.perf_counter() - start, responses
+    finally:
+        await server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--db", default="data/books.db")
+    parser.add_argument("--updates", type=int, default=300)
+    parser.add_argument("--clients", type=int, default=50, help="concurrent Telegram deliveries")
+    parser.add_argument("--api-latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix="webhook_bench_")
+    db_path = os.path.join(tmp_dir, "books.db")
+    with sqlite3.connect(args.db) as src, sqlite3.connect(db_path) as dst:
+        src.backup(dst)
+    os.environ["BOOKS_DB_PATH"] = db_path
+    os.environ["CATALOG_SNAPSHOT_PATH"] = os.path.join(tmp_dir, "catalog.snap")
+    os.environ.setdefault("BOT_TOKEN", "1:bench")
+    simulate_telegram(args.api_latency)
+
+    from utils.config import WEBHOOK_CONCURRENCY
+
+    results = [("Flask, 1 delivery at a time", bench_flask(args.updates)),
+               (f"aiohttp, {args.clients} at a time",
+                asyncio.run(bench_aiohttp(args.updates, args.clients, args.updates + 1)))]
+    print(f"{args.updates} updates, {args.api_latency * 1000:.0f} ms per Bot API call, "
+          f"{WEBHOOK_CONCURRENCY} updates processed at once")
+    print(f"{'':30} {'processed/s':>12} {'response p50':>13} {'response p99':>13}")
+    for name, (elapsed, responses) in results:
+        print(f"{name:30} {args.updates / elapsed:12.1f} "
+              f"{percentile(responses, 0.5) * 1000:10.2f} ms {percentile(responses, 0.99) * 1000:10.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# benchmarks/bench_webhook_reply.py
+"""
+How long a button press waits for its answer, with and without
+WEBHOOK_REPLY_IN_RESPONSE (bot/webhook_reply.py), on the Flask webhook.
+
+The bot talks to a local fake Bot API (fake_bot_api.py) that takes
+--api-latency seconds per call, standing in for the round trip to
+api.telegram.org. For each delivered button press we time how long it takes
+until Telegram has the query.answer(). In the default mode that is the
+moment the fake API receives it. In reply mode it is the moment the
+webhook response carrying it arrives.
+
+Run from the project root (works on a throwaway copy, data/books.db is only
+read):
+    python benchmarks/bench_webhook_reply.py --updates 200 --api-latency 0.1
+"""
+import argparse
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_webhook_concurrency import make_update, percentile, wait_processed
+from benchmarks.fake_bot_api import FakeBotAPI
+
+CALLBACKS = ["menu_main", "menu_category", "menu_author", "menu_about"]
+
+
+def run(updates, api_latency):
+    """One mode, in this process (the mode is fixed at import time)."""
+    api = FakeBotAPI(api_latency)
+    os.environ["TELEGRAM_API_BASE_URL"] = api.start_in_thread()
+
+    from bot import webhook_app
+    from bot.update_queue import update_dispatcher
+
+    client = webhook_app.app.test_client()
+    client.post("/webhook", json=make_update(0))    # start the Application outside the timing
+    wait_processed(update_dispatcher, 1)
+    first_call = len(api.calls)
+
+    sent_at, replied_at = {}, {}
+    for update_id in range(1, updates + 1):
+        update = make_update(update_id)
+        update["callback_query"]["data"] = CALLBACKS[update_id % len(CALLBACKS)]
+        sent_at[update_id] = time.perf_counter()
+        response = client.post("/webhook", json=update)
+        assert response.status_code == 200
+        if response.is_json and response.get_json().get("method") == "answerCallbackQuery":
+            replied_at[update_id] = time.perf_counter()
+        response.close()    # as a WSGI server does once the response is sent
+    in_response = len(replied_at)
+    wait_processed(update_dispatcher, updates + 1)
+    webhook_app._shutdown()
+
+    calls = api.calls[first_call:]
+    for called_at, method, params in calls:
+        if method == "answerCallbackQuery":
+            replied_at.setdefault(int(params["callback_query_id"]), called_at)
+    waits = [replied_at[i] - sent_at[i] for i in sent_at]
+    return {"p50": percentile(waits, 0.5), "p99": percentile(waits, 0.99),
+            "in_response": in_response, "api_calls": len(calls) / updates}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--db", default="data/books.db")
+    parser.add_argument("--updates", type=int, default=200)
+    parser.add_argument("--api-latency", type=float, default=0.1)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run(args.updates, args.api_latency)))
+        return
+
+    tmp_dir = tempfile.mkdtemp(prefix="webhook_reply_bench_")
+    db_path = os.path.join(tmp_dir, "books.db")
+    with sqlite3.connect(args.db) as src, sqlite3.connect(db_path) as dst:
+        src.backup(dst)
+    env = dict(os.environ, BOOKS_DB_PATH=db_path,
+               CATALOG_SNAPSHOT_PATH=os.path.join(tmp_dir, "catalog.snap"))
+    env.setdefault("BOT_TOKEN", "1:bench")
+
+    print(f"{args.updates} button presses, {args.api_latency * 1000:.0f} ms per Bot API call")
+    print(f"{'':22} {'answer p50':>11} {'answer p99':>11} {'in response':>12} "
+          f"{'API calls/update':>17}")
+    for name, reply in [("answered via the API", "0"), ("reply in response", "1")]:
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", "--updates", str(args.updates),
+             "--api-latency", str(args.api_latency)],
+            env=dict(env, WEBHOOK_REPLY_IN_RESPONSE=reply), capture_output=True, text=True,
+            check=True)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{name:22} {result['p50'] * 1000:8.1f} ms {result['p99'] * 1000:8.1f} ms "
+              f"{result['in_response']:12} {result['api_calls']:17.2f}")
+
+
+if __name__ == "__main__":
+    main()
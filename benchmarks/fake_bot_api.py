@@ -0,0 +1,90 @@
+# benchmarks/fake_bot_api.py
+"""
+A local stand-in for api.telegram.org, for testing and benchmarking the
+webhook apps without a real bot.
+
+Every method answers after --latency seconds, with a plausible result (a
+message for send/edit calls, `True` for everything else). Calls are logged,
+and kept in FakeBotAPI.calls when it is used from a script.
+
+Run it, then start the bot against it:
+    python benchmarks/fake_bot_api.py --port 8081
+    TELEGRAM_API_BASE_URL=http://127.0.0.1:8081 python bot/async_webhook_app.py
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+
+from aiohttp import web
+
+MESSAGE_METHODS = {"sendMessage", "editMessageText", "sendDocument", "sendInvoice"}
+
+
+class FakeBotAPI:
+    def __init__(self, latency=0.0, verbose=False):
+        self.latency = latency
+        self.verbose = verbose
+        self.calls = []     # (time.perf_counter(), method, params)
+        self.url = None
+
+    async def handle(self, request):
+        method = request.match_info["method"]
+        if request.content_type == "application/json":
+            params = await request.json()
+        else:
+            params = dict(await request.post())
+        self.calls.append((time.perf_counter(), method, params))
+        if self.verbose:
+            print(method, json.dumps(params, ensure_ascii=False)[:200])
+        await asyncio.sleep(self.latency)
+
+        if method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}
+        elif method in MESSAGE_METHODS:
+            chat_id = int(params.get("chat_id") or 1)
+            result = {"message_id": 1, "date": int(time.time()),
+                      "chat": {"id": chat_id, "type": "private"}, "text": params.get("text", "")}
+        elif method == "copyMessage":
+            result = {"message_id": 1}
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    def app(self):
+        app = web.Application()
+        app.router.add_route("*", "/bot{token}/{method}", self.handle)
+        return app
+
+    def start_in_thread(self, host="127.0.0.1", port=0):
+        """Serve on a background thread; returns the base URL for TELEGRAM_API_BASE_URL."""
+        started = threading.Event()
+
+        async def serve():
+            runner = web.AppRunner(self.app())
+            await runner.setup()
+            site = web.TCPSite(runner, host, port)
+            await site.start()
+            bound_host, bound_port = runner.addresses[0][:2]
+            self.url = f"http://{bound_host}:{bound_port}"
+            started.set()
+            await asyncio.Event().wait()
+
+        threading.Thread(target=lambda: asyncio.run(serve()), name="fake-bot-api",
+                         daemon=True).start()
+        started.wait()
+        return self.url
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+    web.run_app(FakeBotAPI(args.latency, verbose=True).app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+# benchmarks/profile_cold_start.py
+"""
+Startup profile of the Flask webhook (what PythonAnywhere runs after a
+reload): where import time goes, and how long the first update waits.
+
+1. `python -X importtime -c "import bot.webhook_app"`, summarised: the
+   slowest imports and the project's own modules.
+2. A fresh worker process, timed from launch: import of bot.webhook_app,
+   then the first update, delivered --first-update-after seconds after the
+   import (Telegram resends what arrived during the reload), until it has
+   been handled. This runs once with WEBHOOK_WARMUP=0 and once with
+   WEBHOOK_WARMUP=1.
+
+The bot talks to a local fake Bot API (fake_bot_api.py) with --api-latency
+seconds per call.
+
+Run from the project root (works on a throwaway copy, data/books.db is only
+read):
+    python benchmarks/profile_cold_start.py --api-latency 0.1
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PROJECT_PACKAGES = ("bot", "database", "utils")
+
+
+def import_profile(env, top):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import bot.webhook_app"],
+                            env=dict(env, WEBHOOK_WARMUP="0"), capture_output=True, text=True,
+                            check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)", line)
+        if match:
+            rows.append((int(match[1]), int(match[2]), len(match[3]) // 2, match[4]))
+    total = next(cumulative for _, cumulative, depth, name in rows if name == "bot.webhook_app")
+    print(f"import bot.webhook_app: {total / 1000:.0f} ms")
+    print(f"  slowest imports (cumulative):")
+    top_level = [row for row in rows if row[2] <= 1 and row[3] != "bot.webhook_app"]
+    for _, cumulative, _, name in sorted(top_level, key=lambda row: -row[1])[:top]:
+        print(f"    {cumulative / 1000:7.1f} ms  {name}")
+    own = [row for row in rows if row[3].split(".")[0] in PROJECT_PACKAGES]
+    print(f"  project modules (self): {sum(row[0] for row in own) / 1000:.1f} ms in {len(own)} modules")
+    for self_us, _, _, name in sorted(own, key=lambda row: -row[0])[:top]:
+        print(f"    {self_us / 1000:7.1f} ms  {name}")
+
+
+def worker(first_update_after):
+    """Child: one cold start, printed as JSON (seconds since the Unix epoch)."""
+    from benchmarks.bench_webhook_concurrency import make_update
+
+    spans = {"import_start": time.time()}
+    from bot import webhook_app
+    from bot.update_queue import update_dispatcher
+    spans["imported"] = time.time()
+
+    time.sleep(first_update_after)
+    update = make_update(1)
+    update["callback_query"]["data"] = "menu_category"
+    spans["delivered"] = time.time()
+    assert webhook_app.app.test_client().post("/webhook", json=update).status_code == 200
+    spans["answered"] = time.time()
+    while update_dispatcher.processed < 1:
+        time.sleep(0.001)
+    spans["handled"] = time.time()
+    print(json.dumps(spans))
+
+
+def cold_start(env, warmup, first_update_after):
+    launched = time.time()
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--worker",
+         "--first-update-after", str(first_update_after)],
+        env=dict(env, WEBHOOK_WARMUP=warmup), capture_output=True, text=True, check=True)
+    spans = json.loads(result.stdout.strip().splitlines()[-1])
+    return {
+        "interpreter": spans["import_start"] - launched,
+        "import": spans["imported"] - spans["import_start"],
+        "response": spans["answered"] - spans["delivered"],
+        "handled": spans["handled"] - spans["delivered"],
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--db", default="data/books.db")
+    parser.add_argument("--api-latency", type=float, default=0.1)
+    parser.add_argument("--first-update-after", type=float, default=1.0)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.first_update_after)
+        return
+
+    tmp_dir = tempfile.mkdtemp(prefix="cold_start_bench_")
+    db_path = os.path.join(tmp_dir, "books.db")
+    with sqlite3.connect(args.db) as src, sqlite3.connect(db_path) as dst:
+        src.backup(dst)
+    port = free_port()
+    api = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(__file__), "fake_bot_api.py"),
+                            "--port", str(port), "--latency", str(args.api_latency)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    env = dict(os.environ, BOOKS_DB_PATH=db_path,
+               CATALOG_SNAPSHOT_PATH=os.path.join(tmp_dir, "catalog.snap"),
+               TELEGRAM_API_BASE_URL=f"http://127.0.0.1:{port}")
+    env.setdefault("BOT_TOKEN", "1:bench")
+    try:
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                break
+            except OSError:
+                time.sleep(0.05)
+        # Migrate the copy once, so no run pays for that
+        subprocess.run([sys.executable, "-c", "from database.models import create_tables; "
+                        "create_tables()"], env=env, check=True)
+
+        import_profile(env, args.top)
+        print()
+        print(f"First update {args.first_update_after:.1f}s after import, "
+              f"{args.api_latency * 1000:.0f} ms per Bot API call (best of {args.runs})")
+        print(f"{'':12} {'interpreter':>12} {'import':>10} {'response':>10} {'handled':>10}")
+        for name, warmup in [("no warm-up", "0"), ("warm-up", "1")]:
+            runs = [cold_start(env, warmup, args.first_update_after) for _ in range(args.runs)]
+            best = {key: min(run[key] for run in runs) for key in runs[0]}
+            print(f"{name:12} {best['interpreter'] * 1000:9.0f} ms {best['import'] * 1000:7.0f} ms "
+                  f"{best['response'] * 1000:7.0f} ms {best['handled'] * 1000:7.0f} ms")
+    finally:
+        api.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -15,6 +15,13 @@ from telegram.ext import (
 )
 
 from database.db import get_total_user_count, get_monthly_user_count, get_all_users, insert_book, book_exists
+from database.cache import catalog_cache
+from database.snapshot import build_snapshot
+from database.aio import run_db, db_executor, loop_lag
+from database.writer import user_writer
+from bot.update_dedup import update_dedup
+from bot.update_queue import update_dispatcher
+from database.analytics import days_ago, metric_by_language, metric_series, metric_total
 
 # Configuration
 ADMIN_ID = 1001572729
@@ -35,18 +42,75 @@ def is_admin(update: Update) -> bool:
 # -------------------------------
 # 1. Restricted /stats Command
 # -------------------------------
+def _rollup_stats():
+    """Last-7/30-day figures, read only from the daily rollups."""
+    week, month = days_ago(7), days_ago(30)
+    return {
+        "total_users": get_total_user_count(),
+        "monthly_users": get_monthly_user_count(),
+        "new_users": (metric_total("new_users", week), metric_total("new_users", month)),
+        "active_users": (metric_total("active_users", week) / 7,
+                         metric_total("active_users", month) / 30),
+        "searches": (metric_total("searches", week), metric_total("searches", month)),
+        "downloads": (metric_by_language("downloads", week),
+                      metric_by_language("downloads", month)),
+        "growth": metric_series("new_users", 7),
+    }
+
+
+def _by_language(counts):
+    if not counts:
+        return "0"
+    return ", ".join(f"{language} {count}" for language, count in counts.items())
+
+
 async def admin_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not is_admin(update):
         return
 
-    total_users = get_total_user_count()
-    monthly_users = get_monthly_user_count()
+    rollups = await run_db(_rollup_stats)
+    cache = catalog_cache.stats()
+    lag = loop_lag.stats()
+    db_calls = db_executor.stats()
+    pending_users = user_writer.stats()
     
     stats_text = (
         "🔐 *Admin Panel | Bot Statistics*\n\n"
-        f"👥 *Total Users:* {total_users}\n"
-        f"📅 *New This Month:* {monthly_users}\n"
+        f"👥 *Total Users:* {rollups['total_users']}\n"
+        f"📅 *New This Month:* {rollups['monthly_users']}\n\n"
+        "📈 *Last 7 / 30 days*\n"
+        f"• New users: {rollups['new_users'][0]} / {rollups['new_users'][1]}\n"
+        f"• Daily active users (avg): {rollups['active_users'][0]:.1f} / {rollups['active_users'][1]:.1f}\n"
+        f"• Searches: {rollups['searches'][0]} / {rollups['searches'][1]}\n"
+        f"• Downloads: {_by_language(rollups['downloads'][0])} / {_by_language(rollups['downloads'][1])}\n\n"
+        "🌱 *New users per day:*\n"
+        + "\n".join(f"`{day[5:]}` {count}" for day, count in rollups['growth'])
+        + "\n\n"
+        f"🗂 *Catalog Cache:* {cache['hits']} hits / {cache['misses']} misses "
+        f"({cache['hit_rate']:.0%}), {cache['entries']} entries\n"
+        f"🗄 *DB Calls:* {db_calls['calls']} ({db_calls['in_flight']} in flight, "
+        f"{db_calls['waited_for_slot']} queued)\n"
+        f"✍️ *Buffered New Users:* {pending_users['pending']} pending, "
+        f"{pending_users['dropped']} dropped\n"
     )
+    if lag["samples"]:
+        stats_text += (
+            f"⏱ *Event Loop Lag:* avg {lag['avg_ms']:.1f} ms, "
+            f"p99 {lag['p99_ms']:.1f} ms, max {lag['max_ms']:.1f} ms\n"
+        )
+    if update_dispatcher.running:
+        queue = update_dispatcher.stats()
+        stats_text += (
+            f"📥 *Update Queue:* {queue['queued']}/{queue['max_queued']} waiting "
+            f"(peak {queue['max_depth']}), {queue['processed']} processed, "
+            f"{queue['rejected']} refused, {queue['failed']} failed; "
+            f"wait p50 {queue['wait_p50_ms']:.1f} ms, p99 {queue['wait_p99_ms']:.1f} ms\n"
+        )
+        dedup = update_dedup.stats()
+        stats_text += (
+            f"🔁 *Redeliveries Dropped:* {dedup['dropped']} of {dedup['checked']} updates"
+            f"{' (shared across workers)' if dedup['shared'] else ''}\n"
+        )
     
     await update.message.reply_text(stats_text, parse_mode="Markdown")
 
@@ -94,7 +158,7 @@ async def broadcast_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("⚠️ Usage: `/broadcast <your message here>`", parse_mode="Markdown")
         return
 
-    users = get_all_users()
+    users = await run_db(get_all_users)
     if not users:
         await update.message.reply_text("No users found in the database.")
         return
@@ -108,6 +172,17 @@ async def broadcast_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     thread.start()
 
 
+# The uploader keeps its answers under its own keys: user_data also holds
+# the admin's own settings (e.g. "language", the UI language), which are
+# persisted and must survive an upload
+ADD_BOOK_KEYS = ("add_message_id", "add_mime_type", "add_language", "add_title", "add_author")
+
+
+def _clear_add_book(context):
+    for key in ADD_BOOK_KEYS:
+        context.user_data.pop(key, None)
+
+
 # -------------------------------
 # 3. /cancel Command (for uploader)
 # -------------------------------
@@ -115,7 +190,7 @@ async def cancel_add_book(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not is_admin(update):
         return ConversationHandler.END
     await update.message.reply_text("❌ Book upload cancelled.")
-    context.user_data.clear()
+    _clear_add_book(context)
     return ConversationHandler.END
 
 
@@ -133,8 +208,8 @@ async def receive_file(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return WAITING_FOR_FILE
 
     # Cache message ID for forwarding later
-    context.user_data["book_message_id"] = update.message.id
-    context.user_data["mime_type"] = document.mime_type
+    context.user_data["add_message_id"] = update.message.id
+    context.user_data["add_mime_type"] = document.mime_type
 
     keyboard = [
         [
@@ -154,7 +229,7 @@ async def receive_language(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
     
     language = query.data.split("_")[-1]
-    context.user_data["language"] = language
+    context.user_data["add_language"] = language
     
     await query.edit_message_text(f"Language set to: *{language}*\n\nPlease type the *Title* of the book:", parse_mode="Markdown")
     return WAITING_FOR_TITLE
@@ -162,7 +237,7 @@ async def receive_language(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def receive_title(update: Update, context: ContextTypes.DEFAULT_TYPE):
     title = update.message.text
-    context.user_data["title"] = title
+    context.user_data["add_title"] = title
     
     await update.message.reply_text(f"Title set to: *{title}*\n\nPlease type the *Author* of the book:", parse_mode="Markdown")
     return WAITING_FOR_AUTHOR
@@ -170,7 +245,7 @@ async def receive_title(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def receive_author(update: Update, context: ContextTypes.DEFAULT_TYPE):
     author = update.message.text
-    context.user_data["author"] = author
+    context.user_data["add_author"] = author
     
     await update.message.reply_text(
         f"Author set to: *{author}*\n\nFinally, type the *Category* for this book (e.g. 'ጸሎት', 'Theology', 'ስብከት'):", 
@@ -186,6 +261,17 @@ async def receive_category(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Please type a valid category name.")
         return WAITING_FOR_CATEGORY
 
+    # Don't forward a book the catalog already has (same normalized title,
+    # author and language)
+    if await run_db(book_exists, context.user_data["add_title"],
+                    author=context.user_data["add_author"], language=context.user_data["add_language"]):
+        await update.message.reply_text(
+            f"⚠️ *{context.user_data['add_title']}* by {context.user_data['add_author']} is already "
+            f"in the catalog. Upload cancelled.",
+            parse_mode="Markdown")
+        _clear_add_book(context)
+        return ConversationHandler.END
+
     # Everything gathered, let's insert to DB!
     await update.message.reply_text("⏳ Processing and saving book...")
 
@@ -194,27 +280,37 @@ async def receive_category(update: Update, context: ContextTypes.DEFAULT_TYPE):
         forwarded = await context.bot.forward_message(
             chat_id=ARCHIVE_CHAT_ID,
             from_chat_id=update.effective_chat.id,
-            message_id=context.user_data["book_message_id"]
+            message_id=context.user_data["add_message_id"]
         )
         
         # Save to database
-        insert_book(
-            title=context.user_data["title"],
+        book_id = await run_db(
+            insert_book,
+            title=context.user_data["add_title"],
             caption="",  # Manual uploads usually don't need the caption parsed
-            author=context.user_data["author"],
+            author=context.user_data["add_author"],
             category=category,
-            mime_type=context.user_data["mime_type"],
+            mime_type=context.user_data["add_mime_type"],
             file_id=str(forwarded.message_id),
             date=str(datetime.utcnow().date()),
-            language=context.user_data["language"]
+            language=context.user_data["add_language"]
         )
-        
+        if book_id is None:
+            await update.message.reply_text("⚠️ This book was added by someone else in the meantime; skipped.")
+            _clear_add_book(context)
+            return ConversationHandler.END
+
+        try:
+            await run_db(build_snapshot)
+        except Exception as e:
+            logger.warning(f"Catalog snapshot not rebuilt after adding book {book_id}: {e}")
+
         await update.message.reply_text(
             f"✅ *Book Successfully Added!*\n\n"
-            f"📖 Title: {context.user_data['title']}\n"
-            f"👤 Author: {context.user_data['author']}\n"
+            f"📖 Title: {context.user_data['add_title']}\n"
+            f"👤 Author: {context.user_data['add_author']}\n"
             f"📚 Category: {category}\n"
-            f"🌐 Language: {context.user_data['language']}",
+            f"🌐 Language: {context.user_data['add_language']}",
             parse_mode="Markdown"
         )
 
@@ -223,7 +319,7 @@ async def receive_category(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(f"❌ Failed to save book to archive/DB: {e}")
 
     # Clear state
-    context.user_data.clear()
+    _clear_add_book(context)
     return ConversationHandler.END
 
 
@@ -237,5 +333,7 @@ add_book_conv_handler = ConversationHandler(
         WAITING_FOR_AUTHOR: [MessageHandler(filters.TEXT & ~filters.COMMAND, receive_author)],
         WAITING_FOR_CATEGORY: [MessageHandler(filters.TEXT & ~filters.COMMAND, receive_category)],
     },
-    fallbacks=[CommandHandler("cancel", cancel_add_book)]
+    fallbacks=[CommandHandler("cancel", cancel_add_book)],
+    name="add_book",
+    persistent=True,
 )
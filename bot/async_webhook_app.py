@@ -0,0 +1,121 @@
+# bot/async_webhook_app.py
+"""
+Async webhook server (aiohttp), an alternative to the Flask app in
+webhook_app.py.
+
+The PTB Application is started once, on the server's long-running loop.
+Each POST is validated, queued on the update dispatcher
+(bot/update_queue.py) and answered immediately. The dispatcher's workers
+process updates concurrently on the same loop, at most WEBHOOK_CONCURRENCY
+at once, keeping each chat's updates in order. While one update waits on
+Telegram or the database, others make progress.
+
+Run from the project root (WEBHOOK_HOST / WEBHOOK_PORT, see utils/config.py):
+    python bot/async_webhook_app.py
+
+The Flask app stays as the fallback for WSGI-only hosts (PythonAnywhere).
+"""
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiohttp import web
+from telegram.ext import Application
+
+from bot.bot_app import create_application
+from bot.fast_path import parse_update, update_processor
+from bot.update_dedup import update_dedup
+from bot.update_queue import update_dispatcher
+from database.aio import loop_lag, run_db
+from database.writer import flush_all
+from utils.config import WEBHOOK_CONCURRENCY, WEBHOOK_HOST, WEBHOOK_PORT
+
+# ----------------------------
+# Logging
+# ----------------------------
+logging.basicConfig(
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    level=logging.INFO,
+)
+logger = logging.getLogger(__name__)
+
+TELEGRAM_APP = web.AppKey("telegram_app", Application)
+
+
+# ----------------------------
+# Telegram Application lifecycle
+# ----------------------------
+async def _telegram_lifecycle(app):
+    """Start the Telegram Application with the server and stop it on shutdown."""
+    telegram_app = create_application(concurrent_updates=WEBHOOK_CONCURRENCY, webhook=True)
+    await telegram_app.initialize()
+    # Also starts the periodic persistence updates
+    await telegram_app.start()
+    update_dispatcher.start(update_processor(telegram_app))
+    loop_lag.start()
+    app[TELEGRAM_APP] = telegram_app
+    logger.info(f"Telegram Application started ({WEBHOOK_CONCURRENCY} concurrent updates)")
+
+    yield
+
+    loop_lag.stop()
+    await update_dispatcher.stop()
+    await telegram_app.stop()
+    await telegram_app.shutdown()
+    # Write out buffered users/events before the process exits
+    flush_all()
+
+
+# ----------------------------
+# Routes
+# ----------------------------
+async def _call(fn, *args):
+    return fn(*args)
+
+
+async def health(request):
+    """Health check endpoint."""
+    return web.Response(text="Christian Books Bot is running! 📚")
+
+
+async def webhook(request):
+    """Receive a Telegram update, queue it and answer without waiting for it."""
+    telegram_app = request.app[TELEGRAM_APP]
+    try:
+        update = parse_update(await request.read(), telegram_app.bot)
+    except Exception:
+        update = None
+    if update is None:
+        logger.warning("Rejected a malformed webhook update")
+        return web.Response(status=400, text="Bad Request")
+
+    # The shared (database) check must not block the loop
+    call = run_db if update_dedup.shared else _call
+    if not await call(update_dedup.first_delivery, update.update_id):
+        # Already accepted once; answer so Telegram stops resending it
+        return web.Response(text="OK")
+    try:
+        queued = update_dispatcher.submit(update)
+    except Exception:
+        # Not queued: let Telegram's retry of this update_id through
+        await call(update_dedup.release, update.update_id)
+        raise
+    if not queued:
+        # Telegram delivers it again later
+        await call(update_dedup.release, update.update_id)
+        return web.Response(status=503, text="Busy", headers={"Retry-After": "1"})
+    return web.Response(text="OK")
+
+
+def create_web_app():
+    app = web.Application()
+    app.cleanup_ctx.append(_telegram_lifecycle)
+    app.router.add_get("/", health)
+    app.router.add_post("/webhook", webhook)
+    return app
+
+
+if __name__ == "__main__":
+    web.run_app(create_web_app(), host=WEBHOOK_HOST, port=WEBHOOK_PORT)
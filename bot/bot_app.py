@@ -1,25 +1,79 @@
 # bot/bot_app.py
 import os
+from telegram import Update
+from telegram.request import HTTPXRequest
 from telegram.ext import (
     ApplicationBuilder,
     CommandHandler,
     CallbackQueryHandler,
     PreCheckoutQueryHandler,
     MessageHandler,
+    TypeHandler,
     filters
 )
 from dotenv import load_dotenv
 
-from bot.handlers import start, about, search_command, callback_handler, precheckout_callback, successful_payment_callback
+from bot.handlers import (start, about, search_command, callback_handler, precheckout_callback,
+                          successful_payment_callback, track_activity)
 from bot.admin import admin_stats, broadcast_command, add_book_conv_handler
+from bot.persistence import DatabasePersistence
+from bot.webhook_reply import WebhookReplyRequest
+from database.models import create_tables
+from database.aio import loop_lag
+from database.writer import flush_all
+from utils.config import TELEGRAM_API_BASE_URL
 
 load_dotenv()
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 
 
-def create_application():
-    """Build and configure the Telegram Application with all handlers."""
-    application = ApplicationBuilder().token(BOT_TOKEN).build()
+async def _post_init(application):
+    # Polling runs this; the webhook apps start the monitor on their own
+    # loop, since they never call run_polling/run_webhook
+    loop_lag.start()
+
+
+async def _post_shutdown(application):
+    # Write out buffered users/events before the process exits
+    flush_all()
+
+
+def create_application(concurrent_updates=None, reply_in_response=False, webhook=False):
+    """
+    Build and configure the Telegram Application with all handlers.
+
+    `concurrent_updates` caps how many updates the Application's update
+    processor runs at once (default: one at a time). With
+    `reply_in_response` the Bot can hand a call to the webhook response
+    (see bot/webhook_reply.py). `webhook` skips what only polling needs.
+    """
+    # Make sure the schema (tables, indexes) is at the latest version
+    create_tables()
+
+    builder = (
+        ApplicationBuilder()
+        .token(BOT_TOKEN)
+        .base_url(f"{TELEGRAM_API_BASE_URL}/bot")
+        .base_file_url(f"{TELEGRAM_API_BASE_URL}/file/bot")
+        # Users' language and the admin /add conversation survive reloads
+        .persistence(DatabasePersistence())
+        .post_init(_post_init)
+        .post_shutdown(_post_shutdown)
+    )
+    if concurrent_updates:
+        builder = builder.concurrent_updates(concurrent_updates)
+    if reply_in_response or webhook:
+        request_class = WebhookReplyRequest if reply_in_response else HTTPXRequest
+        request = request_class(connection_pool_size=256)
+        builder = builder.request(request)
+        if webhook:
+            # getUpdates is never called; don't build a second HTTP client
+            # (and SSL context) for it
+            builder = builder.get_updates_request(request)
+    application = builder.build()
+
+    # Analytics: sees every update before the real handlers run
+    application.add_handler(TypeHandler(Update, track_activity), group=-1)
 
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("about", about))
@@ -0,0 +1,106 @@
+# bot/fast_path.py
+"""
+Fast path for the webhook's hottest updates: menu and book-list button
+presses (callback queries).
+
+For every update PTB builds a full Update object tree (Update.de_json), then
+walks the handler groups and builds a CallbackContext. For a button press
+that only re-renders a menu, this costs more CPU than the work itself. With
+WEBHOOK_FAST_PATH=1 the webhook routes call match() on the decoded JSON
+first. A match is a callback query whose data names a menu view in
+bot/handlers.py (CALLBACK_VIEWS) or a book id. Only the handful of fields
+the views need are read from it, and process() answers it with the same
+views and the same Bot methods as callback_handler. Everything else
+(commands, messages, payments, the lang_/stars_/srch_ buttons and the admin
+conversation) returns None and goes through Update.de_json and the
+Application as before.
+
+The request body is decoded with orjson when it is installed, else json.
+"""
+import collections
+import json
+
+from telegram import Update
+
+from bot.handlers import find_view, send_book
+from database.analytics import note_active
+from utils.config import WEBHOOK_FAST_PATH
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+FastCallback = collections.namedtuple(
+    "FastCallback", "update_id query_id user_id chat_id message_id data")
+
+
+def loads(body):
+    """Decode a webhook request body (bytes)."""
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def parse_update(body, bot):
+    """A webhook request body as a FastCallback when the fast path takes it, else an Update.
+
+    Returns None for a body that is not an update; raises on invalid JSON.
+    """
+    raw = loads(body)
+    if WEBHOOK_FAST_PATH and isinstance(raw, dict):
+        item = match(raw)
+        if item is not None:
+            return item
+    return Update.de_json(raw, bot)
+
+
+def match(raw):
+    """A FastCallback for a decoded update the fast path handles, else None."""
+    query = raw.get("callback_query")
+    if not isinstance(query, dict):
+        return None
+    data = query.get("data")
+    message = query.get("message")
+    if not isinstance(data, str) or not isinstance(message, dict):
+        return None
+    if not data.isdigit() and find_view(data) is None:
+        return None
+    try:
+        return FastCallback(raw["update_id"], query["id"], query["from"]["id"],
+                            message["chat"]["id"], message["message_id"], data)
+    except (KeyError, TypeError):
+        return None
+
+
+async def process(telegram_app, item):
+    """Answer a FastCallback like callback_handler would."""
+    note_active(item.user_id)
+    user_data = telegram_app.user_data[item.user_id]
+    if telegram_app.persistence:
+        await telegram_app.persistence.refresh_user_data(item.user_id, user_data)
+    language = user_data.get("language") or "English"
+
+    bot = telegram_app.bot
+    await bot.answer_callback_query(item.query_id)
+    view = find_view(item.data)
+    if view is None:
+        await send_book(bot, item.query_id, item.chat_id, item.user_id, item.data, language)
+        return
+    reply = await view(item.data, language)
+    if reply:
+        text, reply_markup, parse_mode = reply
+        await bot.edit_message_text(text, chat_id=item.chat_id, message_id=item.message_id,
+                                    parse_mode=parse_mode, reply_markup=reply_markup)
+
+
+def update_processor(telegram_app):
+    """The update dispatcher's process function for this Application."""
+    async def process_update(update):
+        if isinstance(update, FastCallback):
+            coroutine = process(telegram_app, update)
+        else:
+            coroutine = telegram_app.process_update(update)
+        # Shares the Application's concurrency limit either way
+        await telegram_app.update_processor.process_update(update, coroutine)
+    return process_update
@@ -1,16 +1,22 @@
 # bot/handlers.py
 import logging
-import sqlite3
 import os
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, LabeledPrice
 from telegram.ext import ContextTypes
 from dotenv import load_dotenv
 
-load_dotenv()
+from database.aio import run_db
+from database.analytics import count_event, get_popular_books, note_active, record_download
+from database.cache import catalog_cache
+from database.db import (authors_page, books_by_author_page, books_by_category_page,
+                         categories_page, get_author_by_id, get_book_facet_ids, get_category_by_id,
+                         get_monthly_user_count, get_total_user_count, search_books_page)
+from database.db import get_book_by_id as db_get_book_by_id
+from database.fuzzy import fuzzy_search_books
+from database.snapshot import current_snapshot
+from database.writer import queue_user
 
-# Database settings
-BASE_DIR = os.path.dirname(os.path.dirname(__file__))
-DB_PATH = os.path.join(BASE_DIR, "data", "books.db")
+load_dotenv()
 
 # Logging
 logger = logging.getLogger(__name__)
@@ -19,136 +25,78 @@ logger = logging.getLogger(__name__)
 # -------------------------------
 # Database Helpers
 # -------------------------------
-def _get_conn():
-    return sqlite3.connect(DB_PATH)
+# Facet menus, book lists and book lookups are cached per worker (see
+# database/cache.py). A miss is read from the shared catalog snapshot while
+# it is current (see database/snapshot.py), so a fresh worker starts warm,
+# otherwise from the database. Every list is keyset-paginated: `anchor` is
+# the id of the last ("n") or first ("p") row of the page the user is
+# coming from.
+def _cached(key, from_snapshot, from_db):
+    def load():
+        snapshot = current_snapshot()
+        return from_snapshot(snapshot) if snapshot else from_db()
+    return catalog_cache.get(key, load)
 
 
-def get_categories(language=None):
-    conn = _get_conn()
-    cursor = conn.cursor()
-    if language:
-        cursor.execute(
-            "SELECT MIN(id), category FROM books WHERE category IS NOT NULL AND category != '' AND language = ? GROUP BY category ORDER BY category",
-            (language,))
-    else:
-        cursor.execute("SELECT MIN(id), category FROM books WHERE category IS NOT NULL AND category != '' GROUP BY category ORDER BY category")
-    categories = cursor.fetchall()
-    conn.close()
-    return categories
-
-
-def get_authors(language=None):
-    conn = _get_conn()
-    cursor = conn.cursor()
-    if language:
-        cursor.execute(
-            "SELECT MIN(id), author FROM books WHERE author IS NOT NULL AND author != '' AND language = ? GROUP BY author ORDER BY author",
-            (language,))
-    else:
-        cursor.execute("SELECT MIN(id), author FROM books WHERE author IS NOT NULL AND author != '' GROUP BY author ORDER BY author")
-    authors = cursor.fetchall()
-    conn.close()
-    return authors
-
-
-def get_book_metadata_by_id(book_id):
-    """Helper to fetch category/author from a book ID (used to bypass callback limits)."""
-    conn = _get_conn()
-    cursor = conn.cursor()
-    cursor.execute("SELECT category, author FROM books WHERE id=?", (book_id,))
-    res = cursor.fetchone()
-    conn.close()
-    return res
-
-
-def get_books_by_category(category, language=None):
-    conn = _get_conn()
-    cursor = conn.cursor()
-    if language:
-        cursor.execute(
-            "SELECT id, title, author, file_id FROM books WHERE category = ? AND language = ?",
-            (category, language))
-    else:
-        cursor.execute(
-            "SELECT id, title, author, file_id FROM books WHERE category = ?",
-            (category,))
-    books = cursor.fetchall()
-    conn.close()
-    return books
-
-
-def get_books_by_author(author, language=None):
-    conn = _get_conn()
-    cursor = conn.cursor()
-    if language:
-        cursor.execute(
-            "SELECT id, title, author, file_id FROM books WHERE author = ? AND language = ?",
-            (author, language))
-    else:
-        cursor.execute(
-            "SELECT id, title, author, file_id FROM books WHERE author = ?",
-            (author,))
-    books = cursor.fetchall()
-    conn.close()
-    return books
+def get_categories_page(language, direction="n", anchor=None):
+    """Page of (category_id, name, book_count) rows for the category menu."""
+    return _cached(("categories", language, direction, anchor),
+                   lambda snapshot: snapshot.facet_page("categories", language, direction, anchor),
+                   lambda: categories_page(language, direction, anchor))
+
+
+def get_authors_page(language, direction="n", anchor=None):
+    """Page of (author_id, name, book_count) rows for the author menu."""
+    return _cached(("authors", language, direction, anchor),
+                   lambda snapshot: snapshot.facet_page("authors", language, direction, anchor),
+                   lambda: authors_page(language, direction, anchor))
+
+
+def get_category(category_id):
+    return _cached(("category", str(category_id)),
+                   lambda snapshot: snapshot.get_facet("categories", category_id),
+                   lambda: get_category_by_id(category_id))
+
+
+def get_author(author_id):
+    return _cached(("author", str(author_id)),
+                   lambda snapshot: snapshot.get_facet("authors", author_id),
+                   lambda: get_author_by_id(author_id))
+
+
+def get_books_by_category_page(category_id, direction="n", anchor=None):
+    return _cached(("books_by_category", str(category_id), direction, anchor),
+                   lambda snapshot: snapshot.facet_books_page("categories", category_id,
+                                                              direction, anchor),
+                   lambda: books_by_category_page(category_id, direction, anchor))
+
+
+def get_books_by_author_page(author_id, direction="n", anchor=None):
+    return _cached(("books_by_author", str(author_id), direction, anchor),
+                   lambda snapshot: snapshot.facet_books_page("authors", author_id,
+                                                              direction, anchor),
+                   lambda: books_by_author_page(author_id, direction, anchor))
+
+
+def search_books(keyword, language=None, direction="n", anchor=None):
+    """
+    Page of (id, title, author, rank) full-text matches, best first, and
+    the ranking they come from ("d<catalog version>"). Ranks (and so search
+    cursors) are only comparable within one ranking.
+    """
+    return search_books_page(keyword, language, direction, anchor), f"d{catalog_cache.version()}"
 
 
 def get_book_by_id(book_id):
-    conn = _get_conn()
-    cursor = conn.cursor()
-    cursor.execute("SELECT title, file_id FROM books WHERE id=?", (book_id,))
-    book = cursor.fetchone()
-    conn.close()
-    return book
-
-
-def search_books(keyword, language=None):
-    conn = _get_conn()
-    cursor = conn.cursor()
-    if language:
-        cursor.execute(
-            "SELECT id, title, author FROM books WHERE (title LIKE ? OR author LIKE ?) AND language = ?",
-            (f"%{keyword}%", f"%{keyword}%", language))
-    else:
-        cursor.execute(
-            "SELECT id, title, author FROM books WHERE title LIKE ? OR author LIKE ?",
-            (f"%{keyword}%", f"%{keyword}%"))
-    results = cursor.fetchall()
-    conn.close()
-    return results
+    """(title, file_id) of a book, or None."""
+    return _cached(("book", str(book_id)),
+                   lambda snapshot: snapshot.get_book_by_id(book_id),
+                   lambda: db_get_book_by_id(book_id))
 
 
 def record_user(user_id, username=None, first_name=None):
-    """Record user on first visit."""
-    from datetime import datetime
-    conn = _get_conn()
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT OR IGNORE INTO users (user_id, username, first_name, joined_at) VALUES (?, ?, ?, ?)",
-        (user_id, username, first_name, datetime.utcnow().isoformat()))
-    conn.commit()
-    conn.close()
-
-
-def get_monthly_user_count():
-    from datetime import datetime
-    conn = _get_conn()
-    cursor = conn.cursor()
-    now = datetime.utcnow()
-    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0).isoformat()
-    cursor.execute("SELECT COUNT(*) FROM users WHERE joined_at >= ?", (month_start,))
-    count = cursor.fetchone()[0]
-    conn.close()
-    return count
-
-
-def get_total_user_count():
-    conn = _get_conn()
-    cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(*) FROM users")
-    count = cursor.fetchone()[0]
-    conn.close()
-    return count
+    """Record user on first visit (buffered; see database/writer.py)."""
+    queue_user(user_id, username, first_name)
 
 
 # -------------------------------
@@ -170,6 +118,7 @@ def main_menu_keyboard(language="English"):
             [InlineKeyboardButton("📚 በምድብ ፈልግ", callback_data="menu_category")],
             [InlineKeyboardButton("👤 በደራሲ ፈልግ", callback_data="menu_author")],
             [InlineKeyboardButton("🔍 መጽሐፍ ፈልግ", callback_data="menu_search")],
+            [InlineKeyboardButton("🔥 በብዛት የተወረዱ", callback_data="menu_popular")],
             [InlineKeyboardButton("ℹ️ ስለ ቦቱ", callback_data="menu_about")],
             [InlineKeyboardButton("🌟 ቦቱን ደግፉ (Donate)", callback_data="menu_donate")],
             [InlineKeyboardButton("🔄 ቋንቋ ቀይር", callback_data="menu_change_lang")],
@@ -179,6 +128,7 @@ def main_menu_keyboard(language="English"):
             [InlineKeyboardButton("📚 Browse by Category", callback_data="menu_category")],
             [InlineKeyboardButton("👤 Browse by Author", callback_data="menu_author")],
             [InlineKeyboardButton("🔍 Search Books", callback_data="menu_search")],
+            [InlineKeyboardButton("🔥 Most Popular", callback_data="menu_popular")],
             [InlineKeyboardButton("ℹ️ About", callback_data="menu_about")],
             [InlineKeyboardButton("🌟 Support Bot (Donate)", callback_data="menu_donate")],
             [InlineKeyboardButton("🔄 Change Language", callback_data="menu_change_lang")],
@@ -192,6 +142,34 @@ def back_to_main_keyboard():
     )
 
 
+def paged_keyboard(buttons, page, page_prefix, back_data, cursor=None):
+    """
+    One button per row plus a Prev/Next row for keyset-paginated lists.
+
+    Prev/Next callbacks are `<page_prefix>_p_<cursor>` / `<page_prefix>_n_<cursor>`,
+    where the cursor identifies the first/last row of this page (its id by
+    default).
+    """
+    cursor = cursor or (lambda row: row[0])
+    keyboard = [[button] for button in buttons]
+    nav = []
+    if page.has_prev and page.rows:
+        nav.append(InlineKeyboardButton("⬅️ Prev", callback_data=f"{page_prefix}_p_{cursor(page.rows[0])}"))
+    if page.has_next and page.rows:
+        nav.append(InlineKeyboardButton("Next ➡️", callback_data=f"{page_prefix}_n_{cursor(page.rows[-1])}"))
+    if nav:
+        keyboard.append(nav)
+    keyboard.append([InlineKeyboardButton("⬅️ Back", callback_data=back_data)])
+    return InlineKeyboardMarkup(keyboard)
+
+
+def parse_page_args(parts):
+    """Split ["n"|"p", "<anchor>"] callback parts; the first page has none."""
+    if len(parts) >= 2 and parts[0] in ("n", "p"):
+        return parts[0], parts[1]
+    return "n", None
+
+
 def about_keyboard():
     keyboard = [
         [InlineKeyboardButton("📩 Contact Admin", url="https://t.me/Dani1961")],
@@ -214,6 +192,12 @@ def set_user_language(context, language):
 # -------------------------------
 # Command Handlers
 # -------------------------------
+async def track_activity(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Runs before every other handler (group -1) to count daily active users."""
+    if update.effective_user:
+        note_active(update.effective_user.id)
+
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Welcome message with language selection."""
     user = update.effective_user
@@ -266,25 +250,298 @@ async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     keyword = " ".join(context.args)
     language = get_user_language(context)
-    results = search_books(keyword, language)
+    # Remembered so the Prev/Next buttons can fetch further pages
+    context.user_data["last_search"] = keyword
+    count_event("searches", language or "English")
+    text, reply_markup = await run_db(search_results_message, keyword, language)
+    await update.message.reply_text(text, reply_markup=reply_markup)
+
+
+def _search_cursor(ranking):
+    # Search pages seek on (rank, id) within one ranking; repr() round-trips
+    # the float exactly
+    return lambda row: f"{ranking}_{row[3]!r}_{row[0]}"
+
+
+def search_results_message(keyword, language, direction="n", anchor=None, ranking=None):
+    """
+    Text and keyboard for one page of /search results (runs on a DB thread).
+    `anchor` is only valid in the `ranking` it came from.
+    """
+    page, current = search_books(keyword, language, direction, anchor)
+    if anchor is not None and (current != ranking or not page.rows):
+        # The catalog changed since the cursor was made, or it ran past
+        # the end: start over
+        page, current = search_books(keyword, language)
+    if page.rows:
+        buttons = [
+            InlineKeyboardButton(f"{title} ({author})", callback_data=str(book_id))
+            for book_id, title, author, _ in page.rows
+        ]
+        return (f"🔍 Search results for '{keyword}':",
+                paged_keyboard(buttons, page, "srch", "menu_main", cursor=_search_cursor(current)))
+
+    # Fall back to typo-tolerant matching before giving up
+    results = fuzzy_search_books(keyword, language)
+    if results:
+        keyboard = [
+            [InlineKeyboardButton(f"{title} ({author})", callback_data=str(book_id))]
+            for book_id, title, author in results
+        ]
+        keyboard.append([InlineKeyboardButton("⬅️ Back", callback_data="menu_main")])
+        return (f"🤔 No exact matches for '{keyword}'. Did you mean:",
+                InlineKeyboardMarkup(keyboard))
+
+    return f"❌ No books found for: {keyword}", None
+
+
+# -------------------------------
+# Callback views
+# -------------------------------
+# Menu callbacks only render a new message: a view takes the callback data
+# and the user's language and returns (text, reply_markup, parse_mode),
+# or None when there is nothing to show. Views never touch the Update, so
+# the webhook fast path (bot/fast_path.py) can call them too.
+ABOUT_TEXT = (
+    '📖 *"For I am not ashamed of the gospel, for it is the power of God for salvation '
+    'to everyone who believes."*\n'
+    "_— Romans 1:16_\n\n"
+    "🌿 *About Christian Books Bot*\n\n"
+    "This bot was created with a simple purpose — *to make timeless Christian books and resources easily accessible* to everyone.\n\n"
+    "Here, you'll find a growing collection of *Reformed and Evangelical writings*, organized by *author*, *category*, and *topic*.\n\n"
+    "🇪🇹 *The bot also provides Amharic spiritual resources!*\n\n"
+    "Our desire is to help you:\n"
+    "• 📚 Discover classic works of theology, devotion, and church history\n"
+    "• 🔍 Browse by author or category\n"
+    "• 🙏 Deepen your understanding of Scripture and sound doctrine\n\n"
+    "*Credits / Sources:*\n"
+    "A special thanks to the following Telegram channels where these resources are gathered:\n"
+    "🇬🇧 English: `@christiangoodbooks`\n"
+    "🇪🇹 Amharic: `@amharicspritualbooks`\n\n"
+    "_May these resources encourage you to know Christ more deeply and to grow in grace and truth._\n\n"
+    "Enjoy your spiritual reading journey! ✨"
+)
+
+
+async def change_language_view(data, language):
+    return "Choose your language / ቋንቋዎን ይምረጡ:", language_selection_keyboard(), None
+
+
+async def main_menu_view(data, language):
+    text = "🏠 ዋና ማዉጫ:" if language == "Amharic" else "🏠 Main Menu:"
+    return text, main_menu_keyboard(language), None
+
+
+async def about_view(data, language):
+    return ABOUT_TEXT, about_keyboard(), "Markdown"
+
+
+async def donate_view(data, language):
+    keyboard = [
+        [InlineKeyboardButton("⭐️ 50 Stars (~$1)", callback_data="stars_50")],
+        [InlineKeyboardButton("⭐️ 100 Stars (~$2)", callback_data="stars_100")],
+        [InlineKeyboardButton("⭐️ 250 Stars (~$5)", callback_data="stars_250")],
+        [InlineKeyboardButton("⬅️ Back", callback_data="menu_main")]
+    ]
+    text = (
+        "🌟 *Support Christian Books Bot*\n\n"
+        "This bot is free to use! If it has blessed you, please consider donating a few Telegram Stars to keep our server running and support new features.\n\n"
+        "Choose an amount to donate securely via Telegram:"
+    ) if language == "English" else (
+        "🌟 *ለክርስቲያን መጽሐፍት ቦት ድጋፍ ያድርጉ*\n\n"
+        "ይህ ቦት ነፃ ነው! ከተጠቀሙበትና ከተባረኩበት፣ ሰርቨር ለማሳደግና አዳዲስ ነገሮችን ለመጨመር በቴሌግራም ስታር አነስተኛ ድጋፍ ቢያደርጉልን እናመሰግናለን።\n\n"
+        "በቴሌግራም የሚለገሱበትን መጠን ይምረጡ:"
+    )
+    return text, InlineKeyboardMarkup(keyboard), "Markdown"
+
+
+async def search_prompt_view(data, language):
+    if language == "Amharic":
+        text = "🔍 መጽሐፍ ለመፈለግ ይህን ትእዛዝ ይጠቀሙ:\n`/search <ቁልፍ ቃል>`"
+    else:
+        text = "🔍 To search for a book, use the command:\n`/search <keyword>`"
+    return text, back_to_main_keyboard(), "Markdown"
 
-    if not results:
-        await update.message.reply_text(f"❌ No books found for: {keyword}")
-        return
+
+async def popular_view(data, language):
+    """Most popular books (rankings precomputed in popular_books)."""
+    rows = await run_db(get_popular_books, language)
+    if not rows:
+        msg = "እስካሁን የተወረደ መጽሐፍ የለም።" if language == "Amharic" else "No downloads yet — check back soon!"
+        return msg, back_to_main_keyboard(), None
 
     keyboard = [
-        [InlineKeyboardButton(f"{title} ({author})", callback_data=str(book_id))]
-        for book_id, title, author in results[:90] # Truncate to avoid 100 button limit error
+        [InlineKeyboardButton(f"{title} ({author}) · {downloads}⬇️", callback_data=str(book_id))]
+        for book_id, title, author, downloads in rows
     ]
     keyboard.append([InlineKeyboardButton("⬅️ Back", callback_data="menu_main")])
+    header = "🔥 በብዛት የተወረዱ መጽሐፍት:" if language == "Amharic" else "🔥 Most popular books:"
+    return header, InlineKeyboardMarkup(keyboard), None
+
+
+async def categories_view(data, language):
+    """Browse by category (catlist_<n|p>_<id> for further pages)."""
+    direction, anchor = parse_page_args(data.split("_")[1:])
+    page = await run_db(get_categories_page, language, direction, anchor)
+    if not page.rows and anchor is not None:
+        page = await run_db(get_categories_page, language)
+    if not page.rows:
+        msg = "ምድቦች አልተገኙም።" if language == "Amharic" else "No categories found."
+        return msg, back_to_main_keyboard(), None
+
+    buttons = [
+        InlineKeyboardButton(f"{cat} ({count})", callback_data=f"catf_{category_id}")
+        for category_id, cat, count in page.rows
+    ]
 
-    await update.message.reply_text(
-        f"🔍 Search results for '{keyword}':",
-        reply_markup=InlineKeyboardMarkup(keyboard),
-    )
+    title = "📚 ምድብ ይምረጡ:" if language == "Amharic" else "📚 Choose a category:"
+    return title, paged_keyboard(buttons, page, "catlist", "menu_main"), None
+
+
+async def authors_view(data, language):
+    """Browse by author (authlist_<n|p>_<id> for further pages)."""
+    direction, anchor = parse_page_args(data.split("_")[1:])
+    page = await run_db(get_authors_page, language, direction, anchor)
+    if not page.rows and anchor is not None:
+        page = await run_db(get_authors_page, language)
+    if not page.rows:
+        msg = "ደራሲዎች አልተገኙም።" if language == "Amharic" else "No authors found."
+        return msg, back_to_main_keyboard(), None
+
+    buttons = [
+        InlineKeyboardButton(f"{auth} ({count})", callback_data=f"authf_{author_id}")
+        for author_id, auth, count in page.rows
+    ]
+
+    title = "👤 ደራሲ ይምረጡ:" if language == "Amharic" else "👤 Choose an author:"
+    return title, paged_keyboard(buttons, page, "authlist", "menu_main"), None
+
+
+async def category_books_view(data, language):
+    """Category books (catf_<id>, catf_<id>_<n|p>_<book id> for further pages)."""
+    parts = data.split("_")
+    category_id = parts[1]
+    direction, anchor = parse_page_args(parts[2:])
+    facet = await run_db(get_category, category_id)
+    if not facet:
+        return None
+    category = facet[0]
+
+    page = await run_db(get_books_by_category_page, category_id, direction, anchor)
+    if not page.rows and anchor is not None:
+        page = await run_db(get_books_by_category_page, category_id)
+    if not page.rows:
+        msg = f"በ{category} ውስጥ መጽሐፍ አልተገኘም።" if language == "Amharic" else f"No books found in {category}."
+        return msg, back_to_main_keyboard(), None
+
+    buttons = [
+        InlineKeyboardButton(f"{title} ({author})", callback_data=str(book_id))
+        for book_id, title, author, _ in page.rows
+    ]
 
+    header = f"📖 '{category}' ምድብ:" if language == "Amharic" else f"📖 Books in '{category}':"
+    return header, paged_keyboard(buttons, page, f"catf_{category_id}", "menu_category"), None
+
+
+async def author_books_view(data, language):
+    """Author books (authf_<id>, authf_<id>_<n|p>_<book id> for further pages)."""
+    parts = data.split("_")
+    author_id = parts[1]
+    direction, anchor = parse_page_args(parts[2:])
+    facet = await run_db(get_author, author_id)
+    if not facet:
+        return None
+    author = facet[0]
+
+    page = await run_db(get_books_by_author_page, author_id, direction, anchor)
+    if not page.rows and anchor is not None:
+        page = await run_db(get_books_by_author_page, author_id)
+    if not page.rows:
+        msg = f"በ{author} የተጻፉ መጽሐፍት አልተገኙም።" if language == "Amharic" else f"No books found by {author}."
+        return msg, back_to_main_keyboard(), None
+
+    buttons = [
+        InlineKeyboardButton(title, callback_data=str(book_id))
+        for book_id, title, _, _ in page.rows
+    ]
 
+    header = f"📚 የ{author} መጽሐፍት:" if language == "Amharic" else f"📚 Books by '{author}':"
+    return header, paged_keyboard(buttons, page, f"authf_{author_id}", "menu_author"), None
+
+
+async def _legacy_facet_view(data, language, view, prefix, column):
+    """
+    Buttons sent before facet ids: cat_<book id> / auth_<book id> open that
+    book's category or author. Paged cat_/auth_ buttons already carried a
+    facet id, and so does any id that is not a book.
+    """
+    parts = data.split("_")
+    if len(parts) == 2 and parts[1].isdigit():
+        facets = await run_db(get_book_facet_ids, int(parts[1]))
+        if facets and facets[column]:
+            return await view(f"{prefix}_{facets[column]}", language)
+    return await view("_".join([prefix] + parts[1:]), language)
+
+
+async def legacy_category_view(data, language):
+    return await _legacy_facet_view(data, language, category_books_view, "catf", 0)
+
+
+async def legacy_author_view(data, language):
+    return await _legacy_facet_view(data, language, author_books_view, "authf", 1)
+
+
+# Exact callback data first, then the prefix before the first "_"
+CALLBACK_VIEWS = {
+    "menu_change_lang": change_language_view,
+    "menu_main": main_menu_view,
+    "menu_about": about_view,
+    "menu_donate": donate_view,
+    "menu_search": search_prompt_view,
+    "menu_popular": popular_view,
+    "menu_category": categories_view,
+    "menu_author": authors_view,
+    "catlist": categories_view,
+    "authlist": authors_view,
+    "catf": category_books_view,
+    "authf": author_books_view,
+    "cat": legacy_category_view,
+    "auth": legacy_author_view,
+}
+
+
+def find_view(data):
+    """The view that renders this callback data, or None."""
+    view = CALLBACK_VIEWS.get(data)
+    if view is None:
+        view = CALLBACK_VIEWS.get(data.split("_", 1)[0])
+    return view
+
+
+async def send_book(bot, query_id, chat_id, user_id, data, language):
+    """Copy a book (callback data = its id) from the archive channel into the chat."""
+    book = await run_db(get_book_by_id, data)
+    if not book:
+        await bot.answer_callback_query(query_id, "❌ Book not found.", show_alert=True)
+        return
 
+    title, message_id = book
+    if message_id:
+        try:
+            await bot.copy_message(
+                chat_id=chat_id,
+                from_chat_id=int(os.getenv("ARCHIVE_CHAT_ID")),
+                message_id=int(message_id),
+            )
+            count_event("downloads", language)
+            record_download(int(data), user_id)
+            # Acknowledge the click without spamming the chat
+            await bot.answer_callback_query(query_id, f"Sent: {title}")
+        except Exception as e:
+            logger.error(f"Copy message failed: {e}")
+            await bot.answer_callback_query(query_id, "❌ Failed to send the book.", show_alert=True)
+    else:
+        await bot.answer_callback_query(query_id, "❌ File not available for download.", show_alert=True)
 
 
 # -------------------------------
@@ -310,72 +567,16 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
 
-    # Change language
-    if data == "menu_change_lang":
-        await query.message.edit_text(
-            "Choose your language / ቋንቋዎን ይምረጡ:",
-            reply_markup=language_selection_keyboard()
-        )
-        return
-
     # Get current language
     language = get_user_language(context) or "English"
 
-    # Main menu
-    if data == "menu_main":
-        if language == "Amharic":
-            text = "🏠 ዋና ማዉጫ:"
-        else:
-            text = "🏠 Main Menu:"
-        await query.message.edit_text(
-            text, reply_markup=main_menu_keyboard(language)
-        )
-        return
-
-    # About
-    if data == "menu_about":
-        about_text = (
-            '📖 *"For I am not ashamed of the gospel, for it is the power of God for salvation '
-            'to everyone who believes."*\n'
-            "_— Romans 1:16_\n\n"
-            "🌿 *About Christian Books Bot*\n\n"
-            "This bot was created with a simple purpose — *to make timeless Christian books and resources easily accessible* to everyone.\n\n"
-            "Here, you'll find a growing collection of *Reformed and Evangelical writings*, organized by *author*, *category*, and *topic*.\n\n"
-            "🇪🇹 *The bot also provides Amharic spiritual resources!*\n\n"
-            "Our desire is to help you:\n"
-            "• 📚 Discover classic works of theology, devotion, and church history\n"
-            "• 🔍 Browse by author or category\n"
-            "• 🙏 Deepen your understanding of Scripture and sound doctrine\n\n"
-            "*Credits / Sources:*\n"
-            "A special thanks to the following Telegram channels where these resources are gathered:\n"
-            "🇬🇧 English: `@christiangoodbooks`\n"
-            "🇪🇹 Amharic: `@amharicspritualbooks`\n\n"
-            "_May these resources encourage you to know Christ more deeply and to grow in grace and truth._\n\n"
-            "Enjoy your spiritual reading journey! ✨"
-        )
-        await query.message.edit_text(
-            about_text, parse_mode="Markdown", reply_markup=about_keyboard()
-        )
-        return
-
-    # Support / Donate Options
-    if data == "menu_donate":
-        keyboard = [
-            [InlineKeyboardButton("⭐️ 50 Stars (~$1)", callback_data="stars_50")],
-            [InlineKeyboardButton("⭐️ 100 Stars (~$2)", callback_data="stars_100")],
-            [InlineKeyboardButton("⭐️ 250 Stars (~$5)", callback_data="stars_250")],
-            [InlineKeyboardButton("⬅️ Back", callback_data="menu_main")]
-        ]
-        text = (
-            "🌟 *Support Christian Books Bot*\n\n"
-            "This bot is free to use! If it has blessed you, please consider donating a few Telegram Stars to keep our server running and support new features.\n\n"
-            "Choose an amount to donate securely via Telegram:"
-        ) if language == "English" else (
-            "🌟 *ለክርስቲያን መጽሐፍት ቦት ድጋፍ ያድርጉ*\n\n"
-            "ይህ ቦት ነፃ ነው! ከተጠቀሙበትና ከተባረኩበት፣ ሰርቨር ለማሳደግና አዳዲስ ነገሮችን ለመጨመር በቴሌግራም ስታር አነስተኛ ድጋፍ ቢያደርጉልን እናመሰግናለን።\n\n"
-            "በቴሌግራም የሚለገሱበትን መጠን ይምረጡ:"
-        )
-        await query.message.edit_text(text, parse_mode="Markdown", reply_markup=InlineKeyboardMarkup(keyboard))
+    # Menus and book lists
+    view = find_view(data)
+    if view is not None:
+        reply = await view(data, language)
+        if reply:
+            text, reply_markup, parse_mode = reply
+            await query.message.edit_text(text, parse_mode=parse_mode, reply_markup=reply_markup)
         return
 
     # Send Star Invoice
@@ -398,134 +599,25 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
 
-    # Search
-    if data == "menu_search":
-        if language == "Amharic":
-            text = "🔍 መጽሐፍ ለመፈለግ ይህን ትእዛዝ ይጠቀሙ:\n`/search <ቁልፍ ቃል>`"
-        else:
-            text = "🔍 To search for a book, use the command:\n`/search <keyword>`"
-        await query.message.edit_text(
-            text,
-            parse_mode="Markdown",
-            reply_markup=back_to_main_keyboard(),
-        )
-        return
-
-    # Browse by category
-    if data == "menu_category":
-        categories = get_categories(language)
-        if not categories:
-            msg = "ምድቦች አልተገኙም።" if language == "Amharic" else "No categories found."
-            await query.message.edit_text(msg, reply_markup=back_to_main_keyboard())
-            return
-
-        keyboard = [
-            [InlineKeyboardButton(cat, callback_data=f"cat_{book_id}")]
-            for book_id, cat in categories[:90]
-        ]
-        keyboard.append([InlineKeyboardButton("⬅️ Back", callback_data="menu_main")])
-
-        title = "📚 ምድብ ይምረጡ:" if language == "Amharic" else "📚 Choose a category:"
-        await query.message.edit_text(
-            title, reply_markup=InlineKeyboardMarkup(keyboard)
-        )
-        return
-
-    # Browse by author
-    if data == "menu_author":
-        authors = get_authors(language)
-        if not authors:
-            msg = "ደራሲዎች አልተገኙም።" if language == "Amharic" else "No authors found."
-            await query.message.edit_text(msg, reply_markup=back_to_main_keyboard())
-            return
-
-        keyboard = [
-            [InlineKeyboardButton(auth, callback_data=f"auth_{book_id}")]
-            for book_id, auth in authors[:90]
-        ]
-        keyboard.append([InlineKeyboardButton("⬅️ Back", callback_data="menu_main")])
-
-        title = "👤 ደራሲ ይምረጡ:" if language == "Amharic" else "👤 Choose an author:"
-        await query.message.edit_text(
-            title, reply_markup=InlineKeyboardMarkup(keyboard)
-        )
-        return
-
-    # Category books
-    if data.startswith("cat_"):
-        ref_id = data.replace("cat_", "")
-        metadata = get_book_metadata_by_id(ref_id)
-        if not metadata: return
-        category = metadata[0]
-
-        books = get_books_by_category(category, language)
-        if not books:
-            msg = f"በ{category} ውስጥ መጽሐፍ አልተገኘም።" if language == "Amharic" else f"No books found in {category}."
-            await query.message.edit_text(msg, reply_markup=back_to_main_keyboard())
-            return
-
-        keyboard = [
-            [InlineKeyboardButton(f"{title} ({author})", callback_data=str(book_id))]
-            for book_id, title, author, _ in books[:90]
-        ]
-        keyboard.append(
-            [InlineKeyboardButton("⬅️ Back", callback_data="menu_category")]
-        )
-
-        header = f"📖 '{category}' ምድብ:" if language == "Amharic" else f"📖 Books in '{category}':"
-        await query.message.edit_text(
-            header, reply_markup=InlineKeyboardMarkup(keyboard)
-        )
-        return
-
-    # Author books
-    if data.startswith("auth_"):
-        ref_id = data.replace("auth_", "")
-        metadata = get_book_metadata_by_id(ref_id)
-        if not metadata: return
-        author = metadata[1]
-        
-        books = get_books_by_author(author, language)
-        if not books:
-            msg = f"በ{author} የተጻፉ መጽሐፍት አልተገኙም።" if language == "Amharic" else f"No books found by {author}."
-            await query.message.edit_text(msg, reply_markup=back_to_main_keyboard())
+    # Search result pages (srch_<n|p>_<ranking>_<rank>_<id>)
+    if data.startswith("srch_"):
+        keyword = context.user_data.get("last_search")
+        if not keyword:
+            await query.message.edit_text(
+                "🔍 Please search again with `/search <keyword>`",
+                parse_mode="Markdown", reply_markup=back_to_main_keyboard())
             return
-
-        keyboard = [
-            [InlineKeyboardButton(title, callback_data=str(book_id))]
-            for book_id, title, _, _ in books[:90]
-        ]
-        keyboard.append(
-            [InlineKeyboardButton("⬅️ Back", callback_data="menu_author")]
-        )
-
-        header = f"📚 የ{author} መጽሐፍት:" if language == "Amharic" else f"📚 Books by '{author}':"
-        await query.message.edit_text(
-            header, reply_markup=InlineKeyboardMarkup(keyboard)
-        )
+        # Buttons sent before cursors carried their ranking have none
+        _, direction, *ranking, rank, book_id = data.split("_")
+        text, reply_markup = await run_db(
+            search_results_message, keyword, language, direction, (float(rank), int(book_id)),
+            ranking[0] if ranking else None)
+        await query.message.edit_text(text, reply_markup=reply_markup)
         return
 
     # Book download
-    book = get_book_by_id(data)
-    if not book:
-        await query.answer("❌ Book not found.", show_alert=True)
-        return
-
-    title, message_id = book
-    if message_id:
-        try:
-            await context.bot.copy_message(
-                chat_id=update.effective_chat.id,
-                from_chat_id=int(os.getenv("ARCHIVE_CHAT_ID")),
-                message_id=int(message_id),
-            )
-            # Acknowledge the click without spamming the chat
-            await query.answer(f"Sent: {title}")
-        except Exception as e:
-            logger.error(f"Copy message failed: {e}")
-            await query.answer("❌ Failed to send the book.", show_alert=True)
-    else:
-        await query.answer("❌ File not available for download.", show_alert=True)
+    await send_book(context.bot, query.id, update.effective_chat.id, update.effective_user.id,
+                    data, language)
 
 # -------------------------------
 # Payment Handlers
@@ -0,0 +1,151 @@
+# bot/persistence.py
+"""
+PTB persistence on the bot's own database (SQLite, or PostgreSQL with
+DB_BACKEND=postgres).
+
+Without it every reload or extra worker process starts with empty
+user_data. Users lose their language choice, and the admin /add
+conversation forgets where it was. DatabasePersistence keeps both:
+
+- user_data is not read at startup. A user's row is loaded the first time
+  the user sends an update to this process (refresh_user_data). It is read
+  again when this process's copy is USER_DATA_RELOAD_SECONDS old, to pick
+  up changes made through another worker. It is not re-read while this
+  process has changes of its own that may not be in the database yet.
+- Changed user_data and conversation states are not written one by one.
+  They go onto write-behind queues (database/writer.py). Each queue
+  coalesces repeated writes for the same user or conversation to the last
+  one and commits a whole batch in one transaction.
+
+Values are stored as JSON, so user_data must hold plain str/int/float/
+bool/list/dict values. Chat data, bot data and callback data are not
+persisted.
+"""
+import json
+import logging
+import os
+import time
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from database.aio import run_db
+from database.db import (load_conversations, load_user_data, save_conversations_bulk,
+                         save_user_data_bulk)
+from database.writer import FLUSH_INTERVAL_SECONDS, WriteBehindQueue
+
+logger = logging.getLogger(__name__)
+
+# How often a running Application hands changed data to the persistence.
+# Writes are batched again by the queues below, so this can be short.
+PERSISTENCE_UPDATE_SECONDS = float(os.getenv("PERSISTENCE_UPDATE_SECONDS", "5"))
+# Reload a user's data once this process's copy is this old, in case another
+# worker changed it (gunicorn.conf.py lowers both for several workers)
+USER_DATA_RELOAD_SECONDS = float(os.getenv("USER_DATA_RELOAD_SECONDS", "60"))
+# A change queued here is in the database after at most this long
+WRITE_SETTLE_SECONDS = 2 * FLUSH_INTERVAL_SECONDS
+
+
+def _write_user_data(rows):
+    # Only the newest value per user matters
+    save_user_data_bulk(list(dict(rows).items()))
+
+
+def _write_conversations(rows):
+    latest = {(name, key): state for name, key, state in rows}
+    save_conversations_bulk([(name, key, state) for (name, key), state in latest.items()])
+
+
+user_data_writer = WriteBehindQueue("user_data", _write_user_data)
+conversation_writer = WriteBehindQueue("conversations", _write_conversations)
+
+
+class DatabasePersistence(BasePersistence):
+    def __init__(self, update_interval=PERSISTENCE_UPDATE_SECONDS):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False,
+                                        user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self._loaded_at = {}    # user id -> when this process last read their data
+        self._synced = {}       # user id -> their data as last read or queued here
+        self._queued_at = {}    # user id -> when a change of theirs was last queued here
+
+    # --- user_data ---
+    async def get_user_data(self):
+        # Loaded lazily, one user at a time, in refresh_user_data
+        return {}
+
+    def _has_local_changes(self, user_id, user_data, now):
+        """Changes made here that the database may not have yet."""
+        return (user_data != self._synced.get(user_id, {})
+                or now - self._queued_at.get(user_id, float("-inf")) < WRITE_SETTLE_SECONDS)
+
+    async def refresh_user_data(self, user_id, user_data):
+        now = time.monotonic()
+        if now - self._loaded_at.get(user_id, float("-inf")) < USER_DATA_RELOAD_SECONDS:
+            return
+        if self._has_local_changes(user_id, user_data, now):
+            return
+        self._loaded_at[user_id] = now
+        stored = await run_db(load_user_data, user_id)
+        if stored is not None:
+            user_data.clear()
+            user_data.update(json.loads(stored))
+            self._synced[user_id] = json.loads(stored)
+
+    async def update_user_data(self, user_id, data):
+        try:
+            encoded = json.dumps(data, ensure_ascii=False)
+        except (TypeError, ValueError):
+            logger.warning(f"Not persisting user_data of {user_id}: not JSON serializable")
+            return
+        user_data_writer.put((user_id, encoded))
+        self._synced[user_id] = json.loads(encoded)
+        self._queued_at[user_id] = time.monotonic()
+
+    async def drop_user_data(self, user_id):
+        self._loaded_at.pop(user_id, None)
+        self._synced.pop(user_id, None)
+        self._queued_at[user_id] = time.monotonic()
+        user_data_writer.put((user_id, None))
+
+    # --- conversations ---
+    async def get_conversations(self, name):
+        rows = await run_db(load_conversations, name)
+        return {tuple(json.loads(key)): json.loads(state) for key, state in rows}
+
+    async def update_conversation(self, name, key, new_state):
+        state = None if new_state is None else json.dumps(new_state)
+        conversation_writer.put((name, json.dumps(list(key)), state))
+
+    async def flush(self):
+        user_data_writer.flush()
+        conversation_writer.flush()
+
+    # --- not persisted ---
+    async def get_chat_data(self):
+        return {}
+
+    async def get_bot_data(self):
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def update_chat_data(self, chat_id, data):
+        pass
+
+    async def update_bot_data(self, data):
+        pass
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def drop_chat_data(self, chat_id):
+        pass
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
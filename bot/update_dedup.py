@@ -0,0 +1,83 @@
+# bot/update_dedup.py
+"""
+Drop webhook updates Telegram has already delivered.
+
+When a webhook answer is slow or fails, Telegram sends the same update
+again. Processing it twice repeats copy_message sends, Star invoices and
+DB writes, exactly when the bot is already struggling. Each webhook route
+asks `update_dedup.first_delivery(update_id)` before queueing an update:
+
+- The last WEBHOOK_DEDUP_SIZE update_ids accepted by this process are
+  kept in an insertion-ordered dict, so a replay is found, and the oldest
+  id evicted, in constant time.
+- With WEBHOOK_DEDUP_SHARED=1 an id that is new to this process is also
+  claimed in the seen_updates table (one INSERT OR IGNORE on the primary
+  key). A redelivery that lands on another worker process is then dropped
+  too.
+
+Replays are still answered 200, so Telegram stops resending them, and are
+counted in `dropped`. An update the route could not queue is released
+again, so its redelivery goes through.
+"""
+import logging
+import threading
+from collections import OrderedDict
+
+from database.db import claim_update, release_update
+from utils.config import WEBHOOK_DEDUP_SHARED, WEBHOOK_DEDUP_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class UpdateDeduplicator:
+    def __init__(self, size=WEBHOOK_DEDUP_SIZE, shared=WEBHOOK_DEDUP_SHARED):
+        self.size = size
+        self.shared = shared
+        self._seen = OrderedDict()    # update_id -> None, oldest first
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.dropped = 0
+
+    def first_delivery(self, update_id):
+        """
+        True the first time `update_id` is seen; False (and counted) for a
+        redelivery. In shared mode this writes to the database, so async
+        callers run it through run_db.
+        """
+        with self._lock:
+            self.checked += 1
+            if update_id in self._seen:
+                self.dropped += 1
+                return False
+            self._seen[update_id] = None
+            if len(self._seen) > self.size:
+                self._seen.popitem(last=False)
+        if self.shared:
+            try:
+                claimed = claim_update(update_id, self.size)
+            except Exception:
+                # Better a rare duplicate than a lost update
+                logger.exception(f"Could not claim update {update_id}; processing it anyway")
+                claimed = True
+            if not claimed:
+                with self._lock:
+                    self.dropped += 1
+                return False
+        return True
+
+    def release(self, update_id):
+        """Forget `update_id` (it was not queued after all)."""
+        with self._lock:
+            self._seen.pop(update_id, None)
+        if self.shared:
+            try:
+                release_update(update_id)
+            except Exception:
+                logger.exception(f"Could not release update {update_id}")
+
+    def stats(self):
+        return {"checked": self.checked, "dropped": self.dropped, "remembered": len(self._seen),
+                "shared": self.shared}
+
+
+update_dedup = UpdateDeduplicator()
@@ -0,0 +1,146 @@
+# bot/update_queue.py
+"""
+Acknowledge-first update handling for the webhook apps.
+
+Telegram keeps its webhook request open until we answer, and retries
+when an answer is slow or fails. A route that processes the update before
+answering therefore ties Telegram to our slowest DB query or Bot API call,
+and a slow spell turns into a growing pile of redeliveries. The webhook
+routes instead validate the update (see bot/fast_path.py for the button
+presses that skip Update.de_json), hand it to UpdateDispatcher.submit()
+and answer 200 straight away:
+
+- Updates are sharded by chat (or user) onto WEBHOOK_CONCURRENCY worker
+  tasks. Each worker handles its shard in arrival order, so one chat's
+  updates are never processed out of order or concurrently.
+- At most WEBHOOK_QUEUE_SIZE updates wait in total. When that is reached
+  submit() refuses the update and the route answers 503, so Telegram
+  backs off and delivers it again later.
+- stats() reports accepted/rejected/processed counts, the queue depth and
+  how long updates waited (shown in the admin /stats).
+
+submit() must be called on the loop the workers run on.
+"""
+import asyncio
+import collections
+import logging
+import os
+import time
+
+from telegram import Update
+
+from utils.config import WEBHOOK_CONCURRENCY, WEBHOOK_QUEUE_SIZE
+
+logger = logging.getLogger(__name__)
+
+WAIT_SAMPLES = 1000           # queue waits kept for the percentiles
+DRAIN_TIMEOUT_SECONDS = 10    # how long stop() lets queued updates finish
+
+
+def update_key(update):
+    """What orders updates: the chat, else the user, else nothing shared."""
+    if not isinstance(update, Update):
+        # A FastCallback (bot/fast_path.py)
+        return update.chat_id
+    if update.effective_chat is not None:
+        return update.effective_chat.id
+    if update.effective_user is not None:
+        return update.effective_user.id
+    return update.update_id
+
+
+class UpdateDispatcher:
+    def __init__(self, workers=WEBHOOK_CONCURRENCY, max_queued=WEBHOOK_QUEUE_SIZE):
+        self.workers = workers
+        self.max_queued = max_queued
+        self._process = None
+        self._shards = []
+        self._tasks = []
+        self._orphans = []
+        self._queued = 0
+        self._full = False
+        self._waits = collections.deque(maxlen=WAIT_SAMPLES)
+        self.accepted = 0
+        self.rejected = 0
+        self.processed = 0
+        self.failed = 0
+        self.max_depth = 0
+
+    @property
+    def running(self):
+        return bool(self._tasks)
+
+    def start(self, process):
+        """Start the workers on the running loop; `process` is awaited with each update."""
+        self._process = process
+        self._shards = [asyncio.Queue() for _ in range(self.workers)]
+        self._tasks = [asyncio.create_task(self._work(shard), name=f"update-worker-{i}")
+                       for i, shard in enumerate(self._shards)]
+
+    def submit(self, update):
+        """Queue an update for processing. Returns False (and drops it) when the queue is full."""
+        if not self._tasks:
+            raise RuntimeError("UpdateDispatcher.start() has not been called")
+        if self._queued >= self.max_queued:
+            if not self._full:
+                logger.warning(f"Update queue full ({self._queued} waiting), refusing updates")
+                self._full = True
+            self.rejected += 1
+            return False
+        self._full = False
+        shard = self._shards[hash(update_key(update)) % len(self._shards)]
+        shard.put_nowait((time.perf_counter(), update))
+        self._queued += 1
+        self.accepted += 1
+        self.max_depth = max(self.max_depth, self._queued)
+        return True
+
+    async def _work(self, shard):
+        while True:
+            queued_at, update = await shard.get()
+            self._queued -= 1
+            self._waits.append(time.perf_counter() - queued_at)
+            try:
+                await self._process(update)
+                self.processed += 1
+            except Exception:
+                self.failed += 1
+                logger.exception(f"Error processing update {update.update_id}")
+            finally:
+                shard.task_done()
+
+    async def stop(self, timeout=DRAIN_TIMEOUT_SECONDS):
+        """Let queued updates finish (up to `timeout` seconds), then stop the workers."""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(asyncio.gather(*(shard.join() for shard in self._shards)),
+                                   timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Stopping with {self._queued} updates still queued")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def abandon(self):
+        """Forget the workers without stopping them (after a fork their loop is gone)."""
+        # Still referenced, so they are not reported as destroyed while pending
+        self._orphans.extend(self._tasks)
+        self._tasks = []
+        self._shards = []
+        self._queued = 0
+
+    def stats(self):
+        waits = sorted(self._waits)
+        p50 = waits[len(waits) // 2] * 1000 if waits else 0.0
+        p99 = waits[min(len(waits) - 1, int(len(waits) * 0.99))] * 1000 if waits else 0.0
+        return {"queued": self._queued, "max_queued": self.max_queued,
+                "max_depth": self.max_depth, "accepted": self.accepted,
+                "rejected": self.rejected, "processed": self.processed, "failed": self.failed,
+                "wait_p50_ms": p50, "wait_p99_ms": p99}
+
+
+update_dispatcher = UpdateDispatcher()
+
+os.register_at_fork(after_in_child=update_dispatcher.abandon)
@@ -1,11 +1,20 @@
 # bot/webhook_app.py
+import atexit
 import logging
 import asyncio
+import os
+import threading
+import time
 
 from flask import Flask, request
-from telegram import Update
 
 from bot.bot_app import create_application
+from bot.fast_path import parse_update, update_processor
+from bot.update_dedup import update_dedup
+from bot.update_queue import update_dispatcher
+from bot.webhook_reply import discard, expect, mark_answered, replying, wait_for_reply
+from database.aio import loop_lag
+from utils.config import WEBHOOK_CONCURRENCY, WEBHOOK_REPLY_IN_RESPONSE, WEBHOOK_WARMUP
 
 # ----------------------------
 # Logging
@@ -22,29 +31,102 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 
 # ----------------------------
-# Telegram Application (created lazily, initialized once)
+# Telegram Application (created lazily, started once)
 # ----------------------------
+# Updates are acknowledged as soon as they are queued (see
+# bot/update_queue.py) and processed on one event loop that runs in a
+# background thread, so a request never waits for handler work. With
+# WEBHOOK_REPLY_IN_RESPONSE it waits briefly for the update's first reply, to
+# answer with it (see bot/webhook_reply.py).
+#
+# With WEBHOOK_WARMUP (the default) the Application is built and started on
+# a background thread as soon as this module is imported, so the first
+# update after a reload does not wait for it (or for its getMe call).
+#
+# All of this is per process. A worker forked from a process that imported
+# this module starts over with its own loop and Application (_after_fork),
+# so the app can run as several gunicorn/uWSGI workers (see gunicorn.conf.py).
 _telegram_app = None
-_initialized = False
-
-# Single persistent event loop (no threads needed)
 _loop = asyncio.new_event_loop()
+_start_lock = threading.Lock()
+
+
+async def _start(telegram_app):
+    await telegram_app.initialize()
+    # Also starts the periodic persistence updates
+    await telegram_app.start()
+    process = update_processor(telegram_app)
+    if WEBHOOK_REPLY_IN_RESPONSE:
+        process = replying(process)
+    update_dispatcher.start(process)
+    loop_lag.start()
+
+
+async def _stop(telegram_app):
+    loop_lag.stop()
+    await update_dispatcher.stop()
+    await telegram_app.stop()
+    await telegram_app.shutdown()
+
+
+def _shutdown():
+    """Finish queued updates and stop the Application at interpreter exit."""
+    global _telegram_app
+    telegram_app, _telegram_app = _telegram_app, None
+    if telegram_app is not None:
+        asyncio.run_coroutine_threadsafe(_stop(telegram_app), _loop).result(timeout=30)
+        _loop.call_soon_threadsafe(_loop.stop)
 
 
 def get_application():
-    """Return the Telegram Application, creating and initializing it on first use."""
-    global _telegram_app, _initialized
+    """Return the Telegram Application, creating and starting it on first use."""
+    global _telegram_app
     if _telegram_app is None:
-        _telegram_app = create_application()
-
-    if not _initialized:
-        _loop.run_until_complete(_telegram_app.initialize())
-        _initialized = True
-        logger.info("Telegram Application initialized successfully")
+        with _start_lock:
+            if _telegram_app is None:
+                started = time.perf_counter()
+                telegram_app = create_application(concurrent_updates=WEBHOOK_CONCURRENCY,
+                                                  reply_in_response=WEBHOOK_REPLY_IN_RESPONSE,
+                                                  webhook=True)
+                built = time.perf_counter()
+                if not _loop.is_running():
+                    threading.Thread(target=_loop.run_forever, name="telegram-loop",
+                                     daemon=True).start()
+                asyncio.run_coroutine_threadsafe(_start(telegram_app), _loop).result()
+                _telegram_app = telegram_app
+                atexit.register(_shutdown)
+                logger.info(f"Telegram Application started in {time.perf_counter() - started:.2f}s "
+                            f"(build {built - started:.2f}s, "
+                            f"initialize {time.perf_counter() - built:.2f}s)")
 
     return _telegram_app
 
 
+def _warm_up():
+    try:
+        get_application()
+    except Exception:
+        # The first request tries again
+        logger.exception("Error starting the Telegram Application during warm-up")
+
+
+async def _submit(update):
+    """Queue the update; returns (queued, the call to answer with or None, its slot)."""
+    # The dispatcher's queues belong to the loop thread
+    if not WEBHOOK_REPLY_IN_RESPONSE:
+        return update_dispatcher.submit(update), None, None
+    slot = expect(update.update_id)
+    try:
+        queued = update_dispatcher.submit(update)
+    except Exception:
+        discard(update.update_id)
+        raise
+    if not queued:
+        discard(update.update_id)
+        return False, None, None
+    return True, await wait_for_reply(slot), slot
+
+
 # ----------------------------
 # Routes
 # ----------------------------
@@ -56,18 +138,61 @@ def health():
 
 @app.route("/webhook", methods=["POST"])
 def webhook():
-    """Receive Telegram updates via webhook."""
+    """Receive a Telegram update, queue it and answer without waiting for it
+    (in reply mode, answer with its first reply if that comes quickly)."""
     try:
         telegram_app = get_application()
-        update = Update.de_json(
-            request.get_json(force=True),
-            telegram_app.bot,
-        )
+    except Exception:
+        logger.exception("Error starting the Telegram Application")
+        return "Internal Server Error", 500
 
-        # Process update synchronously on our persistent event loop
-        _loop.run_until_complete(telegram_app.process_update(update))
+    try:
+        update = parse_update(request.get_data(), telegram_app.bot)
+    except Exception:
+        update = None
+    if update is None:
+        logger.warning("Rejected a malformed webhook update")
+        return "Bad Request", 400
 
+    if not update_dedup.first_delivery(update.update_id):
+        # Already accepted once; answer so Telegram stops resending it
         return "OK", 200
+    try:
+        queued, reply, slot = asyncio.run_coroutine_threadsafe(_submit(update), _loop).result()
     except Exception:
-        logger.exception("Error processing webhook update")
-        return "Internal Server Error", 500
+        # Not queued: let Telegram's retry of this update_id through
+        update_dedup.release(update.update_id)
+        raise
+    if not queued:
+        # Telegram delivers it again later
+        update_dedup.release(update.update_id)
+        return "Busy", 503, {"Retry-After": "1"}
+    if reply is not None:
+        # Telegram makes this Bot API call for us. The update's later calls
+        # wait until the server has written this response.
+        response = app.make_response((reply, 200))
+        loop = _loop
+        response.call_on_close(lambda: mark_answered(slot, loop))
+        return response
+    return "OK", 200
+
+
+def start_warm_up():
+    """Start the Application on a background thread (gunicorn.conf.py calls this per worker)."""
+    threading.Thread(target=_warm_up, name="telegram-warmup", daemon=True).start()
+
+
+def _after_fork():
+    # A server that imports the app and then forks its workers leaves each
+    # child without the loop thread (and maybe with _start_lock held)
+    global _telegram_app, _loop, _start_lock
+    _telegram_app = None
+    _loop = asyncio.new_event_loop()
+    _start_lock = threading.Lock()
+    if WEBHOOK_WARMUP:
+        start_warm_up()
+
+
+os.register_at_fork(after_in_child=_after_fork)
+if WEBHOOK_WARMUP:
+    start_warm_up()
@@ -0,0 +1,146 @@
+# bot/webhook_reply.py
+"""
+Reply-in-response mode for the Flask webhook (WEBHOOK_REPLY_IN_RESPONSE=1).
+
+Telegram lets the answer to a webhook request carry one Bot API call: a JSON
+body like {"method": "answerCallbackQuery", "callback_query_id": "..."}.
+Telegram then runs that call itself, and we save one outbound round trip to
+api.telegram.org. That trip is the slowest part of the common interactions
+(the query.answer() of every button press, the reply to /start or /search),
+especially behind PythonAnywhere's outbound proxy.
+
+How it works:
+- The route registers a ReplySlot for the update (expect()), queues the
+  update as usual and waits up to WEBHOOK_REPLY_TIMEOUT seconds for the
+  slot.
+- The dispatcher's process function (replying()) makes the slot the current
+  one while the update is processed.
+- The Application's Bot sends through WebhookReplyRequest. Its first
+  REPLY_METHODS call while a slot is open goes into the slot instead of
+  over the network, and the handler sees a plain `True` result. Calls
+  before it are sent as usual. Calls after it wait until the server has
+  written the response carrying the reply (the route calls
+  mark_answered() when the response is closed), so they do not overtake
+  it.
+- If the update needs no such call, or takes longer than the timeout, the
+  slot closes empty. The route then answers a plain 200 and every call is
+  sent as usual.
+
+Only methods whose result the handlers never use can be taken. Telegram
+does not report the outcome of a call made this way.
+"""
+import asyncio
+import contextvars
+from http import HTTPStatus
+
+from telegram.request import HTTPXRequest
+
+from utils.config import WEBHOOK_REPLY_TIMEOUT
+
+# Methods that may be answered in the webhook response. Their result is
+# either ignored by the handlers or `True` is a valid one for PTB.
+REPLY_METHODS = frozenset({
+    "answerCallbackQuery",
+    "answerPreCheckoutQuery",
+    "editMessageText",
+    "sendMessage",
+})
+# What the Bot gets back for a call that went into the webhook response
+_TAKEN_RESULT = b'{"ok":true,"result":true}'
+# How long later calls wait for the response to be sent, in case the server
+# never reports it (a dropped connection); then they go out anyway
+ANSWERED_WAIT_SECONDS = 5.0
+
+# The slot of the update being processed by the current task
+reply_slot = contextvars.ContextVar("reply_slot", default=None)
+
+
+class ReplySlot:
+    """Room for one Bot API call in the webhook response to an update."""
+
+    def __init__(self):
+        self.reply = asyncio.get_running_loop().create_future()   # the call, or None
+        self.answered = asyncio.Event()
+
+    def take(self, endpoint, request_data):
+        """Keep the call for the response, if the slot is open and it qualifies."""
+        if self.reply.done() or endpoint not in REPLY_METHODS:
+            return False
+        if request_data is not None and request_data.contains_files:
+            return False
+        params = request_data.parameters if request_data is not None else {}
+        self.reply.set_result({"method": endpoint, **params})
+        return True
+
+    def close(self):
+        if not self.reply.done():
+            self.reply.set_result(None)
+
+
+# update_id -> slot, from the route until a worker picks the update up
+_pending = {}
+
+
+def expect(update_id):
+    """Open a slot for an update that is about to be queued."""
+    slot = ReplySlot()
+    _pending[update_id] = slot
+    return slot
+
+
+def discard(update_id):
+    """Forget the slot of an update that was not queued after all."""
+    slot = _pending.pop(update_id, None)
+    if slot is not None:
+        slot.close()
+
+
+async def wait_for_reply(slot, timeout=WEBHOOK_REPLY_TIMEOUT):
+    """
+    The call to put in the webhook response (a dict), or None. For a call,
+    the route must call mark_answered() once the response has been sent.
+    """
+    try:
+        reply = await asyncio.wait_for(asyncio.shield(slot.reply), timeout)
+    except asyncio.TimeoutError:
+        reply = None
+    slot.close()
+    if reply is None:
+        slot.answered.set()
+    return reply
+
+
+def mark_answered(slot, loop):
+    """Let the update's later calls go out (from any thread, once the response is sent)."""
+    loop.call_soon_threadsafe(slot.answered.set)
+
+
+def replying(process):
+    """Wrap the dispatcher's process function so each update sees its slot."""
+    async def process_update(update):
+        slot = _pending.pop(update.update_id, None)
+        token = reply_slot.set(slot)
+        try:
+            await process(update)
+        finally:
+            reply_slot.reset(token)
+            if slot is not None:
+                slot.close()
+    return process_update
+
+
+class WebhookReplyRequest(HTTPXRequest):
+    """HTTPXRequest that hands the first eligible call of an update to its ReplySlot."""
+
+    async def do_request(self, url, method, request_data=None, *args, **kwargs):
+        slot = reply_slot.get()
+        if slot is not None:
+            if slot.take(url.rsplit("/", 1)[-1], request_data):
+                return HTTPStatus.OK, _TAKEN_RESULT
+            if slot.reply.done() and slot.reply.result() is not None:
+                # Send after the response that carries the reply
+                try:
+                    await asyncio.wait_for(slot.answered.wait(), ANSWERED_WAIT_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+        return await super().do_request(url, method, request_data, *args, **kwargs)
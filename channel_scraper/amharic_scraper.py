@@ -15,8 +15,10 @@ from telethon.sync import TelegramClient
 from telethon.tl.types import MessageMediaDocument, DocumentAttributeFilename
 from telethon.errors import FloodWaitError
 from dotenv import load_dotenv
-from database.db import insert_book, book_exists
+from database.db import insert_books_bulk, existing_dedup_keys
+from utils.search import dedup_key
 from database.models import create_tables, migrate_add_language_column
+from database.snapshot import build_snapshot
 
 # -------------------------------
 # 🔹 Load Environment Variables
@@ -55,6 +57,9 @@ client = TelegramClient('scraper_session', API_ID, API_HASH)
 # Delay between forwards to avoid flood bans
 FORWARD_DELAY = 2  # seconds
 
+# Messages checked against the DB (and saved) together; one commit per batch
+BATCH_SIZE = 100
+
 
 # -------------------------------
 # 🔹 Caption-Based Detection
@@ -230,11 +235,78 @@ def detect_amharic_category(text):
 # -------------------------------
 # 🔹 Main Scraping Logic
 # -------------------------------
+def forward_to_archive(message, channel_username):
+    """Forward one channel message to the archive; returns the new message id."""
+    try:
+        forwarded = client.forward_messages(
+            ARCHIVE_CHAT_ID,
+            message.id,
+            from_peer=channel_username
+        )
+    except FloodWaitError as e:
+        print(f"⏳ Flood wait: sleeping for {e.seconds} seconds...")
+        time.sleep(e.seconds)
+        forwarded = client.forward_messages(
+            ARCHIVE_CHAT_ID,
+            message.id,
+            from_peer=channel_username
+        )
+
+    if not forwarded:
+        return None
+    if isinstance(forwarded, list):
+        return forwarded[0].id
+    return forwarded.id
+
+
+def save_batch(batch, channel_username, seen):
+    """
+    Forward and store one batch of candidate books.
+
+    Books already in the catalog (same title, author and language) are
+    looked up with one query for the whole batch and the new books are
+    written with one bulk insert (one commit).
+    `seen` holds dedup keys already handled in this run.
+    Returns (forwarded, skipped) counts.
+    """
+    existing = existing_dedup_keys([book for _, book in batch])
+    books = []
+    skipped = 0
+    try:
+        for message, book in batch:
+            title = book["title"]
+            # Duplicate check uses the cleaned title, not the file name
+            key = dedup_key(title, book["author"], book["language"])
+            if key in existing or key in seen:
+                print(f"⏩ Skipping existing (Title Match): {title}")
+                skipped += 1
+                continue
+            seen.add(key)
+
+            message_id = forward_to_archive(message, channel_username)
+            if not message_id:
+                print(f"❌ Failed to forward: {title}")
+                continue
+
+            book["file_id"] = str(message_id)
+            books.append(book)
+            print(f"✅ {title} (by {book['author']}) [{book['category']}]")
+
+            # Delay to avoid flood ban
+            time.sleep(FORWARD_DELAY)
+    finally:
+        # Books already forwarded are saved even if the batch stops early
+        insert_books_bulk(books)
+    return len(books), skipped
+
+
 def scrape_amharic_channel(channel_username, limit=1000):
     """Scrape a single Amharic channel."""
     print(f"\n📡 Scraping Amharic channel: {channel_username}")
     forwarded_count = 0
     skipped_count = 0
+    seen = set()
+    batch = []
 
     for message in client.iter_messages(channel_username, limit=limit):
         if not (message.media and isinstance(message.media, MessageMediaDocument)):
@@ -254,62 +326,27 @@ def scrape_amharic_channel(channel_username, limit=1000):
             continue
 
         # Extract metadata from caption early for accurate duplicate checking
-        author = extract_author_from_caption(caption)
         title = extract_title_from_caption(caption, file_name)
-        category = detect_amharic_category(f"{title} {caption}")
-        date = message.date
-
-        # Check if already exists (using the cleaned title to prevent duplicates)
-        if book_exists(title):
-            print(f"⏩ Skipping existing (Title Match): {title}")
-            skipped_count += 1
-            continue
-
-        # Forward to archive channel
-        try:
-            forwarded = client.forward_messages(
-                ARCHIVE_CHAT_ID,
-                message.id,
-                from_peer=channel_username
-            )
-        except FloodWaitError as e:
-            print(f"⏳ Flood wait: sleeping for {e.seconds} seconds...")
-            time.sleep(e.seconds)
-            forwarded = client.forward_messages(
-                ARCHIVE_CHAT_ID,
-                message.id,
-                from_peer=channel_username
-            )
-
-        # Get message_id from forwarded message
-        message_id = None
-        if forwarded:
-            if isinstance(forwarded, list):
-                message_id = forwarded[0].id
-            else:
-                message_id = forwarded.id
-
-        if not message_id:
-            print(f"❌ Failed to forward: {file_name}")
-            continue
-
-        # Insert into DB with language='Amharic'
-        insert_book(
-            title=title,
-            caption=caption,
-            author=author,
-            category=category,
-            mime_type=mime_type,
-            file_id=str(message_id),
-            date=str(date),
-            language='Amharic'
-        )
-
-        forwarded_count += 1
-        print(f"✅ [{forwarded_count}] {title} (by {author}) [{category}]")
-
-        # Delay to avoid flood ban
-        time.sleep(FORWARD_DELAY)
+        batch.append((message, {
+            "title": title,
+            "caption": caption,
+            "author": extract_author_from_caption(caption),
+            "category": detect_amharic_category(f"{title} {caption}"),
+            "mime_type": mime_type,
+            "date": str(message.date),
+            "language": 'Amharic',
+        }))
+        if len(batch) >= BATCH_SIZE:
+            forwarded, skipped = save_batch(batch, channel_username, seen)
+            forwarded_count += forwarded
+            skipped_count += skipped
+            print(f"💾 Saved batch ({forwarded_count} books so far)")
+            batch = []
+
+    if batch:
+        forwarded, skipped = save_batch(batch, channel_username, seen)
+        forwarded_count += forwarded
+        skipped_count += skipped
 
     print(f"\n🎯 Finished: {forwarded_count} Amharic books forwarded!")
     print(f"⏩ Skipped {skipped_count} existing books.")
@@ -321,6 +358,9 @@ def scrape_all_amharic_channels(limit=1000):
         for channel in AMHARIC_CHANNELS:
             scrape_amharic_channel(channel, limit=limit)
 
+    stats = build_snapshot()
+    print(f"🗂 Rebuilt catalog snapshot ({stats['books']} books)")
+
 
 # -------------------------------
 # 🔹 Run Script
@@ -4,9 +4,10 @@ from telethon.tl.types import MessageMediaDocument, DocumentAttributeFilename
 import requests
 import os
 from dotenv import load_dotenv
-from database.db import insert_book
+from database.db import insert_books_bulk, existing_dedup_keys
+from utils.search import dedup_key
 from database.models import create_tables
-from database.db import book_exists
+from database.snapshot import build_snapshot
 import time
 from telethon.errors import FloodWaitError
 
@@ -21,6 +22,9 @@ CHANNEL_USERNAME = os.getenv("CHANNEL_USERNAME")
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 ARCHIVE_CHAT_ID= int(os.getenv("ARCHIVE_CHAT_ID"))
 
+# Messages checked against the DB (and saved) together; one commit per batch
+BATCH_SIZE = 100
+
 # -------------------------------
 # 🔹 Initialize Directories and DB
 # -------------------------------
@@ -222,6 +226,78 @@ def detect_author(text):
 # -------------------------------
 # 🔹 Main Scraping Logic
 # -------------------------------
+def forward_to_archive(message):
+    """Forward one channel message to the archive; returns the new message id."""
+    try:
+        forwarded = client.forward_messages(
+            ARCHIVE_CHAT_ID,
+            message.id,
+            from_peer=CHANNEL_USERNAME
+        )
+    except FloodWaitError as e:
+        print(f"⏳ Flood wait: sleeping for {e.seconds} seconds...")
+        time.sleep(e.seconds)
+        # After sleeping, try again
+        forwarded = client.forward_messages(
+            ARCHIVE_CHAT_ID,
+            message.id,
+            from_peer=CHANNEL_USERNAME
+        )
+
+    if not forwarded:
+        return None
+    if isinstance(forwarded, list):
+        return forwarded[0].id
+    return forwarded.id
+
+
+def save_batch(batch, seen):
+    """
+    Forward and store one batch of candidate messages.
+
+    Books already in the catalog (same title, author and language) are
+    looked up with one query for the whole batch and the new books are
+    written with one bulk insert (one commit).
+    `seen` holds dedup keys already handled in this run.
+    Returns (forwarded, skipped) counts.
+    """
+    candidates = [(message, {
+        "title": file_name,
+        "caption": caption,
+        "author": detect_author(f"{file_name} {caption}"),
+        "category": detect_category(f"{file_name} {caption}"),
+        "mime_type": mime_type,
+        "date": str(message.date),
+        "language": 'English',
+    }) for message, file_name, caption, mime_type in batch]
+    existing = existing_dedup_keys([book for _, book in candidates])
+    books = []
+    skipped = 0
+    try:
+        for message, book in candidates:
+            file_name = book["title"]
+            key = dedup_key(file_name, book["author"], book["language"])
+            if key in existing or key in seen:
+                print(f"⏩ Skipping already existing book: {file_name}")
+                skipped += 1
+                continue
+            seen.add(key)
+
+            message_id = forward_to_archive(message)
+            if not message_id:
+                print(f"❌ Failed to forward {file_name}")
+                continue
+
+            # Store in DB (original caption, message_id, etc.)
+            book["file_id"] = str(message_id)
+            books.append(book)
+            print(f"✅ Forwarded {file_name}")
+    finally:
+        # Books already forwarded are saved even if the batch stops early
+        insert_books_bulk(books)
+    return len(books), skipped
+
+
 def scrape_channel(limit=1000):
     allowed_mime_types = [
         "application/pdf",
@@ -235,6 +311,8 @@ def scrape_channel(limit=1000):
         print("📡 Scraping Telegram channel for Reformed books...")
         forwarded_count = 0
         skipped_count = 0
+        seen = set()
+        batch = []
 
         for message in client.iter_messages(CHANNEL_USERNAME, limit=limit):
             if not (message.media and isinstance(message.media, MessageMediaDocument)):
@@ -245,62 +323,25 @@ def scrape_channel(limit=1000):
                 continue
 
             file_name = extract_file_name(message.media.document)
-            caption = message.message or ""
-            category = detect_category(f"{file_name} {caption}")
-            author = detect_author(f"{file_name} {caption}")
-            date = message.date
-            if book_exists(file_name):
-                print(f"⏩ Skipping already existing book: {file_name}")
-                skipped_count += 1
-                continue
+            batch.append((message, file_name, message.message or "", mime_type))
+            if len(batch) >= BATCH_SIZE:
+                forwarded, skipped = save_batch(batch, seen)
+                forwarded_count += forwarded
+                skipped_count += skipped
+                print(f"💾 Saved batch ({forwarded_count} books so far)")
+                batch = []
 
-            # Forward the message to your private channel
-            try:
-                forwarded = client.forward_messages(
-                    ARCHIVE_CHAT_ID,
-                    message.id,
-                    from_peer=CHANNEL_USERNAME
-                )
-            except FloodWaitError as e:
-                print(f"⏳ Flood wait: sleeping for {e.seconds} seconds...")
-                time.sleep(e.seconds)
-                # After sleeping, try again
-                forwarded = client.forward_messages(
-                    ARCHIVE_CHAT_ID,
-                    message.id,
-                    from_peer=CHANNEL_USERNAME
-                )
-
-            # Get message_id from forwarded message
-            message_id = None
-            if forwarded:
-                if isinstance(forwarded, list):
-                    message_id = forwarded[0].id
-                else:
-                    message_id = forwarded.id
-
-            if not message_id:
-                print(f"❌ Failed to forward {file_name}")
-                continue
-
-            # Store in DB (original caption, message_id, etc.)
-            insert_book(
-                title=file_name,
-                caption=caption,
-                author=author,
-                category=category,
-                mime_type=mime_type,
-                file_id=str(message_id),
-                date=str(date),
-                language='English'
-            )
-
-            forwarded_count += 1
-            print(f"✅ Forwarded {file_name} ({forwarded_count})")
+        if batch:
+            forwarded, skipped = save_batch(batch, seen)
+            forwarded_count += forwarded
+            skipped_count += skipped
 
         print(f"\n🎯 Finished forwarding and saving {forwarded_count} books!")
         print(f"⏩ Skipped {skipped_count} books already in database.")
 
+    stats = build_snapshot()
+    print(f"🗂 Rebuilt catalog snapshot ({stats['books']} books)")
+
 # -------------------------------
 # 🔹 Run Script
 # -------------------------------
@@ -0,0 +1,135 @@
+# database/aio.py
+"""
+Async access to the (synchronous) database helpers.
+
+The bot's handlers are coroutines, but sqlite3 calls block. Calling them
+directly on the event loop means one slow query, or a commit waiting on the
+write lock, stalls every other update. `run_db` hands the call to a small
+dedicated thread pool instead:
+
+    books = await run_db(get_books_by_category_page, category_id)
+
+Each pool thread reuses its own connections (database/connection.py).
+At most DB_MAX_PENDING calls are queued or running at once; further callers
+wait on the event loop (without blocking it) for a free slot.
+
+`LoopLagMonitor` measures how late the event loop wakes up from a short
+sleep. Flat lag while the database is busy is the evidence that the loop is
+no longer blocked by DB work.
+"""
+import asyncio
+import collections
+import functools
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+DB_WORKERS = int(os.getenv("DB_WORKERS", "4"))
+DB_MAX_PENDING = int(os.getenv("DB_MAX_PENDING", "64"))
+LOOP_LAG_INTERVAL = 0.1     # seconds between lag probes
+LOOP_LAG_SAMPLES = 600      # keep the last minute of probes
+
+
+class AsyncDB:
+    def __init__(self, workers=DB_WORKERS, max_pending=DB_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.calls = 0
+        self.waited = 0
+        self.in_flight = 0
+        self.reset()
+
+    def reset(self):
+        """Start over with a new pool (after a fork the old one has no threads)."""
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="db")
+        # asyncio primitives belong to one loop; keep a semaphore per loop
+        self._slots = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.in_flight = 0
+
+    def _semaphore(self, loop):
+        with self._lock:
+            semaphore = self._slots.get(loop)
+            if semaphore is None:
+                semaphore = self._slots[loop] = asyncio.Semaphore(self.max_pending)
+            return semaphore
+
+    async def run(self, fn, *args, **kwargs):
+        """Run `fn(*args, **kwargs)` on a DB thread and await its result."""
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphore(loop)
+        if semaphore.locked():
+            self.waited += 1
+        async with semaphore:
+            self.calls += 1
+            self.in_flight += 1
+            try:
+                return await loop.run_in_executor(
+                    self._executor, functools.partial(fn, *args, **kwargs))
+            finally:
+                self.in_flight -= 1
+
+    def stats(self):
+        return {"calls": self.calls, "waited_for_slot": self.waited, "in_flight": self.in_flight}
+
+
+class LoopLagMonitor:
+    """Samples event-loop lag: how much later than requested a sleep returns."""
+
+    def __init__(self, interval=LOOP_LAG_INTERVAL, samples=LOOP_LAG_SAMPLES):
+        self.interval = interval
+        self._samples = collections.deque(maxlen=samples)
+        self._task = None
+
+    def start(self, loop=None):
+        """Start sampling on the running loop (or `loop`). Idempotent."""
+        if self._task is not None and not self._task.done():
+            return
+        loop = loop or asyncio.get_running_loop()
+        self._task = loop.create_task(self._probe())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def reset(self):
+        """Forget the probe without cancelling it (its loop is gone after a fork)."""
+        self._task = None
+
+    async def _probe(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self._samples.append(time.perf_counter() - started - self.interval)
+
+    def stats(self):
+        """Lag in milliseconds over the retained window."""
+        samples = sorted(self._samples)
+        if not samples:
+            return {"samples": 0, "avg_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+        return {
+            "samples": len(samples),
+            "avg_ms": sum(samples) / len(samples) * 1000,
+            "p99_ms": samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000,
+            "max_ms": samples[-1] * 1000,
+        }
+
+
+db_executor = AsyncDB()
+loop_lag = LoopLagMonitor()
+
+
+def _after_fork():
+    # A forked child inherits neither the pool's threads nor a running loop
+    db_executor.reset()
+    loop_lag.reset()
+
+
+os.register_at_fork(after_in_child=_after_fork)
+
+
+async def run_db(fn, *args, **kwargs):
+    return await db_executor.run(fn, *args, **kwargs)
@@ -0,0 +1,227 @@
+# database/analytics.py
+"""
+Daily analytics rollups.
+
+Nothing here scans raw rows at read time. Counters live in `daily_stats`
+(one row per UTC day, metric and language) and the `total_users` entry of
+`meta`:
+
+* new_users     - maintained by a trigger on users
+* active_users  - one per user per day, via user_activity and its trigger
+* searches      - per language, counted from /search
+* downloads     - per language, counted from book downloads
+
+Every download is also appended to the `downloads` log, and the top books
+per language over the last POPULAR_WINDOW_DAYS are recomputed into
+`popular_books` at most every POPULAR_REFRESH_SECONDS, which is what the
+"Most popular" menu reads. The refresh runs when the download writer
+flushes or, on a quiet bot with nothing to flush, when the rankings are
+read after they have gone stale, so the window keeps moving either way.
+
+Handlers only call note_active() / count_event() / record_download(); they
+buffer in memory and the rows are written in batches by WriteBehindQueues
+(database/writer.py). With DB_BACKEND=postgres the SQL functions below are
+replaced by their pg_backend counterparts.
+"""
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from database.connection import get_read_conn, write_transaction
+from database.writer import WriteBehindQueue
+from utils.config import DB_BACKEND
+
+ACTIVITY_RETENTION_DAYS = 2    # user_activity only dedupes the current day
+POPULAR_WINDOW_DAYS = 30       # downloads counted towards "Most popular"
+POPULAR_TOP_N = 10
+POPULAR_REFRESH_SECONDS = 600
+
+
+def _today():
+    return datetime.utcnow().date().isoformat()
+
+
+# -------------------------------
+# Write path
+# -------------------------------
+def record_activity_bulk(rows):
+    """
+    Apply buffered rows in one transaction. Rows are either
+    ("active", day, user_id) or ("event", day, metric, language).
+    """
+    active = {(row[1], row[2]) for row in rows if row[0] == "active"}
+    events = Counter(row[1:] for row in rows if row[0] == "event")
+    with write_transaction() as conn:
+        # Duplicates are ignored, so the trigger counts each user once a day
+        conn.executemany(
+            "INSERT OR IGNORE INTO user_activity (day, user_id) VALUES (?, ?)", active)
+        conn.executemany('''
+            INSERT INTO daily_stats (day, metric, language, value) VALUES (?, ?, ?, ?)
+            ON CONFLICT (day, metric, language) DO UPDATE SET value = value + excluded.value
+        ''', [(day, metric, language, count)
+              for (day, metric, language), count in events.items()])
+        cutoff = (datetime.utcnow().date() - timedelta(days=ACTIVITY_RETENTION_DAYS)).isoformat()
+        conn.execute("DELETE FROM user_activity WHERE day < ?", (cutoff,))
+
+
+# Users already marked active today by this process
+_active_day = None
+_active_users = set()
+_active_lock = threading.Lock()
+
+
+def note_active(user_id):
+    """Count `user_id` as active today (at most one queued row per user and day)."""
+    global _active_day
+    today = _today()
+    with _active_lock:
+        if today != _active_day:
+            _active_day = today
+            _active_users.clear()
+        if user_id in _active_users:
+            return
+        _active_users.add(user_id)
+    activity_writer.put(("active", today, user_id))
+
+
+def count_event(metric, language=""):
+    """Add one to today's `metric` counter for `language`."""
+    activity_writer.put(("event", _today(), metric, language or ""))
+
+
+# -------------------------------
+# Downloads and popularity
+# -------------------------------
+_popular_refreshed_at = 0.0
+
+
+def insert_downloads(rows):
+    """Append (book_id, user_id, downloaded_at) rows to the downloads log."""
+    with write_transaction() as conn:
+        conn.executemany(
+            "INSERT INTO downloads (book_id, user_id, downloaded_at) VALUES (?, ?, ?)", rows)
+
+
+def rank_popular_books(since, top):
+    """Replace popular_books with the top `top` books per language since `since`."""
+    with write_transaction() as conn:
+        conn.execute("DELETE FROM popular_books")
+        conn.execute('''
+            INSERT INTO popular_books (language, rank, book_id, downloads)
+            SELECT language, rank, book_id, downloads FROM (
+                SELECT COALESCE(b.language, 'English') AS language,
+                       d.book_id AS book_id,
+                       COUNT(*) AS downloads,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY COALESCE(b.language, 'English')
+                           ORDER BY COUNT(*) DESC, d.book_id
+                       ) AS rank
+                FROM downloads d JOIN books b ON b.id = d.book_id
+                WHERE d.downloaded_at >= ?
+                GROUP BY d.book_id
+            ) WHERE rank <= ?
+        ''', (since, top))
+
+
+def record_downloads_bulk(rows):
+    """Log buffered downloads, then refresh the rankings if due."""
+    insert_downloads(rows)
+    refresh_popular_books_if_due()
+
+
+def refresh_popular_books(window_days=POPULAR_WINDOW_DAYS, top=POPULAR_TOP_N):
+    """Recompute popular_books: the top `top` books per language over the window."""
+    global _popular_refreshed_at
+    rank_popular_books((datetime.utcnow() - timedelta(days=window_days)).isoformat(), top)
+    _popular_refreshed_at = time.monotonic()
+
+
+def refresh_popular_books_if_due():
+    """Refresh the rankings when the last refresh is POPULAR_REFRESH_SECONDS old."""
+    if time.monotonic() - _popular_refreshed_at >= POPULAR_REFRESH_SECONDS:
+        refresh_popular_books()
+
+
+def record_download(book_id, user_id=None):
+    """Log a download without waiting for a commit."""
+    download_writer.put((book_id, user_id, datetime.utcnow().isoformat()))
+
+
+def read_popular_books(language):
+    """Precomputed (book_id, title, author, downloads) ranking for `language`."""
+    return get_read_conn().execute('''
+        SELECT p.book_id, b.title, b.author, p.downloads
+        FROM popular_books p JOIN books b ON b.id = p.book_id
+        WHERE p.language = ?
+        ORDER BY p.rank
+    ''', (language,)).fetchall()
+
+
+def get_popular_books(language):
+    """The ranking for `language`, refreshed first if it has gone stale."""
+    refresh_popular_books_if_due()
+    return read_popular_books(language)
+
+
+# -------------------------------
+# Read path (cost grows with days, never with users or events)
+# -------------------------------
+def metric_total(metric, since, language=None):
+    """Sum of `metric` from day `since` (YYYY-MM-DD) through today."""
+    sql = "SELECT COALESCE(SUM(value), 0) FROM daily_stats WHERE metric = ? AND day >= ?"
+    params = [metric, since]
+    if language is not None:
+        sql += " AND language = ?"
+        params.append(language)
+    # A range on the (day, metric, language) primary key: a few rows per day
+    return get_read_conn().execute(sql, params).fetchone()[0]
+
+
+def metric_by_language(metric, since):
+    """{language: total} for `metric` since day `since`."""
+    rows = get_read_conn().execute('''
+        SELECT language, SUM(value) FROM daily_stats
+        WHERE metric = ? AND day >= ?
+        GROUP BY language ORDER BY language
+    ''', (metric, since)).fetchall()
+    return dict(rows)
+
+
+def metric_by_day(metric, since):
+    """{day: total} for `metric` since day `since` (days with no rows are absent)."""
+    rows = get_read_conn().execute('''
+        SELECT day, SUM(value) FROM daily_stats
+        WHERE metric = ? AND day >= ?
+        GROUP BY day
+    ''', (metric, since)).fetchall()
+    return dict(rows)
+
+
+def metric_series(metric, days):
+    """[(day, value)] for the last `days` days, oldest first, zero-filled."""
+    today = datetime.utcnow().date()
+    start = today - timedelta(days=days - 1)
+    rows = metric_by_day(metric, start.isoformat())
+    series = []
+    for offset in range(days):
+        day = (start + timedelta(days=offset)).isoformat()
+        series.append((day, rows.get(day, 0)))
+    return series
+
+
+def days_ago(days):
+    """ISO date of the first day in a `days`-day window ending today."""
+    return (datetime.utcnow().date() - timedelta(days=days - 1)).isoformat()
+
+
+# -------------------------------
+# Storage backend and writers
+# -------------------------------
+if DB_BACKEND == "postgres":
+    from database.pg_backend import (  # noqa: F811
+        insert_downloads, metric_by_day, metric_by_language, metric_total,
+        rank_popular_books, read_popular_books, record_activity_bulk)
+
+activity_writer = WriteBehindQueue("activity", record_activity_bulk)
+download_writer = WriteBehindQueue("downloads", record_downloads_bulk)
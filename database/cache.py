@@ -0,0 +1,90 @@
+# database/cache.py
+"""
+In-process read-through cache for catalog data (facet menus and per-facet
+book lists).
+
+Entries are tagged with the catalog version stored in the `meta` table.
+Writers that change the catalog bump that version (see
+db.bump_catalog_version), which makes every cached entry stale at once.
+The version itself is only re-read from the database every
+CATALOG_VERSION_CHECK_SECONDS (or immediately after a write made by this
+process), so repeated menu taps cost no SQL at all.
+"""
+import threading
+import time
+
+from database.connection import get_read_conn
+from utils.config import DB_BACKEND
+
+CATALOG_VERSION_CHECK_SECONDS = 30
+
+
+def get_catalog_version():
+    if DB_BACKEND == "postgres":
+        from database.db import pg_backend
+        return pg_backend.get_catalog_version()
+    row = get_read_conn().execute(
+        "SELECT value FROM meta WHERE key = 'catalog_version'").fetchone()
+    return row[0] if row else 0
+
+
+class CatalogCache:
+    def __init__(self, check_interval=CATALOG_VERSION_CHECK_SECONDS):
+        self.check_interval = check_interval
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _current_version(self):
+        now = time.monotonic()
+        if self._version is None or now - self._checked_at >= self.check_interval:
+            version = get_catalog_version()
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            self._checked_at = now
+        return self._version
+
+    def get(self, key, loader):
+        """Return the cached value for `key`, calling `loader()` on a miss."""
+        with self._lock:
+            version = self._current_version()
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        value = loader()
+        with self._lock:
+            # Only store it if the catalog did not change while loading
+            if self._version == version:
+                self._entries[key] = (version, value)
+        return value
+
+    def version(self):
+        """The catalog version, re-read at most every check_interval seconds."""
+        with self._lock:
+            return self._current_version()
+
+    def invalidate(self):
+        """Force a version re-check on the next lookup (after a local write)."""
+        with self._lock:
+            self._checked_at = 0.0
+            self._version = None
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "catalog_version": self._version,
+            }
+
+
+catalog_cache = CatalogCache()
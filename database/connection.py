@@ -0,0 +1,146 @@
+# database/connection.py
+"""
+Shared SQLite connection layer.
+
+Every thread (and therefore every event loop, since each loop runs in one
+thread) keeps its own long-lived connections instead of paying for a
+connect/teardown and a cold page cache on every query:
+
+* a read-only connection used by the browse/search helpers, and
+* a writer connection used for inserts and commits.
+
+The database runs in WAL mode so readers never block on a writer's commit
+(e.g. `record_user` during a traffic spike) and the writer never waits for
+readers to finish.
+
+Connections are also per process. A SQLite handle must not be used on both
+sides of a fork, so a forked child (a gunicorn/uWSGI worker) drops the ones
+it inherited, unclosed, and opens its own. Several processes can then share
+the file: WAL lets them read concurrently, and their writers take turns on
+the write lock (waiting up to BUSY_TIMEOUT_MS).
+"""
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+
+from utils.config import DB_BACKEND
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.getenv("BOOKS_DB_PATH", os.path.join(BASE_DIR, 'data', 'books.db'))
+
+# Tuning applied once when a connection is opened
+BUSY_TIMEOUT_MS = 5000
+CACHE_SIZE_KIB = 16384          # 16 MiB page cache per connection
+MMAP_SIZE = 64 * 1024 * 1024    # 64 MiB memory-mapped I/O
+
+_local = threading.local()
+_wal_lock = threading.Lock()
+_wal_ready = set()
+
+
+def _apply_pragmas(conn):
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KIB}")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+
+
+def _ensure_wal(path):
+    """Switch the database file to WAL mode (persistent, so only done once)."""
+    if path in _wal_ready:
+        return
+    with _wal_lock:
+        if path in _wal_ready:
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000)
+        try:
+            conn.execute("PRAGMA journal_mode = WAL")
+        finally:
+            conn.close()
+        _wal_ready.add(path)
+
+
+def _open_writer(path):
+    _ensure_wal(path)
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000)
+    _apply_pragmas(conn)
+    # NORMAL is durable across application crashes in WAL mode and avoids
+    # an fsync on every commit
+    conn.execute("PRAGMA synchronous = NORMAL")
+    return conn
+
+
+def _open_reader(path):
+    _ensure_wal(path)
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True,
+                           timeout=BUSY_TIMEOUT_MS / 1000)
+    _apply_pragmas(conn)
+    conn.execute("PRAGMA query_only = ON")
+    return conn
+
+
+def _cached(kind, opener):
+    conns = getattr(_local, "conns", None)
+    if conns is None or _local.pid != os.getpid():
+        # Closing the parent's handles here could roll back its transactions
+        conns = _local.conns = {}
+        _local.pid = os.getpid()
+    key = (kind, DB_PATH)
+    conn = conns.get(key)
+    if conn is None:
+        conn = conns[key] = opener(DB_PATH)
+    return conn
+
+
+def get_read_conn():
+    """Return this thread's read-only connection (opened on first use)."""
+    return _cached("read", _open_reader)
+
+
+def get_write_conn():
+    """Return this thread's writer connection (opened on first use)."""
+    return _cached("write", _open_writer)
+
+
+@contextmanager
+def write_transaction():
+    """Run a block of writes in one transaction on the writer connection.
+
+    Commits on success and rolls back if the block raises:
+
+        with write_transaction() as conn:
+            conn.execute("INSERT ...")
+    """
+    conn = get_write_conn()
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def _after_fork():
+    global _local, _wal_lock
+    _local = threading.local()
+    _wal_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_after_fork)
+
+
+def require_sqlite(script):
+    """Exit with an error when an SQLite-only maintenance script runs with DB_BACKEND=postgres."""
+    if DB_BACKEND == "postgres":
+        sys.exit(f"{script} works on the SQLite database only and cannot run with DB_BACKEND=postgres")
+
+
+def close_connections():
+    """Close this thread's connections (e.g. at shutdown or in tests)."""
+    conns = getattr(_local, "conns", None) or {}
+    for conn in conns.values():
+        conn.close()
+    conns.clear()
@@ -1,40 +1,155 @@
 # database/db.py
-import sqlite3
-import os
+from collections import namedtuple
 from datetime import datetime
 
-BASE_DIR = os.path.dirname(os.path.dirname(__file__))
-DB_PATH = os.path.join(BASE_DIR, 'data', 'books.db')
+from database.cache import catalog_cache
+from database.connection import DB_PATH, get_read_conn, write_transaction
+from utils.config import DB_BACKEND
+from utils.search import (MIN_INFIX_LENGTH, build_match_query, dedup_key, infix_grams,
+                          normalize_search_text, tokenize)
+
+SEARCH_RESULT_LIMIT = 100
+PAGE_SIZE = 20
+BULK_CHUNK_SIZE = 500      # rows per executemany() call in insert_books_bulk
+MAX_SQL_PARAMS = 900       # below SQLite's default 999 host-parameter limit
+
+# One page of a keyset-paginated list
+Page = namedtuple("Page", "rows has_prev has_next")
 
 
 # -------------------------------
 # Book Operations
 # -------------------------------
+def bump_catalog_version(conn):
+    """Mark the catalog as changed; call inside the writing transaction."""
+    conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'catalog_version'")
+
+
+def search_keys(title, author, category, caption):
+    """Folded (title_key, author_key, category_key, caption_key) for a book row."""
+    return (normalize_search_text(title), normalize_search_text(author),
+            normalize_search_text(category), normalize_search_text(caption))
+
+
+def add_search_terms(conn, keys):
+    """
+    Record the terms of new search keys, and their grams, so infix_terms()
+    can find them; call inside the writing transaction.
+    """
+    terms = {t for key in keys for t in tokenize(key) if len(t) > MIN_INFIX_LENGTH}
+    for term in terms:
+        cursor = conn.execute("INSERT OR IGNORE INTO search_terms (term) VALUES (?)", (term,))
+        if cursor.rowcount:
+            conn.executemany("INSERT INTO search_term_grams (gram, term_id) VALUES (?, ?)",
+                             [(gram, cursor.lastrowid) for gram in infix_grams(term)])
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
 def insert_book(title, caption, author=None, category=None, tags=None,
                 mime_type=None, file_id=None, file_path=None, date=None,
                 language='English'):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO books (title, caption, author, category, tags, mime_type,
-                           file_id, file_path, date, language)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (title, caption, author, category, tags, mime_type, file_id,
-          file_path, date, language))
-    conn.commit()
-    conn.close()
-
-
-def book_exists(title, file_id=None):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    """
+    Insert one book. Returns its id, or None if a book with the same
+    dedup key (normalized language, author and title) is already in the
+    catalog.
+    """
+    keys = search_keys(title, author, category, caption)
+    with write_transaction() as conn:
+        cursor = conn.execute('''
+            INSERT OR IGNORE INTO books (title, caption, author, category, tags, mime_type,
+                                         file_id, file_path, date, language,
+                                         title_key, author_key, category_key, caption_key,
+                                         dedup_key)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (title, caption, author, category, tags, mime_type, file_id,
+              file_path, date, language, *keys,
+              dedup_key(title, author, language)))
+        if cursor.rowcount == 0:
+            return None
+        add_search_terms(conn, keys)
+        bump_catalog_version(conn)
+    catalog_cache.invalidate()
+    return cursor.lastrowid
+
+
+def insert_books_bulk(books, chunk_size=BULK_CHUNK_SIZE):
+    """
+    Insert many books in one transaction.
+
+    `books` is a list of dicts with insert_book's keyword arguments. Rows
+    are written with executemany() in chunks of `chunk_size`, and the whole
+    batch costs a single commit and a single catalog version bump. Books
+    whose dedup key already exists (in the catalog or earlier in the batch)
+    are skipped. Returns the number of rows inserted.
+    """
+    if not books:
+        return 0
+    rows = []
+    for book in books:
+        title, caption = book["title"], book.get("caption")
+        author, category = book.get("author"), book.get("category")
+        language = book.get("language", "English")
+        rows.append((title, caption, author, category, book.get("tags"),
+                     book.get("mime_type"), book.get("file_id"), book.get("file_path"),
+                     book.get("date"), language,
+                     *search_keys(title, author, category, caption),
+                     dedup_key(title, author, language)))
+    inserted = 0
+    with write_transaction() as conn:
+        for chunk in _chunks(rows, chunk_size):
+            cursor = conn.executemany('''
+                INSERT OR IGNORE INTO books (title, caption, author, category, tags, mime_type,
+                                             file_id, file_path, date, language,
+                                             title_key, author_key, category_key, caption_key,
+                                             dedup_key)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', chunk)
+            inserted += cursor.rowcount
+        if inserted:
+            add_search_terms(conn, (key for row in rows for key in row[10:14]))
+            bump_catalog_version(conn)
+    if inserted:
+        catalog_cache.invalidate()
+    return inserted
+
+
+def _existing_values(column, values):
+    values = list({v for v in values if v})
+    found = set()
+    conn = get_read_conn()
+    for chunk in _chunks(values, MAX_SQL_PARAMS):
+        placeholders = ",".join("?" * len(chunk))
+        found.update(row[0] for row in conn.execute(
+            f"SELECT {column} FROM books WHERE {column} IN ({placeholders})", chunk))
+    return found
+
+
+def existing_dedup_keys(books):
+    """
+    The dedup keys of `books` (dicts with "title", "author" and "language")
+    that are already in the catalog, looked up with one query per chunk.
+    "Christ_Crucified.pdf" matches "Christ Crucified.epub" by the same
+    author in the same language.
+    """
+    return _existing_values("dedup_key", [
+        dedup_key(book["title"], book.get("author"), book.get("language", "English"))
+        for book in books])
+
+
+def book_exists(title, file_id=None, author=None, language='English'):
+    """True if a book with the same dedup key (or `file_id`) is stored."""
+    cursor = get_read_conn().cursor()
+    key = dedup_key(title, author, language)
     if file_id:
-        cursor.execute("SELECT 1 FROM books WHERE title=? OR file_id=?",
-                        (title, file_id))
+        cursor.execute("SELECT 1 FROM books WHERE dedup_key=? OR file_id=?",
+                        (key, file_id))
     else:
-        cursor.execute("SELECT 1 FROM books WHERE title=?", (title,))
+        cursor.execute("SELECT 1 FROM books WHERE dedup_key=?", (key,))
     exists = cursor.fetchone() is not None
-    conn.close()
     return exists
 
 
@@ -42,78 +157,261 @@ def book_exists(title, file_id=None):
 # Language-aware Queries
 # -------------------------------
 def get_categories_by_language(language):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    cursor = get_read_conn().cursor()
     cursor.execute(
-        'SELECT DISTINCT category FROM books WHERE language = ? AND category IS NOT NULL ORDER BY category ASC',
+        'SELECT name FROM categories WHERE language = ? AND book_count > 0 ORDER BY name ASC',
         (language,))
     rows = cursor.fetchall()
-    conn.close()
     return [r[0] for r in rows if r[0]]
 
 
 def get_authors_by_language(language):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    cursor = get_read_conn().cursor()
     cursor.execute(
-        'SELECT DISTINCT author FROM books WHERE language = ? AND author IS NOT NULL ORDER BY author ASC',
+        'SELECT name FROM authors WHERE language = ? AND book_count > 0 ORDER BY name ASC',
         (language,))
     rows = cursor.fetchall()
-    conn.close()
     return [r[0] for r in rows if r[0]]
 
 
 def get_books_by_category_and_language(category, language):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    cursor = get_read_conn().cursor()
     cursor.execute(
         'SELECT id, title, author, file_id FROM books WHERE category = ? AND language = ? ORDER BY title ASC',
         (category, language))
     books = cursor.fetchall()
-    conn.close()
     return books
 
 
 def get_books_by_author_and_language(author, language):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    cursor = get_read_conn().cursor()
     cursor.execute(
         'SELECT id, title, author, file_id FROM books WHERE author = ? AND language = ? ORDER BY title ASC',
         (author, language))
     books = cursor.fetchall()
-    conn.close()
     return books
 
 
+def infix_terms(token):
+    """
+    Every indexed term that contains `token` after its first letter (see
+    utils.search.build_match_query): the terms that have all of its grams,
+    checked for the whole word.
+    """
+    grams = sorted(infix_grams(token, start=0))
+    having_all = " INTERSECT ".join(["SELECT term_id FROM search_term_grams WHERE gram = ?"] * len(grams))
+    rows = get_read_conn().execute(
+        f"SELECT term FROM search_terms WHERE id IN ({having_all}) AND instr(term, ?) > 1",
+        (*grams, token))
+    return [term for (term,) in rows]
+
+
 def search_books_by_language(keyword, language):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute(
-        'SELECT id, title, author FROM books WHERE (title LIKE ? OR author LIKE ?) AND language = ?',
-        (f'%{keyword}%', f'%{keyword}%', language))
-    results = cursor.fetchall()
-    conn.close()
-    return results
+    return search_books_fts(keyword, language)
+
+
+def search_books_fts(keyword, language=None, limit=SEARCH_RESULT_LIMIT):
+    """
+    Full-text search over title, author, category and caption.
+
+    Words are matched as prefixes, or inside a longer indexed word (see
+    infix_terms), and results come back best-first (bm25).
+    Returns a list of (id, title, author).
+    """
+    match = build_match_query(keyword, infix_terms)
+    if not match:
+        return []
+    cursor = get_read_conn().cursor()
+    if language:
+        cursor.execute('''
+            SELECT b.id, b.title, b.author
+            FROM books_fts
+            JOIN books b ON b.id = books_fts.rowid
+            WHERE books_fts MATCH ? AND b.language = ?
+            ORDER BY books_fts.rank
+            LIMIT ?
+        ''', (match, language, limit))
+    else:
+        cursor.execute('''
+            SELECT b.id, b.title, b.author
+            FROM books_fts
+            JOIN books b ON b.id = books_fts.rowid
+            WHERE books_fts MATCH ?
+            ORDER BY books_fts.rank
+            LIMIT ?
+        ''', (match, limit))
+    return cursor.fetchall()
+
+
+# -------------------------------
+# Keyset pagination
+# -------------------------------
+def _finish_page(rows, direction, anchored, page_size):
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if direction == "p":
+        rows.reverse()
+        return Page(rows, has_more, anchored)
+    return Page(rows, anchored, has_more)
+
+
+def keyset_page(table, columns, where, params, order, anchor_id=None,
+                direction="n", page_size=PAGE_SIZE):
+    """
+    Fetch one page of `table` rows ordered by (order, id).
+
+    Instead of OFFSET, the page seeks past the (order, id) key of the anchor
+    row: direction "n" returns the rows after `anchor_id`, "p" the rows
+    before it. With an index on (<where columns>, order) this is a bounded
+    range scan however deep the page is. `where` and `order` are trusted
+    SQL fragments; only `params` and the anchor come from callers.
+    """
+    cmp, sort = (">", "ASC") if direction == "n" else ("<", "DESC")
+    sql = f"SELECT {columns} FROM {table} WHERE {where}"
+    args = list(params)
+    if anchor_id is not None:
+        sql += f" AND ({order}, id) {cmp} (SELECT {order}, id FROM {table} WHERE id = ?)"
+        args.append(anchor_id)
+    sql += f" ORDER BY {order} {sort}, id {sort} LIMIT ?"
+    args.append(page_size + 1)
+    rows = get_read_conn().execute(sql, args).fetchall()
+    return _finish_page(rows, direction, anchor_id is not None, page_size)
+
+
+def categories_page(language, direction="n", anchor=None):
+    """Page of (category_id, name, book_count) rows for the category menu."""
+    return keyset_page("categories", "id, name, book_count",
+                       "language = ? AND book_count > 0", (language,),
+                       "name", anchor, direction)
+
+
+def authors_page(language, direction="n", anchor=None):
+    """Page of (author_id, name, book_count) rows for the author menu."""
+    return keyset_page("authors", "id, name, book_count",
+                       "language = ? AND book_count > 0", (language,),
+                       "name", anchor, direction)
+
+
+def books_by_category_page(category_id, direction="n", anchor=None):
+    """Page of (id, title, author, file_id) rows in one category."""
+    return keyset_page("books", "id, title, author, file_id",
+                       "category_id = ?", (category_id,),
+                       "title", anchor, direction)
+
+
+def books_by_author_page(author_id, direction="n", anchor=None):
+    """Page of (id, title, author, file_id) rows by one author."""
+    return keyset_page("books", "id, title, author, file_id",
+                       "author_id = ?", (author_id,),
+                       "title", anchor, direction)
+
+
+def search_books_page(keyword, language=None, direction="n", anchor=None,
+                      page_size=PAGE_SIZE):
+    """
+    One page of full-text search results as (id, title, author, rank) rows.
+
+    Results are ordered by (rank, id); `anchor` is the (rank, id) of the
+    first ("p") or last ("n") row of the neighbouring page.
+    """
+    match = build_match_query(keyword, infix_terms)
+    if not match:
+        return Page([], False, False)
+    cmp, sort = (">", "ASC") if direction == "n" else ("<", "DESC")
+    sql = '''
+        SELECT b.id, b.title, b.author, books_fts.rank
+        FROM books_fts
+        JOIN books b ON b.id = books_fts.rowid
+        WHERE books_fts MATCH ?
+    '''
+    args = [match]
+    if language:
+        sql += " AND b.language = ?"
+        args.append(language)
+    if anchor is not None:
+        sql += f" AND (books_fts.rank, b.id) {cmp} (?, ?)"
+        args.extend(anchor)
+    sql += f" ORDER BY books_fts.rank {sort}, b.id {sort} LIMIT ?"
+    args.append(page_size + 1)
+    rows = get_read_conn().execute(sql, args).fetchall()
+    return _finish_page(rows, direction, anchor is not None, page_size)
 
 
 def get_book_by_id(book_id):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    cursor = get_read_conn().cursor()
     cursor.execute("SELECT title, file_id FROM books WHERE id=?", (book_id,))
     book = cursor.fetchone()
-    conn.close()
     return book
 
 
+def get_book_facet_ids(book_id):
+    """(category_id, author_id) of a book, or None."""
+    return get_read_conn().execute(
+        "SELECT category_id, author_id FROM books WHERE id = ?", (book_id,)).fetchone()
+
+
+def get_category_by_id(category_id):
+    """(name, language) of a category, or None."""
+    return get_read_conn().execute(
+        "SELECT name, language FROM categories WHERE id = ?", (category_id,)).fetchone()
+
+
+def get_author_by_id(author_id):
+    """(name, language) of an author, or None."""
+    return get_read_conn().execute(
+        "SELECT name, language FROM authors WHERE id = ?", (author_id,)).fetchone()
+
+
+def get_books_since(last_id):
+    """(id, title, author, language) of books with id > last_id, in id order."""
+    return get_read_conn().execute(
+        "SELECT id, title, author, language FROM books WHERE id > ? ORDER BY id",
+        (last_id,)).fetchall()
+
+
+def get_books_by_ids(book_ids):
+    """(id, title, author) rows for `book_ids` (missing ids are skipped)."""
+    rows = []
+    conn = get_read_conn()
+    for chunk in _chunks(list(book_ids), MAX_SQL_PARAMS):
+        placeholders = ",".join("?" * len(chunk))
+        rows.extend(conn.execute(
+            f"SELECT id, title, author FROM books WHERE id IN ({placeholders})", chunk))
+    return rows
+
+
+def export_catalog():
+    """
+    The whole browsable catalog, read in one transaction (for the snapshot
+    builder): {"catalog_version", "books", "categories", "authors"}, with
+    books as (id, title, author, file_id, language, category_id, author_id)
+    and facets as (id, language, name, book_count).
+    """
+    conn = get_read_conn()
+    conn.execute("BEGIN")
+    try:
+        version = conn.execute(
+            "SELECT value FROM meta WHERE key = 'catalog_version'").fetchone()[0]
+        books = conn.execute('''
+            SELECT id, title, author, file_id, COALESCE(language, 'English'), category_id,
+                   author_id
+            FROM books ORDER BY id
+        ''').fetchall()
+        categories = conn.execute("SELECT id, language, name, book_count FROM categories").fetchall()
+        authors = conn.execute("SELECT id, language, name, book_count FROM authors").fetchall()
+    finally:
+        conn.rollback()
+    return {"catalog_version": version, "books": books,
+            "categories": categories, "authors": authors}
+
+
 # -------------------------------
 # Legacy queries (backward compatible)
 # -------------------------------
 def get_all_books():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    cursor = get_read_conn().cursor()
     cursor.execute('SELECT id, title, caption, author, category, tags, mime_type, file_id, file_path, date FROM books')
     rows = cursor.fetchall()
-    conn.close()
     return [
         {"id": r[0], "title": r[1], "caption": r[2], "author": r[3],
          "category": r[4], "tags": r[5], "mime_type": r[6], "file_id": r[7],
@@ -123,20 +421,16 @@ def get_all_books():
 
 
 def get_all_categories():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    cursor = get_read_conn().cursor()
     cursor.execute('SELECT DISTINCT category FROM books ORDER BY category ASC')
     rows = cursor.fetchall()
-    conn.close()
     return [r[0] for r in rows if r[0]]
 
 
 def get_all_authors():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    cursor = get_read_conn().cursor()
     cursor.execute('SELECT DISTINCT author FROM books ORDER BY author ASC')
     rows = cursor.fetchall()
-    conn.close()
     return [r[0] for r in rows if r[0]]
 
 
@@ -145,44 +439,123 @@ def get_all_authors():
 # -------------------------------
 def record_user(user_id, username=None, first_name=None):
     """Record a user on first visit (INSERT OR IGNORE)."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT OR IGNORE INTO users (user_id, username, first_name, joined_at)
-        VALUES (?, ?, ?, ?)
-    ''', (user_id, username, first_name, datetime.utcnow().isoformat()))
-    conn.commit()
-    conn.close()
+    with write_transaction() as conn:
+        conn.execute('''
+            INSERT OR IGNORE INTO users (user_id, username, first_name, joined_at)
+            VALUES (?, ?, ?, ?)
+        ''', (user_id, username, first_name, datetime.utcnow().isoformat()))
+
+
+def record_users_bulk(users):
+    """Insert many (user_id, username, first_name, joined_at) rows in one transaction."""
+    with write_transaction() as conn:
+        conn.executemany('''
+            INSERT OR IGNORE INTO users (user_id, username, first_name, joined_at)
+            VALUES (?, ?, ?, ?)
+        ''', users)
 
 
 def get_monthly_user_count():
-    """Count unique users who joined in the current month."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    now = datetime.utcnow()
-    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0).isoformat()
-    cursor.execute(
-        "SELECT COUNT(*) FROM users WHERE joined_at >= ?",
-        (month_start,))
+    """Count users who joined in the current month (from the daily rollups)."""
+    cursor = get_read_conn().cursor()
+    month_start = datetime.utcnow().date().replace(day=1).isoformat()
+    cursor.execute('''
+        SELECT COALESCE(SUM(value), 0) FROM daily_stats
+        WHERE metric = 'new_users' AND day >= ?
+    ''', (month_start,))
     count = cursor.fetchone()[0]
-    conn.close()
     return count
 
 
 def get_total_user_count():
-    """Count all unique users."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(*) FROM users")
-    count = cursor.fetchone()[0]
-    conn.close()
-    return count
+    """Count all unique users (kept in meta by a trigger on users)."""
+    cursor = get_read_conn().cursor()
+    cursor.execute("SELECT value FROM meta WHERE key = 'total_users'")
+    row = cursor.fetchone()
+    return row[0] if row else 0
 
 def get_all_users():
     """Get a list of all user IDs."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    cursor = get_read_conn().cursor()
     cursor.execute("SELECT user_id FROM users")
     users = [row[0] for row in cursor.fetchall()]
-    conn.close()
-    return users
\ No newline at end of file
+    return users
+
+
+# -------------------------------
+# Bot persistence (see bot/persistence.py)
+# -------------------------------
+def load_user_data(user_id):
+    """The stored user_data JSON of one user, or None."""
+    row = get_read_conn().execute(
+        "SELECT data FROM user_data WHERE user_id = ?", (user_id,)).fetchone()
+    return row[0] if row else None
+
+
+def save_user_data_bulk(rows):
+    """Write (user_id, data JSON) rows in one transaction; data None deletes the user's row."""
+    now = datetime.utcnow().isoformat()
+    with write_transaction() as conn:
+        conn.executemany("DELETE FROM user_data WHERE user_id = ?",
+                         [(user_id,) for user_id, data in rows if data is None])
+        conn.executemany('''
+            INSERT INTO user_data (user_id, data, updated_at) VALUES (?, ?, ?)
+            ON CONFLICT (user_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at
+        ''', [(user_id, data, now) for user_id, data in rows if data is not None])
+
+
+def load_conversations(name):
+    """(key JSON, state JSON) rows of one persistent ConversationHandler."""
+    return get_read_conn().execute(
+        "SELECT key, state FROM conversations WHERE name = ?", (name,)).fetchall()
+
+
+def save_conversations_bulk(rows):
+    """Write (name, key JSON, state JSON) rows in one transaction; state None ends the conversation."""
+    with write_transaction() as conn:
+        conn.executemany("DELETE FROM conversations WHERE name = ? AND key = ?",
+                         [(name, key) for name, key, state in rows if state is None])
+        conn.executemany('''
+            INSERT INTO conversations (name, key, state) VALUES (?, ?, ?)
+            ON CONFLICT (name, key) DO UPDATE SET state = excluded.state
+        ''', [row for row in rows if row[2] is not None])
+
+
+# -------------------------------
+# Webhook redelivery suppression (see bot/update_dedup.py)
+# -------------------------------
+def claim_update(update_id, keep):
+    """
+    Record update_id as seen; False if some process already has. Ids more
+    than `keep` below it are forgotten.
+    """
+    with write_transaction() as conn:
+        claimed = conn.execute("INSERT OR IGNORE INTO seen_updates (update_id) VALUES (?)",
+                               (update_id,)).rowcount == 1
+        conn.execute("DELETE FROM seen_updates WHERE update_id < ?", (update_id - keep,))
+    return claimed
+
+
+def release_update(update_id):
+    """Forget a claimed update_id, so its redelivery is processed."""
+    with write_transaction() as conn:
+        conn.execute("DELETE FROM seen_updates WHERE update_id = ?", (update_id,))
+
+
+# -------------------------------
+# Storage backend
+# -------------------------------
+# With DB_BACKEND=postgres every function above that runs SQL is replaced
+# by its pooled PostgreSQL counterpart; the rest (and every caller) is shared.
+if DB_BACKEND == "postgres":
+    from database import pg_backend
+    from database.pg_backend import (  # noqa: F811
+        _existing_values, authors_page, book_exists, books_by_author_page,
+        books_by_category_page, categories_page, claim_update, export_catalog, get_all_authors,
+        get_all_books, get_all_categories, get_all_users, get_author_by_id, get_authors_by_language,
+        get_book_by_id, get_book_facet_ids, get_books_by_author_and_language,
+        get_books_by_category_and_language, get_books_by_ids, get_books_since,
+        get_categories_by_language, get_category_by_id,
+        get_monthly_user_count, get_total_user_count, infix_terms, insert_book, insert_books_bulk,
+        load_conversations, load_user_data, record_user, record_users_bulk, release_update,
+        save_conversations_bulk, save_user_data_bulk, search_books_fts, search_books_page)
@@ -12,53 +12,69 @@ import sqlite3
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from channel_scraper.amharic_scraper import extract_author_from_caption, detect_amharic_category, extract_title_from_caption
-
-BASE_DIR = os.path.dirname(os.path.dirname(__file__))
-DB_PATH = os.path.join(BASE_DIR, 'data', 'books.db')
+from database.connection import require_sqlite, write_transaction
+from database.db import add_search_terms, bump_catalog_version, search_keys
+from database.snapshot import build_snapshot
+from utils.search import dedup_key
 
 def fix_records():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    with write_transaction() as conn:
+        cursor = conn.cursor()
     
-    # Get all Amharic books that have Unknown author
-    cursor.execute("SELECT id, title, caption, category, author, file_path FROM books WHERE language = 'Amharic'")
-    books = cursor.fetchall()
+        # Get all Amharic books that have Unknown author
+        cursor.execute("SELECT id, title, caption, category, author, file_path FROM books WHERE language = 'Amharic'")
+        books = cursor.fetchall()
     
-    updated_count = 0
+        updated_count = 0
     
-    for book_id, title, caption, category, author, file_path in books:
-        if not caption:
-            continue
+        for book_id, title, caption, category, author, file_path in books:
+            if not caption:
+                continue
             
-        new_author = extract_author_from_caption(caption)
-        new_title = extract_title_from_caption(caption, title)
-        new_category = detect_amharic_category(f"{new_title} {caption}")
+            new_author = extract_author_from_caption(caption)
+            new_title = extract_title_from_caption(caption, title)
+            new_category = detect_amharic_category(f"{new_title} {caption}")
         
-        needs_update = False
+            needs_update = False
         
-        # Check if we improved the author
-        if new_author != "Unknown" and author != new_author:
-            needs_update = True
-            
-        # Check if we improved the category
-        if new_category != "Other" and category != new_category:
-            needs_update = True
+            # Check if we improved the author
+            if new_author != "Unknown" and author != new_author:
+                needs_update = True
             
-        if needs_update:
-            cursor.execute('''
-                UPDATE books 
-                SET title = ?, author = ?, category = ? 
-                WHERE id = ?
-            ''', (new_title, new_author, new_category, book_id))
-            updated_count += 1
-            print(f"✅ Fixed Book ID {book_id}:")
-            print(f"   Old -> {author} | {category}")
-            print(f"   New -> {new_author} | {new_category}")
+            # Check if we improved the category
+            if new_category != "Other" and category != new_category:
+                needs_update = True
             
-    conn.commit()
-    conn.close()
+            if needs_update:
+                keys = search_keys(new_title, new_author, new_category, caption)
+                try:
+                    cursor.execute('''
+                        UPDATE books 
+                        SET title = ?, author = ?, category = ?,
+                            title_key = ?, author_key = ?, category_key = ?, caption_key = ?,
+                            dedup_key = ?
+                        WHERE id = ?
+                    ''', (new_title, new_author, new_category, *keys,
+                          dedup_key(new_title, new_author, 'Amharic'), book_id))
+                except sqlite3.IntegrityError:
+                    # The corrected title/author is a book the catalog already has
+                    print(f"⚠️ Skipped Book ID {book_id}: {new_title} by {new_author} "
+                          f"is already in the database; left unchanged")
+                    continue
+                add_search_terms(conn, keys)
+                updated_count += 1
+                print(f"✅ Fixed Book ID {book_id}:")
+                print(f"   Old -> {author} | {category}")
+                print(f"   New -> {new_author} | {new_category}")
+
+        if updated_count:
+            bump_catalog_version(conn)
     
     print(f"\n🎯 Successfully updated {updated_count} books in the database.")
+    if updated_count:
+        stats = build_snapshot()
+        print(f"🗂 Rebuilt catalog snapshot ({stats['books']} books)")
 
 if __name__ == "__main__":
+    require_sqlite("fix_unknown_authors.py")
     fix_records()
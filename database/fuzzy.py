@@ -0,0 +1,93 @@
+# database/fuzzy.py
+"""
+Typo-tolerant fallback search ("Spurgon" -> Spurgeon, "Bavinc" -> Bavinck).
+
+Every word of every title and author is kept in a per-language trigram
+index in memory. The index is built on first use and then grown
+incrementally: each lookup first pulls in books whose id is above the last
+one indexed, so rows added by insert_book (in this process or a scraper)
+show up without a rebuild.
+
+On PostgreSQL with the pg_trgm extension the same search runs in the
+database instead (pg_backend.fuzzy_search_books), with no index in memory.
+"""
+import heapq
+import threading
+import time
+
+from database.db import get_books_by_ids, get_books_since
+from utils.config import DB_BACKEND
+from utils.search import TrigramIndex, normalize_search_text, strip_file_extension, tokenize
+
+FUZZY_BUDGET_MS = 50       # stop scanning postings after this long
+MIN_WORD_LENGTH = 3        # shorter words match far too much
+MATCHES_PER_WORD = 5       # vocabulary words considered per query word
+
+_IGNORED_AUTHORS = {"unknown"}
+
+_lock = threading.Lock()
+_indexes = {}        # language -> TrigramIndex
+_last_book_id = 0
+
+
+def _book_words(title, author):
+    words = set()
+    if title:
+        words.update(tokenize(normalize_search_text(strip_file_extension(title))))
+    if author and author.lower() not in _IGNORED_AUTHORS:
+        words.update(tokenize(normalize_search_text(author)))
+    return [w for w in words if len(w) >= MIN_WORD_LENGTH]
+
+
+def _refresh():
+    """Index books added since the last refresh. Caller holds _lock."""
+    global _last_book_id
+    rows = get_books_since(_last_book_id)
+    for book_id, title, author, language in rows:
+        index = _indexes.setdefault(language or "English", TrigramIndex())
+        for word in _book_words(title, author):
+            index.add(word, book_id)
+    if rows:
+        _last_book_id = rows[-1][0]
+
+
+def fuzzy_search_books(keyword, language=None, limit=10, budget_ms=FUZZY_BUDGET_MS):
+    """
+    Return up to `limit` (id, title, author) books whose title/author words
+    are closest to the words in `keyword`, best first.
+    """
+    if DB_BACKEND == "postgres":
+        from database.db import pg_backend
+        if pg_backend.has_trigram_search():
+            return pg_backend.fuzzy_search_books(keyword, language, limit)
+
+    words = [w for w in tokenize(normalize_search_text(keyword))
+             if len(w) >= MIN_WORD_LENGTH]
+    if not words:
+        return []
+
+    scores = {}
+    with _lock:
+        _refresh()
+        deadline = time.perf_counter() + budget_ms / 1000
+        if language:
+            indexes = [_indexes[language]] if language in _indexes else []
+        else:
+            indexes = list(_indexes.values())
+        for word in words:
+            best = {}
+            for index in indexes:
+                for similarity, _, book_ids in index.lookup(
+                        word, limit=MATCHES_PER_WORD, deadline=deadline):
+                    for book_id in book_ids:
+                        best[book_id] = max(best.get(book_id, 0.0), similarity)
+            for book_id, similarity in best.items():
+                scores[book_id] = scores.get(book_id, 0.0) + similarity
+
+    top = [book_id for book_id, _ in heapq.nlargest(limit, scores.items(), key=lambda kv: kv[1])]
+    if not top:
+        return []
+    rows = get_books_by_ids(top)
+    # Deleted books simply drop out; keep the similarity order
+    by_id = {row[0]: row for row in rows}
+    return [by_id[book_id] for book_id in top if book_id in by_id]
@@ -0,0 +1,476 @@
+# database/migrations.py
+"""
+Versioned schema migrations, tracked with `PRAGMA user_version`.
+
+Each migration runs once, inside its own transaction, and is followed by an
+ANALYZE pass so the query planner has fresh statistics for new indexes.
+To change the schema, append a new (version, description, function) entry
+to MIGRATIONS — never edit one that has already shipped.
+"""
+import logging
+
+from utils.search import MIN_INFIX_LENGTH, dedup_key, infix_grams, normalize_search_text
+
+logger = logging.getLogger(__name__)
+
+
+def _add_language_column(conn):
+    columns = [col[1] for col in conn.execute("PRAGMA table_info(books)")]
+    if "language" not in columns:
+        conn.execute("ALTER TABLE books ADD COLUMN language TEXT DEFAULT 'English'")
+
+
+def _add_browse_indexes(conn):
+    # Category browse: WHERE language = ? AND category = ? ORDER BY title,
+    # and the per-language category list (GROUP BY category)
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_books_lang_category
+        ON books (language, category, title, author, file_id)
+    ''')
+    # Author browse: WHERE language = ? AND author = ? ORDER BY title,
+    # and the per-language author list (GROUP BY author)
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_books_lang_author
+        ON books (language, author, title, file_id)
+    ''')
+    # book_exists(title, file_id) and the scrapers' duplicate checks
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_books_title ON books (title)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_books_file_id ON books (file_id)")
+    # get_monthly_user_count: WHERE joined_at >= ?
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_users_joined_at ON users (joined_at)")
+
+
+def _add_fulltext_search(conn):
+    # External-content FTS5 index over books, ranked with bm25 weighted
+    # title > author > category > caption
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+            title, author, category, caption,
+            content='books', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS books_fts_ai AFTER INSERT ON books BEGIN
+            INSERT INTO books_fts (rowid, title, author, category, caption)
+            VALUES (new.id, new.title, new.author, new.category, new.caption);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS books_fts_ad AFTER DELETE ON books BEGIN
+            INSERT INTO books_fts (books_fts, rowid, title, author, category, caption)
+            VALUES ('delete', old.id, old.title, old.author, old.category, old.caption);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS books_fts_au
+        AFTER UPDATE OF title, author, category, caption ON books BEGIN
+            INSERT INTO books_fts (books_fts, rowid, title, author, category, caption)
+            VALUES ('delete', old.id, old.title, old.author, old.category, old.caption);
+            INSERT INTO books_fts (rowid, title, author, category, caption)
+            VALUES (new.id, new.title, new.author, new.category, new.caption);
+        END
+    ''')
+    conn.execute("INSERT INTO books_fts (books_fts) VALUES ('rebuild')")
+    conn.execute("INSERT INTO books_fts (books_fts, rank) VALUES ('rank', 'bm25(10.0, 5.0, 2.0, 1.0)')")
+
+
+def _add_search_keys(conn):
+    # Precomputed, Ge'ez-folded search keys, so every spelling of an
+    # Amharic word hits the same FTS entries
+    columns = [col[1] for col in conn.execute("PRAGMA table_info(books)")]
+    for column in ("title_key", "author_key", "category_key", "caption_key"):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE books ADD COLUMN {column} TEXT")
+    rows = conn.execute("SELECT id, title, author, category, caption FROM books").fetchall()
+    conn.executemany('''
+        UPDATE books SET title_key = ?, author_key = ?, category_key = ?, caption_key = ?
+        WHERE id = ?
+    ''', [(normalize_search_text(title), normalize_search_text(author),
+           normalize_search_text(category), normalize_search_text(caption), book_id)
+          for book_id, title, author, category, caption in rows])
+
+    # Re-create the FTS index over the keys instead of the raw columns
+    for trigger in ("books_fts_ai", "books_fts_ad", "books_fts_au"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    conn.execute("DROP TABLE IF EXISTS books_fts")
+    conn.execute('''
+        CREATE VIRTUAL TABLE books_fts USING fts5(
+            title_key, author_key, category_key, caption_key,
+            content='books', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )
+    ''')
+    conn.execute('''
+        CREATE TRIGGER books_fts_ai AFTER INSERT ON books BEGIN
+            INSERT INTO books_fts (rowid, title_key, author_key, category_key, caption_key)
+            VALUES (new.id, new.title_key, new.author_key, new.category_key, new.caption_key);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER books_fts_ad AFTER DELETE ON books BEGIN
+            INSERT INTO books_fts (books_fts, rowid, title_key, author_key, category_key, caption_key)
+            VALUES ('delete', old.id, old.title_key, old.author_key, old.category_key, old.caption_key);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER books_fts_au
+        AFTER UPDATE OF title_key, author_key, category_key, caption_key ON books BEGIN
+            INSERT INTO books_fts (books_fts, rowid, title_key, author_key, category_key, caption_key)
+            VALUES ('delete', old.id, old.title_key, old.author_key, old.category_key, old.caption_key);
+            INSERT INTO books_fts (rowid, title_key, author_key, category_key, caption_key)
+            VALUES (new.id, new.title_key, new.author_key, new.category_key, new.caption_key);
+        END
+    ''')
+    conn.execute("INSERT INTO books_fts (books_fts) VALUES ('rebuild')")
+    conn.execute("INSERT INTO books_fts (books_fts, rank) VALUES ('rank', 'bm25(10.0, 5.0, 2.0, 1.0)')")
+
+
+def _add_meta_table(conn):
+    # Small key/value table; catalog_version is bumped by every writer that
+    # changes the books catalog so caches know when to reload
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('catalog_version', 0)")
+
+
+def _add_facet_tables(conn):
+    # Categories and authors become real rows with stable ids and per-language
+    # book counts. Triggers keep books.category_id/author_id and the counts
+    # in step with every insert, update and delete on books, whichever
+    # script or handler does the write.
+    for table in ("categories", "authors"):
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                id INTEGER PRIMARY KEY,
+                language TEXT NOT NULL,
+                name TEXT NOT NULL,
+                book_count INTEGER NOT NULL DEFAULT 0,
+                UNIQUE (language, name)
+            )
+        ''')
+    columns = [col[1] for col in conn.execute("PRAGMA table_info(books)")]
+    if "category_id" not in columns:
+        conn.execute("ALTER TABLE books ADD COLUMN category_id INTEGER REFERENCES categories (id)")
+    if "author_id" not in columns:
+        conn.execute("ALTER TABLE books ADD COLUMN author_id INTEGER REFERENCES authors (id)")
+
+    # Backfill from the existing text columns
+    for table, column in (("categories", "category"), ("authors", "author")):
+        conn.execute(f'''
+            INSERT OR IGNORE INTO {table} (language, name)
+            SELECT DISTINCT COALESCE(language, 'English'), {column} FROM books
+            WHERE {column} IS NOT NULL AND {column} != ''
+        ''')
+    conn.execute('''
+        UPDATE books SET
+            category_id = (SELECT id FROM categories c
+                           WHERE c.language = COALESCE(books.language, 'English')
+                             AND c.name = books.category),
+            author_id = (SELECT id FROM authors a
+                         WHERE a.language = COALESCE(books.language, 'English')
+                           AND a.name = books.author)
+    ''')
+    conn.execute('''
+        UPDATE categories SET book_count =
+            (SELECT COUNT(*) FROM books WHERE books.category_id = categories.id)
+    ''')
+    conn.execute('''
+        UPDATE authors SET book_count =
+            (SELECT COUNT(*) FROM books WHERE books.author_id = authors.id)
+    ''')
+
+    # A browse tap is one range scan on (facet id, title); the implicit
+    # rowid at the end of each index also orders ties by id
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_books_category_id ON books (category_id, title)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_books_author_id ON books (author_id, title)")
+
+    resolve_facets = '''
+        INSERT OR IGNORE INTO categories (language, name)
+        SELECT COALESCE(new.language, 'English'), new.category
+        WHERE new.category IS NOT NULL AND new.category != '';
+        INSERT OR IGNORE INTO authors (language, name)
+        SELECT COALESCE(new.language, 'English'), new.author
+        WHERE new.author IS NOT NULL AND new.author != '';
+        UPDATE books SET
+            category_id = (SELECT id FROM categories c
+                           WHERE c.language = COALESCE(new.language, 'English')
+                             AND c.name = new.category),
+            author_id = (SELECT id FROM authors a
+                         WHERE a.language = COALESCE(new.language, 'English')
+                           AND a.name = new.author)
+        WHERE id = new.id;
+    '''
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS books_facets_ai AFTER INSERT ON books BEGIN
+            {resolve_facets}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS books_facets_au
+        AFTER UPDATE OF category, author, language ON books BEGIN
+            {resolve_facets}
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS books_facet_counts_au
+        AFTER UPDATE OF category_id, author_id ON books BEGIN
+            UPDATE categories SET book_count = book_count - 1 WHERE id = old.category_id;
+            UPDATE categories SET book_count = book_count + 1 WHERE id = new.category_id;
+            UPDATE authors SET book_count = book_count - 1 WHERE id = old.author_id;
+            UPDATE authors SET book_count = book_count + 1 WHERE id = new.author_id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS books_facet_counts_ad AFTER DELETE ON books BEGIN
+            UPDATE categories SET book_count = book_count - 1 WHERE id = old.category_id;
+            UPDATE authors SET book_count = book_count - 1 WHERE id = old.author_id;
+        END
+    ''')
+
+
+def _add_daily_rollups(conn):
+    # Pre-aggregated analytics so /stats never scans users or events.
+    # daily_stats holds one counter per (UTC day, metric, language);
+    # language is '' for metrics that are not split by language.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS daily_stats (
+            day TEXT NOT NULL,
+            metric TEXT NOT NULL,
+            language TEXT NOT NULL DEFAULT '',
+            value INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, metric, language)
+        ) WITHOUT ROWID
+    ''')
+    # Who was active on which day; only recent days are kept, it exists to
+    # count each user once per day
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS user_activity (
+            day TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            PRIMARY KEY (day, user_id)
+        ) WITHOUT ROWID
+    ''')
+
+    # Backfill from the users table
+    conn.execute('''
+        INSERT OR REPLACE INTO meta (key, value)
+        VALUES ('total_users', (SELECT COUNT(*) FROM users))
+    ''')
+    conn.execute('''
+        INSERT OR REPLACE INTO daily_stats (day, metric, language, value)
+        SELECT substr(joined_at, 1, 10), 'new_users', '', COUNT(*) FROM users
+        WHERE joined_at IS NOT NULL
+        GROUP BY substr(joined_at, 1, 10)
+    ''')
+
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS users_rollup_ai AFTER INSERT ON users BEGIN
+            UPDATE meta SET value = value + 1 WHERE key = 'total_users';
+            INSERT INTO daily_stats (day, metric, language, value)
+            VALUES (substr(COALESCE(new.joined_at, datetime('now')), 1, 10), 'new_users', '', 1)
+            ON CONFLICT (day, metric, language) DO UPDATE SET value = value + 1;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS users_rollup_ad AFTER DELETE ON users BEGIN
+            UPDATE meta SET value = value - 1 WHERE key = 'total_users';
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS user_activity_rollup_ai AFTER INSERT ON user_activity BEGIN
+            INSERT INTO daily_stats (day, metric, language, value)
+            VALUES (new.day, 'active_users', '', 1)
+            ON CONFLICT (day, metric, language) DO UPDATE SET value = value + 1;
+        END
+    ''')
+
+
+def _add_downloads(conn):
+    # Append-only download log; popular_books is recomputed from it
+    # periodically, so the menu never aggregates raw events
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS downloads (
+            id INTEGER PRIMARY KEY,
+            book_id INTEGER NOT NULL,
+            user_id INTEGER,
+            downloaded_at TEXT NOT NULL
+        )
+    ''')
+    # The refresh reads a recent window: a covering range scan
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_downloads_at ON downloads (downloaded_at, book_id)
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS popular_books (
+            language TEXT NOT NULL,
+            rank INTEGER NOT NULL,
+            book_id INTEGER NOT NULL,
+            downloads INTEGER NOT NULL,
+            PRIMARY KEY (language, rank)
+        ) WITHOUT ROWID
+    ''')
+
+
+def _add_dedup_key(conn):
+    # Normalized title (utils.search.dedup_key) with a unique index, so a
+    # duplicate is rejected at insert time. Existing duplicates keep a NULL
+    # key (NULLs do not collide) until remove_duplicates.py deletes them.
+    columns = [col[1] for col in conn.execute("PRAGMA table_info(books)")]
+    if "dedup_key" not in columns:
+        conn.execute("ALTER TABLE books ADD COLUMN dedup_key TEXT")
+    seen = set()
+    updates = []
+    for book_id, title in conn.execute("SELECT id, title FROM books ORDER BY id").fetchall():
+        key = dedup_key(title)
+        if key in seen:
+            key = None
+        elif key:
+            seen.add(key)
+        updates.append((key, book_id))
+    conn.executemany("UPDATE books SET dedup_key = ? WHERE id = ?", updates)
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_books_dedup_key ON books (dedup_key)")
+    # High-water mark of the incremental remove_duplicates pass
+    conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('dedup_last_id', 0)")
+
+
+def _add_bot_persistence(conn):
+    # PTB persistence (bot/persistence.py): each user's user_data as JSON,
+    # read lazily on the user's first update, and the states of persistent
+    # conversations keyed by (handler name, JSON conversation key)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS user_data (
+            user_id INTEGER PRIMARY KEY,
+            data TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS conversations (
+            name TEXT NOT NULL,
+            key TEXT NOT NULL,
+            state TEXT NOT NULL,
+            PRIMARY KEY (name, key)
+        ) WITHOUT ROWID
+    ''')
+
+
+def _add_seen_updates(conn):
+    # update_ids already accepted by some webhook worker (bot/update_dedup.py),
+    # so a redelivery that reaches another process is dropped too. Old ids
+    # are pruned by range on the primary key.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS seen_updates (
+            update_id INTEGER PRIMARY KEY
+        )
+    ''')
+
+
+def _regroup_dedup_key(conn):
+    # dedup_key now covers language and author as well as the title, so
+    # books that only share a title are no longer duplicates. Every row is
+    # re-keyed; the earliest book of each group gets the key, the rest stay
+    # NULL and remove_duplicates.py checks them again from the start.
+    rows = conn.execute("SELECT id, title, author, language FROM books ORDER BY id").fetchall()
+    conn.execute("UPDATE books SET dedup_key = NULL")
+    seen = set()
+    updates = []
+    for book_id, title, author, language in rows:
+        key = dedup_key(title, author, language)
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        updates.append((key, book_id))
+    conn.executemany("UPDATE books SET dedup_key = ? WHERE id = ?", updates)
+    conn.execute("UPDATE meta SET value = 0 WHERE key = 'dedup_last_id'")
+
+
+def _add_search_vocabulary(conn):
+    # Read-only view of every term in books_fts; search words are also
+    # matched inside these terms (utils.search.infix_terms)
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS books_fts_vocab USING fts5vocab(books_fts, 'row')
+    ''')
+
+
+def _add_search_terms(conn):
+    # Every search index term long enough to hold a search word after its
+    # first letter, and an index from each of its grams to the term, so the
+    # terms a search word sits inside are found without scanning them
+    # (db.infix_terms). Writers add the terms of new search keys
+    # (db.add_search_terms); terms of deleted books just match nothing.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS search_terms (
+            id INTEGER PRIMARY KEY,
+            term TEXT NOT NULL UNIQUE
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS search_term_grams (
+            gram TEXT NOT NULL,
+            term_id INTEGER NOT NULL,
+            PRIMARY KEY (gram, term_id)
+        ) WITHOUT ROWID
+    ''')
+    terms = [row[0] for row in conn.execute("SELECT term FROM books_fts_vocab")]
+    for term in terms:
+        if len(term) <= MIN_INFIX_LENGTH:
+            continue
+        cursor = conn.execute("INSERT OR IGNORE INTO search_terms (term) VALUES (?)", (term,))
+        if cursor.rowcount:
+            conn.executemany("INSERT INTO search_term_grams (gram, term_id) VALUES (?, ?)",
+                             [(gram, cursor.lastrowid) for gram in infix_grams(term)])
+    conn.execute("DROP TABLE IF EXISTS books_fts_vocab")
+
+
+MIGRATIONS = [
+    (1, "add books.language column", _add_language_column),
+    (2, "covering indexes for browse, search and user queries", _add_browse_indexes),
+    (3, "FTS5 full-text index over title, author, category and caption", _add_fulltext_search),
+    (4, "Ge'ez-folded search keys for title, author, category and caption", _add_search_keys),
+    (5, "meta table with the catalog version counter", _add_meta_table),
+    (6, "categories/authors facet tables with per-language book counts", _add_facet_tables),
+    (7, "daily analytics rollups and the total_users counter", _add_daily_rollups),
+    (8, "downloads event log and popular_books rankings", _add_downloads),
+    (9, "normalized dedup_key with a unique index", _add_dedup_key),
+    (10, "user_data and conversations tables for bot persistence", _add_bot_persistence),
+    (11, "seen_updates table for webhook redelivery suppression", _add_seen_updates),
+    (12, "dedup_key over language, author and title", _regroup_dedup_key),
+    (13, "fts5vocab table over the search index", _add_search_vocabulary),
+    (14, "search_terms table with a gram index for infix search", _add_search_terms),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def run_migrations(conn):
+    """Apply every migration newer than the database's user_version."""
+    current = get_schema_version(conn)
+    for version, description, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        conn.commit()
+        conn.execute("BEGIN")
+        try:
+            migrate(conn)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logger.exception(f"Migration {version} ({description}) failed")
+            raise
+        conn.execute("ANALYZE")
+        conn.commit()
+        current = version
+        logger.info(f"Applied migration {version}: {description}")
+    return current
@@ -1,13 +1,27 @@
 # database/models.py
-import sqlite3
+import sys
 import os
 
+# Allow running this file directly (python database/models.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.connection import write_transaction
+from database.migrations import run_migrations
+from utils.config import DB_BACKEND
+
 
 def create_tables():
-    base_dir = os.path.dirname(os.path.dirname(__file__))  # Project root
-    db_path = os.path.join(base_dir, 'data', 'books.db')
+    """Create the base tables and bring the schema up to the latest version."""
+    if DB_BACKEND == "postgres":
+        from database.db import pg_backend
+        pg_backend.create_schema()
+        return
+    with write_transaction() as conn:
+        _create_tables(conn)
+        run_migrations(conn)
 
-    conn = sqlite3.connect(db_path)
+
+def _create_tables(conn):
     cursor = conn.cursor()
 
     # Books table
@@ -37,33 +51,16 @@ def create_tables():
         )
     ''')
 
-    conn.commit()
-    conn.close()
-
 
 def migrate_add_language_column():
-    """Add language column to existing books table if it doesn't exist."""
-    base_dir = os.path.dirname(os.path.dirname(__file__))
-    db_path = os.path.join(base_dir, 'data', 'books.db')
-
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    # Check if column exists
-    cursor.execute("PRAGMA table_info(books)")
-    columns = [col[1] for col in cursor.fetchall()]
-
-    if "language" not in columns:
-        cursor.execute("ALTER TABLE books ADD COLUMN language TEXT DEFAULT 'English'")
-        print("✅ Added 'language' column to books table")
-    else:
-        print("ℹ️ 'language' column already exists")
+    """Add language column to existing books table if it doesn't exist.
 
-    conn.commit()
-    conn.close()
+    Kept for older scripts; this is now migration 1 in database/migrations.py.
+    """
+    with write_transaction() as conn:
+        run_migrations(conn)
 
 
 if __name__ == "__main__":
     create_tables()
-    migrate_add_language_column()
-    print("✅ Database initialized with users table and language support")
+    print("✅ Database initialized and migrated to the latest schema version")
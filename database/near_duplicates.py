@@ -0,0 +1,290 @@
+# database/near_duplicates.py
+"""
+Offline near-duplicate detection for the books catalog.
+
+Channels repost the same book under slightly different names
+("Institutes_Vol1.pdf" vs "Calvin - Institutes vol 1.pdf"), which the exact
+dedup key misses. This tool:
+
+1. turns title + author + the start of the caption into normalized text
+   (same folding as search), and hashes its character shingles;
+2. drops shingles that occur in a large share of books (channel
+   boilerplate in captions would otherwise make everything look alike);
+3. builds MinHash signatures with NumPy, one vectorized pass per hash
+   function;
+4. uses LSH banding to find candidate pairs without comparing every pair,
+   keeps those whose estimated Jaccard similarity passes the threshold and
+   joins them into clusters.
+
+Usage (run from the project root):
+    python database/near_duplicates.py [--threshold 0.7] [--report clusters.json]
+    python database/near_duplicates.py --merge clusters.json
+
+The report lists every cluster with the book that would be kept (the
+oldest) and its near-duplicates. Review it, delete any cluster you do not
+want merged from the JSON file, then apply it with --merge.
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.connection import get_read_conn, require_sqlite, write_transaction
+from database.db import bump_catalog_version
+from database.snapshot import build_snapshot
+from utils.search import normalize_search_text, strip_file_extension, tokenize
+
+try:
+    import numpy as np
+except ImportError:  # only this offline tool needs it
+    np = None
+
+SHINGLE_SIZE = 5
+NUM_PERM = 64
+BANDS = 16                 # 16 bands x 4 rows: candidates from ~0.5 similarity up
+THRESHOLD = 0.7            # estimated Jaccard similarity to call a pair duplicates
+CAPTION_CHARS = 200        # only the start of a caption describes the book
+MAX_SHINGLE_SHARE = 0.01   # drop shingles found in more than 1% of books...
+MIN_SHINGLE_DF = 50        # ...but never ones found in fewer books than this
+MAX_BUCKET = 100           # ignore LSH buckets this large (degenerate texts)
+SEED = 1961
+
+_PRIME = np.uint64(1000003) if np else None
+_IGNORED_AUTHORS = {"unknown"}
+
+
+def _require_numpy():
+    if np is None:
+        sys.exit("near_duplicates.py needs NumPy: pip install numpy")
+
+
+def book_text(title, author, caption):
+    """Normalized text a book is compared on."""
+    parts = [strip_file_extension(title or "")]
+    if author and author.lower() not in _IGNORED_AUTHORS:
+        parts.append(author)
+    if caption:
+        parts.append(caption[:CAPTION_CHARS])
+    return " ".join(tokenize(normalize_search_text(" ".join(parts))))
+
+
+# -------------------------------
+# MinHash
+# -------------------------------
+def _shingle_hashes(texts, k=SHINGLE_SIZE):
+    """
+    (doc index, 32-bit shingle hash) for every distinct shingle of every
+    text, sorted by doc. Computed over all texts at once: the texts are
+    concatenated as code points and a polynomial hash is rolled over every
+    window that does not cross a document boundary.
+    """
+    texts = [t.ljust(k) if t else "" for t in texts]
+    lengths = np.fromiter((len(t) for t in texts), dtype=np.int64, count=len(texts))
+    codes = np.frombuffer("".join(texts).encode("utf-32-le"), dtype=np.uint32)
+    doc_starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+
+    counts = np.maximum(lengths - k + 1, 0)
+    docs = np.repeat(np.arange(len(texts), dtype=np.uint64), counts)
+    first = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    starts = np.repeat(doc_starts, counts) + (np.arange(counts.sum()) - np.repeat(first, counts))
+
+    hashes = np.zeros(len(starts), dtype=np.uint64)
+    for offset in range(k):
+        hashes = hashes * _PRIME + codes[starts + offset].astype(np.uint64)
+    # Mix and keep 32 bits so (doc, hash) packs into one uint64
+    hashes = (hashes * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(32)
+
+    # sort + neighbour compare: much faster than np.unique on a flat uint64 array
+    packed = np.sort((docs << np.uint64(32)) | hashes)
+    packed = packed[np.concatenate(([True], packed[1:] != packed[:-1]))]
+    return packed >> np.uint64(32), packed & np.uint64(0xFFFFFFFF)
+
+
+def minhash_signatures(texts, num_perm=NUM_PERM, seed=SEED):
+    """
+    (len(texts), num_perm) uint32 MinHash signatures. Rows of texts with no
+    usable shingles are all 0xFFFFFFFF; the second return value marks the
+    rows that have a real signature.
+    """
+    docs, hashes = _shingle_hashes(texts)
+
+    # Drop boilerplate shingles shared by a large share of the catalog
+    _, inverse, df = np.unique(hashes, return_inverse=True, return_counts=True)
+    max_df = max(MIN_SHINGLE_DF, int(len(texts) * MAX_SHINGLE_SHARE))
+    keep = df[inverse] <= max_df
+    docs, hashes = docs[keep], hashes[keep]
+
+    signatures = np.full((len(texts), num_perm), 0xFFFFFFFF, dtype=np.uint32)
+    has_signature = np.zeros(len(texts), dtype=bool)
+    if len(docs) == 0:
+        return signatures, has_signature
+    run_starts = np.flatnonzero(np.concatenate(([True], docs[1:] != docs[:-1])))
+    present = docs[run_starts].astype(np.int64)
+    has_signature[present] = True
+
+    # Multiply-shift hash family: h_i(x) = (a_i * x + b_i) >> 32
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2**63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+    for i in range(num_perm):
+        permuted = ((a[i] * hashes + b[i]) >> np.uint64(32)).astype(np.uint32)
+        signatures[present, i] = np.minimum.reduceat(permuted, run_starts)
+    return signatures, has_signature
+
+
+# -------------------------------
+# LSH and clustering
+# -------------------------------
+def candidate_pairs(signatures, has_signature, bands=BANDS):
+    """Index pairs (i < j) that share at least one LSH band bucket."""
+    n, num_perm = signatures.shape
+    rows = num_perm // bands
+    valid = np.flatnonzero(has_signature)
+    pairs = []
+    for band in range(bands):
+        block = signatures[valid, band * rows:(band + 1) * rows].astype(np.uint64)
+        keys = np.zeros(len(valid), dtype=np.uint64)
+        for column in block.T:
+            keys = keys * np.uint64(0x100000001B3) + column
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        new_run = np.concatenate(([True], sorted_keys[1:] != sorted_keys[:-1]))
+        run_ids = np.cumsum(new_run) - 1
+        run_starts = np.flatnonzero(new_run)
+        run_sizes = np.diff(np.append(run_starts, len(order)))
+        # Pair every bucket member with the bucket's first member
+        leader = order[run_starts[run_ids]]
+        size = run_sizes[run_ids]
+        mask = ~new_run & (size <= MAX_BUCKET)
+        i, j = valid[leader[mask]], valid[order[mask]]
+        pairs.append(np.stack([np.minimum(i, j), np.maximum(i, j)], axis=1))
+    if not pairs:
+        return np.empty((0, 2), dtype=np.int64)
+    return np.unique(np.concatenate(pairs), axis=0)
+
+
+def similarity(signatures, i, j):
+    """Estimated Jaccard similarity of rows i and j (arrays or ints)."""
+    return (signatures[i] == signatures[j]).mean(axis=-1)
+
+
+def find_clusters(texts, threshold=THRESHOLD, num_perm=NUM_PERM, bands=BANDS):
+    """
+    Near-duplicate clusters (sorted lists of indices into `texts`, each of
+    size >= 2), plus the MinHash signatures used to find them.
+    """
+    _require_numpy()
+    signatures, has_signature = minhash_signatures(texts, num_perm)
+    pairs = candidate_pairs(signatures, has_signature, bands)
+    if len(pairs):
+        pairs = pairs[similarity(signatures, pairs[:, 0], pairs[:, 1]) >= threshold]
+
+    parent = {}
+
+    def find(x):
+        root = x
+        while parent.get(root, root) != root:
+            root = parent[root]
+        while parent.get(x, x) != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    nodes = set()
+    for i, j in pairs.tolist():
+        nodes.update((i, j))
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    clusters = {}
+    for x in nodes:
+        clusters.setdefault(find(x), []).append(x)
+    return [sorted(members) for members in clusters.values()], signatures
+
+
+# -------------------------------
+# Report / merge
+# -------------------------------
+def build_report(threshold=THRESHOLD):
+    rows = get_read_conn().execute(
+        "SELECT id, title, author, caption, language FROM books ORDER BY id").fetchall()
+    texts = [book_text(title, author, caption) for _, title, author, caption, _ in rows]
+    clusters, signatures = find_clusters(texts, threshold)
+
+    report = []
+    for members in sorted(clusters):
+        keep = members[0]    # rows are in id order, so this is the oldest book
+        report.append({
+            "keep": {"id": rows[keep][0], "title": rows[keep][1], "author": rows[keep][2],
+                     "language": rows[keep][4]},
+            "duplicates": [
+                {"id": rows[m][0], "title": rows[m][1], "author": rows[m][2],
+                 "language": rows[m][4],
+                 "similarity": round(float(similarity(signatures, keep, m)), 2)}
+                for m in members[1:]
+            ],
+        })
+    return report
+
+
+def print_report(report):
+    for number, cluster in enumerate(report, 1):
+        keep = cluster["keep"]
+        print(f"\n[{number}] keep #{keep['id']}: {keep['title']} ({keep['author']}, {keep['language']})")
+        for dup in cluster["duplicates"]:
+            print(f"      #{dup['id']}: {dup['title']} ({dup['author']}) ~{dup['similarity']:.2f}")
+    total = sum(len(c["duplicates"]) for c in report)
+    print(f"\n🔎 {len(report)} clusters, {total} near-duplicate books.")
+
+
+def merge(report):
+    """Delete each cluster's duplicates, moving their downloads to the kept book."""
+    deleted = 0
+    with write_transaction() as conn:
+        for cluster in report:
+            keep_id = cluster["keep"]["id"]
+            if not conn.execute("SELECT 1 FROM books WHERE id = ?", (keep_id,)).fetchone():
+                print(f"⚠️ Book #{keep_id} no longer exists; skipping its cluster.")
+                continue
+            for dup in cluster["duplicates"]:
+                conn.execute("UPDATE downloads SET book_id = ? WHERE book_id = ?", (keep_id, dup["id"]))
+                deleted += conn.execute("DELETE FROM books WHERE id = ?", (dup["id"],)).rowcount
+        if deleted:
+            bump_catalog_version(conn)
+    print(f"✅ Merged {len(report)} clusters, deleted {deleted} near-duplicate books.")
+    if deleted:
+        stats = build_snapshot()
+        print(f"🗂 Rebuilt catalog snapshot ({stats['books']} books)")
+    return deleted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find (and optionally merge) near-duplicate books.")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="estimated Jaccard similarity needed to cluster two books")
+    parser.add_argument("--report", help="write the clusters to this JSON file for review")
+    parser.add_argument("--merge", metavar="REPORT", help="apply a reviewed JSON report")
+    args = parser.parse_args()
+    require_sqlite("near_duplicates.py")
+
+    from database.models import create_tables
+    create_tables()
+
+    if args.merge:
+        with open(args.merge, encoding="utf-8") as f:
+            merge(json.load(f))
+        return
+
+    _require_numpy()
+    report = build_report(args.threshold)
+    print_report(report)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"📝 Report written to {args.report}; review it, then run with --merge {args.report}")
+
+
+if __name__ == "__main__":
+    main()
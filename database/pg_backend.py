@@ -0,0 +1,941 @@
+# database/pg_backend.py
+"""
+PostgreSQL storage backend (DB_BACKEND=postgres, see utils/config.py).
+
+SQLite allows one writer at a time, so several webhook workers plus a
+scraper end up queueing on its write lock. This module implements every
+function of database/db.py and database/analytics.py that runs SQL against
+a shared PostgreSQL database instead. Those modules swap these in when the
+backend is selected, so callers keep importing from database.db and
+database.analytics.
+
+* Connections come from a psycopg2 ThreadedConnectionPool. A caller waits
+  for a free connection instead of failing when all of them are in use.
+* The schema mirrors the SQLite migrations: the same tables and indexes,
+  with facet rows, book counts and analytics counters kept by triggers.
+* Full-text search uses a generated, weighted tsvector over the folded
+  search keys (GIN index), matched as word prefixes and ranked with
+  ts_rank using the same title > author > category > caption weights as
+  bm25 in SQLite.
+* Typo-tolerant search uses pg_trgm word similarity on title and author
+  keys (GIN trigram indexes) when the extension can be installed.
+  Otherwise database/fuzzy.py keeps using its in-memory index.
+
+Set up an empty database and copy the SQLite catalog into it with:
+    python database/pg_backend.py --import-sqlite data/books.db
+"""
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psycopg2
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
+
+from database.cache import catalog_cache
+from database.db import BULK_CHUNK_SIZE, PAGE_SIZE, SEARCH_RESULT_LIMIT, Page, _finish_page, search_keys
+from utils.config import DATABASE_URL, PG_POOL_MAX, PG_POOL_MIN
+from utils.search import build_tsquery, dedup_key, normalize_search_text, tokenize
+
+logger = logging.getLogger(__name__)
+
+# ts_rank weights for the {D, C, B, A} labels: caption, category, author, title
+RANK_WEIGHTS = "{0.1, 0.2, 0.5, 1.0}"
+FUZZY_MIN_WORD_LENGTH = 3
+
+_pool = None
+_pool_lock = threading.Lock()
+_pool_slots = threading.BoundedSemaphore(PG_POOL_MAX)
+_has_trigram = None
+
+
+# -------------------------------
+# Connection pool
+# -------------------------------
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadedConnectionPool(PG_POOL_MIN, PG_POOL_MAX, DATABASE_URL)
+    return _pool
+
+
+@contextmanager
+def _connection():
+    """Borrow a pooled connection, waiting while all PG_POOL_MAX are in use."""
+    with _pool_slots:
+        pool = _get_pool()
+        conn = pool.getconn()
+        try:
+            yield conn
+        finally:
+            pool.putconn(conn, close=bool(conn.closed))
+
+
+@contextmanager
+def transaction():
+    """Cursor whose statements commit together (rolled back if the block raises)."""
+    with _connection() as conn:
+        try:
+            with conn.cursor() as cursor:
+                yield cursor
+            conn.commit()
+        except BaseException:
+            if not conn.closed:
+                conn.rollback()
+            raise
+
+
+def _fetchall(sql, params=()):
+    with transaction() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _fetchone(sql, params=()):
+    with transaction() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchone()
+
+
+def close_pool():
+    """Close every pooled connection (e.g. at shutdown)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+
+# Pools inherited through a fork. Their sockets are the parent's: closing
+# (or garbage-collecting) them here would end the parent's sessions.
+_inherited_pools = []
+
+
+def _after_fork():
+    global _pool, _pool_lock, _pool_slots
+    if _pool is not None:
+        _inherited_pools.append(_pool)
+    _pool = None
+    _pool_lock = threading.Lock()
+    _pool_slots = threading.BoundedSemaphore(PG_POOL_MAX)
+
+
+os.register_at_fork(after_in_child=_after_fork)
+
+
+# -------------------------------
+# Schema
+# -------------------------------
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value BIGINT NOT NULL DEFAULT 0
+);
+INSERT INTO meta (key, value)
+VALUES ('catalog_version', 0), ('total_users', 0), ('dedup_last_id', 0)
+ON CONFLICT (key) DO NOTHING;
+
+CREATE TABLE IF NOT EXISTS categories (
+    id SERIAL PRIMARY KEY,
+    language TEXT NOT NULL,
+    name TEXT NOT NULL,
+    book_count INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (language, name)
+);
+CREATE TABLE IF NOT EXISTS authors (
+    id SERIAL PRIMARY KEY,
+    language TEXT NOT NULL,
+    name TEXT NOT NULL,
+    book_count INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (language, name)
+);
+
+CREATE TABLE IF NOT EXISTS books (
+    id SERIAL PRIMARY KEY,
+    title TEXT,
+    caption TEXT,
+    author TEXT,
+    category TEXT,
+    tags TEXT,
+    mime_type TEXT,
+    file_id TEXT,
+    file_path TEXT,
+    date TEXT,
+    language TEXT DEFAULT 'English',
+    title_key TEXT,
+    author_key TEXT,
+    category_key TEXT,
+    caption_key TEXT,
+    dedup_key TEXT,
+    category_id INTEGER REFERENCES categories (id),
+    author_id INTEGER REFERENCES authors (id),
+    search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', COALESCE(title_key, '')), 'A') ||
+        setweight(to_tsvector('simple', COALESCE(author_key, '')), 'B') ||
+        setweight(to_tsvector('simple', COALESCE(category_key, '')), 'C') ||
+        setweight(to_tsvector('simple', COALESCE(caption_key, '')), 'D')
+    ) STORED
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_books_dedup_key ON books (dedup_key);
+CREATE INDEX IF NOT EXISTS idx_books_search ON books USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS idx_books_lang_category ON books (language, category, title);
+CREATE INDEX IF NOT EXISTS idx_books_lang_author ON books (language, author, title);
+CREATE INDEX IF NOT EXISTS idx_books_category_id ON books (category_id, title, id);
+CREATE INDEX IF NOT EXISTS idx_books_author_id ON books (author_id, title, id);
+CREATE INDEX IF NOT EXISTS idx_books_file_id ON books (file_id);
+
+CREATE TABLE IF NOT EXISTS users (
+    user_id BIGINT PRIMARY KEY,
+    username TEXT,
+    first_name TEXT,
+    joined_at TEXT DEFAULT to_char(now() AT TIME ZONE 'UTC', 'YYYY-MM-DD"T"HH24:MI:SS')
+);
+
+CREATE TABLE IF NOT EXISTS daily_stats (
+    day TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    language TEXT NOT NULL DEFAULT '',
+    value BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, metric, language)
+);
+CREATE TABLE IF NOT EXISTS user_activity (
+    day TEXT NOT NULL,
+    user_id BIGINT NOT NULL,
+    PRIMARY KEY (day, user_id)
+);
+
+CREATE TABLE IF NOT EXISTS downloads (
+    id BIGSERIAL PRIMARY KEY,
+    book_id INTEGER NOT NULL,
+    user_id BIGINT,
+    downloaded_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_downloads_at ON downloads (downloaded_at, book_id);
+CREATE TABLE IF NOT EXISTS popular_books (
+    language TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    book_id INTEGER NOT NULL,
+    downloads INTEGER NOT NULL,
+    PRIMARY KEY (language, rank)
+);
+
+CREATE TABLE IF NOT EXISTS user_data (
+    user_id BIGINT PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS conversations (
+    name TEXT NOT NULL,
+    key TEXT NOT NULL,
+    state TEXT NOT NULL,
+    PRIMARY KEY (name, key)
+);
+CREATE TABLE IF NOT EXISTS seen_updates (
+    update_id BIGINT PRIMARY KEY
+);
+-- Search terms longer than utils.search.MIN_INFIX_LENGTH, for infix
+-- lookups (infix_terms); filled from each row's search vector
+CREATE TABLE IF NOT EXISTS search_terms (
+    term TEXT PRIMARY KEY
+);
+
+-- Facet rows and ids are resolved before a book row is written
+CREATE OR REPLACE FUNCTION books_resolve_facets() RETURNS trigger AS $$
+DECLARE
+    lang TEXT := COALESCE(NEW.language, 'English');
+BEGIN
+    NEW.category_id := NULL;
+    IF NEW.category IS NOT NULL AND NEW.category <> '' THEN
+        INSERT INTO categories (language, name) VALUES (lang, NEW.category)
+        ON CONFLICT (language, name) DO NOTHING;
+        SELECT id INTO NEW.category_id FROM categories
+        WHERE language = lang AND name = NEW.category;
+    END IF;
+    NEW.author_id := NULL;
+    IF NEW.author IS NOT NULL AND NEW.author <> '' THEN
+        INSERT INTO authors (language, name) VALUES (lang, NEW.author)
+        ON CONFLICT (language, name) DO NOTHING;
+        SELECT id INTO NEW.author_id FROM authors
+        WHERE language = lang AND name = NEW.author;
+    END IF;
+    RETURN NEW;
+END $$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS books_facets_bi ON books;
+CREATE TRIGGER books_facets_bi BEFORE INSERT ON books
+    FOR EACH ROW EXECUTE FUNCTION books_resolve_facets();
+DROP TRIGGER IF EXISTS books_facets_bu ON books;
+CREATE TRIGGER books_facets_bu BEFORE UPDATE OF category, author, language ON books
+    FOR EACH ROW EXECUTE FUNCTION books_resolve_facets();
+
+CREATE OR REPLACE FUNCTION books_facet_counts() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE categories SET book_count = book_count - 1 WHERE id = OLD.category_id;
+        UPDATE authors SET book_count = book_count - 1 WHERE id = OLD.author_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE categories SET book_count = book_count + 1 WHERE id = NEW.category_id;
+        UPDATE authors SET book_count = book_count + 1 WHERE id = NEW.author_id;
+    END IF;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS books_facet_counts_ai ON books;
+CREATE TRIGGER books_facet_counts_ai AFTER INSERT ON books
+    FOR EACH ROW EXECUTE FUNCTION books_facet_counts();
+DROP TRIGGER IF EXISTS books_facet_counts_au ON books;
+CREATE TRIGGER books_facet_counts_au AFTER UPDATE ON books
+    FOR EACH ROW
+    WHEN (OLD.category_id IS DISTINCT FROM NEW.category_id
+          OR OLD.author_id IS DISTINCT FROM NEW.author_id)
+    EXECUTE FUNCTION books_facet_counts();
+DROP TRIGGER IF EXISTS books_facet_counts_ad ON books;
+CREATE TRIGGER books_facet_counts_ad AFTER DELETE ON books
+    FOR EACH ROW EXECUTE FUNCTION books_facet_counts();
+
+CREATE OR REPLACE FUNCTION books_search_terms() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO search_terms (term)
+    SELECT lexeme FROM unnest(tsvector_to_array(NEW.search_vector)) AS lexeme
+    WHERE length(lexeme) > 2
+    ON CONFLICT DO NOTHING;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS books_search_terms_aiu ON books;
+CREATE TRIGGER books_search_terms_aiu
+    AFTER INSERT OR UPDATE OF title_key, author_key, category_key, caption_key ON books
+    FOR EACH ROW EXECUTE FUNCTION books_search_terms();
+
+-- Databases created before search_terms existed
+INSERT INTO search_terms (term)
+SELECT DISTINCT lexeme FROM books, unnest(tsvector_to_array(search_vector)) AS lexeme
+WHERE length(lexeme) > 2 AND NOT EXISTS (SELECT 1 FROM search_terms)
+ON CONFLICT DO NOTHING;
+
+-- total_users and the per-day new_users / active_users counters
+CREATE OR REPLACE FUNCTION users_rollup() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        UPDATE meta SET value = value - 1 WHERE key = 'total_users';
+        RETURN NULL;
+    END IF;
+    UPDATE meta SET value = value + 1 WHERE key = 'total_users';
+    INSERT INTO daily_stats (day, metric, language, value)
+    VALUES (substr(COALESCE(NEW.joined_at, to_char(now() AT TIME ZONE 'UTC', 'YYYY-MM-DD')), 1, 10),
+            'new_users', '', 1)
+    ON CONFLICT (day, metric, language) DO UPDATE SET value = daily_stats.value + 1;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS users_rollup_aid ON users;
+CREATE TRIGGER users_rollup_aid AFTER INSERT OR DELETE ON users
+    FOR EACH ROW EXECUTE FUNCTION users_rollup();
+
+CREATE OR REPLACE FUNCTION user_activity_rollup() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO daily_stats (day, metric, language, value)
+    VALUES (NEW.day, 'active_users', '', 1)
+    ON CONFLICT (day, metric, language) DO UPDATE SET value = daily_stats.value + 1;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS user_activity_rollup_ai ON user_activity;
+CREATE TRIGGER user_activity_rollup_ai AFTER INSERT ON user_activity
+    FOR EACH ROW EXECUTE FUNCTION user_activity_rollup();
+'''
+
+TRIGRAM_INDEXES = '''
+CREATE INDEX IF NOT EXISTS idx_books_title_trgm ON books USING GIN (title_key gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_books_author_trgm ON books USING GIN (author_key gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_search_terms_trgm ON search_terms USING GIN (term gin_trgm_ops);
+'''
+
+
+def create_schema():
+    """Create (or bring up to date) every table, index and trigger. Idempotent."""
+    global _has_trigram
+    try:
+        with transaction() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    except psycopg2.Error as e:
+        logger.warning(f"pg_trgm unavailable, fuzzy search stays in memory: {e}")
+    with transaction() as cursor:
+        cursor.execute(SCHEMA)
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        _has_trigram = cursor.fetchone() is not None
+        if _has_trigram:
+            cursor.execute(TRIGRAM_INDEXES)
+
+
+def has_trigram_search():
+    """True if pg_trgm is installed, so fuzzy search can run in the database."""
+    global _has_trigram
+    if _has_trigram is None:
+        _has_trigram = _fetchone("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'") is not None
+    return _has_trigram
+
+
+def get_catalog_version():
+    row = _fetchone("SELECT value FROM meta WHERE key = 'catalog_version'")
+    return row[0] if row else 0
+
+
+def bump_catalog_version(cursor):
+    cursor.execute("UPDATE meta SET value = value + 1 WHERE key = 'catalog_version'")
+
+
+# -------------------------------
+# Book Operations
+# -------------------------------
+_INSERT_BOOK = '''
+    INSERT INTO books (title, caption, author, category, tags, mime_type,
+                       file_id, file_path, date, language,
+                       title_key, author_key, category_key, caption_key, dedup_key)
+    VALUES %s
+    ON CONFLICT DO NOTHING
+    RETURNING id
+'''
+
+
+def _book_row(book):
+    title, caption = book["title"], book.get("caption")
+    author, category = book.get("author"), book.get("category")
+    language = book.get("language", "English")
+    return (title, caption, author, category, book.get("tags"), book.get("mime_type"),
+            book.get("file_id"), book.get("file_path"), book.get("date"), language,
+            *search_keys(title, author, category, caption), dedup_key(title, author, language))
+
+
+def insert_book(title, caption, author=None, category=None, tags=None,
+                mime_type=None, file_id=None, file_path=None, date=None,
+                language='English'):
+    """Insert one book; returns its id, or None if its dedup key is taken."""
+    row = _book_row(dict(title=title, caption=caption, author=author, category=category,
+                         tags=tags, mime_type=mime_type, file_id=file_id, file_path=file_path,
+                         date=date, language=language))
+    with transaction() as cursor:
+        inserted = execute_values(cursor, _INSERT_BOOK, [row], fetch=True)
+        if not inserted:
+            return None
+        bump_catalog_version(cursor)
+    catalog_cache.invalidate()
+    return inserted[0][0]
+
+
+def insert_books_bulk(books, chunk_size=BULK_CHUNK_SIZE):
+    """Insert many books (dicts of insert_book's arguments) in one transaction."""
+    if not books:
+        return 0
+    rows = [_book_row(book) for book in books]
+    with transaction() as cursor:
+        inserted = len(execute_values(cursor, _INSERT_BOOK, rows,
+                                      page_size=chunk_size, fetch=True))
+        if inserted:
+            bump_catalog_version(cursor)
+    if inserted:
+        catalog_cache.invalidate()
+    return inserted
+
+
+def _existing_values(column, values):
+    values = list({v for v in values if v})
+    if not values:
+        return set()
+    rows = _fetchall(f"SELECT {column} FROM books WHERE {column} = ANY(%s)", (values,))
+    return {row[0] for row in rows}
+
+
+def book_exists(title, file_id=None, author=None, language='English'):
+    """True if a book with the same dedup key (or `file_id`) is stored."""
+    key = dedup_key(title, author, language)
+    if file_id:
+        row = _fetchone("SELECT 1 FROM books WHERE dedup_key = %s OR file_id = %s",
+                        (key, file_id))
+    else:
+        row = _fetchone("SELECT 1 FROM books WHERE dedup_key = %s", (key,))
+    return row is not None
+
+
+# -------------------------------
+# Language-aware Queries
+# -------------------------------
+def get_categories_by_language(language):
+    rows = _fetchall('SELECT name FROM categories WHERE language = %s AND book_count > 0 '
+                     'ORDER BY name ASC', (language,))
+    return [r[0] for r in rows if r[0]]
+
+
+def get_authors_by_language(language):
+    rows = _fetchall('SELECT name FROM authors WHERE language = %s AND book_count > 0 '
+                     'ORDER BY name ASC', (language,))
+    return [r[0] for r in rows if r[0]]
+
+
+def get_books_by_category_and_language(category, language):
+    return _fetchall('SELECT id, title, author, file_id FROM books '
+                     'WHERE category = %s AND language = %s ORDER BY title ASC',
+                     (category, language))
+
+
+def get_books_by_author_and_language(author, language):
+    return _fetchall('SELECT id, title, author, file_id FROM books '
+                     'WHERE author = %s AND language = %s ORDER BY title ASC',
+                     (author, language))
+
+
+def _search_sql(language, anchor, direction):
+    """Ranked tsvector matches as (id, title, author, rank); lower rank is better."""
+    sql = f'''
+        SELECT id, title, author, rank FROM (
+            SELECT b.id, b.title, b.author,
+                   (-ts_rank('{RANK_WEIGHTS}', b.search_vector, q))::float8 AS rank
+            FROM books b, to_tsquery('simple', %s) q
+            WHERE b.search_vector @@ q {"AND b.language = %s" if language else ""}
+        ) hits
+    '''
+    if anchor is not None:
+        sql += f" WHERE (rank, id) {'>' if direction == 'n' else '<'} (%s, %s)"
+    sort = "ASC" if direction == "n" else "DESC"
+    return sql + f" ORDER BY rank {sort}, id {sort} LIMIT %s"
+
+
+def infix_terms(token):
+    """
+    Every search term containing `token` after its first letter; the
+    pg_trgm index, when installed, serves words of three or more letters.
+    """
+    rows = _fetchall("SELECT term FROM search_terms WHERE term LIKE %s", (f"%{token}%",))
+    # Only plain words can go into a tsquery unquoted (no "e-mail" compounds)
+    return [term for (term,) in rows
+            if not term.startswith(token) and tokenize(term) == [term]]
+
+
+def search_books_fts(keyword, language=None, limit=SEARCH_RESULT_LIMIT):
+    """Full-text search; (id, title, author) rows, best first."""
+    query = build_tsquery(keyword, infix_terms)
+    if not query:
+        return []
+    params = [query] + ([language] if language else []) + [limit]
+    return [row[:3] for row in _fetchall(_search_sql(language, None, "n"), params)]
+
+
+def search_books_page(keyword, language=None, direction="n", anchor=None,
+                      page_size=PAGE_SIZE):
+    """One page of (id, title, author, rank) matches, keyset-paginated on (rank, id)."""
+    query = build_tsquery(keyword, infix_terms)
+    if not query:
+        return Page([], False, False)
+    params = [query] + ([language] if language else [])
+    if anchor is not None:
+        params.extend(anchor)
+    params.append(page_size + 1)
+    rows = _fetchall(_search_sql(language, anchor, direction), params)
+    return _finish_page(rows, direction, anchor is not None, page_size)
+
+
+# -------------------------------
+# Keyset pagination
+# -------------------------------
+def _keyset_page(table, columns, where, params, order, anchor_id=None,
+                 direction="n", page_size=PAGE_SIZE):
+    """db.keyset_page with %s placeholders in `where`."""
+    cmp, sort = (">", "ASC") if direction == "n" else ("<", "DESC")
+    sql = f"SELECT {columns} FROM {table} WHERE {where}"
+    args = list(params)
+    if anchor_id is not None:
+        sql += f" AND ({order}, id) {cmp} (SELECT {order}, id FROM {table} WHERE id = %s)"
+        args.append(anchor_id)
+    sql += f" ORDER BY {order} {sort}, id {sort} LIMIT %s"
+    args.append(page_size + 1)
+    return _finish_page(_fetchall(sql, args), direction, anchor_id is not None, page_size)
+
+
+def categories_page(language, direction="n", anchor=None):
+    return _keyset_page("categories", "id, name, book_count",
+                        "language = %s AND book_count > 0", (language,),
+                        "name", anchor, direction)
+
+
+def authors_page(language, direction="n", anchor=None):
+    return _keyset_page("authors", "id, name, book_count",
+                        "language = %s AND book_count > 0", (language,),
+                        "name", anchor, direction)
+
+
+def books_by_category_page(category_id, direction="n", anchor=None):
+    return _keyset_page("books", "id, title, author, file_id",
+                        "category_id = %s", (category_id,),
+                        "title", anchor, direction)
+
+
+def books_by_author_page(author_id, direction="n", anchor=None):
+    return _keyset_page("books", "id, title, author, file_id",
+                        "author_id = %s", (author_id,),
+                        "title", anchor, direction)
+
+
+def get_book_by_id(book_id):
+    return _fetchone("SELECT title, file_id FROM books WHERE id = %s", (book_id,))
+
+
+def get_book_facet_ids(book_id):
+    return _fetchone("SELECT category_id, author_id FROM books WHERE id = %s", (book_id,))
+
+
+def get_category_by_id(category_id):
+    return _fetchone("SELECT name, language FROM categories WHERE id = %s", (category_id,))
+
+
+def get_author_by_id(author_id):
+    return _fetchone("SELECT name, language FROM authors WHERE id = %s", (author_id,))
+
+
+def get_books_since(last_id):
+    return _fetchall("SELECT id, title, author, language FROM books WHERE id > %s ORDER BY id",
+                     (last_id,))
+
+
+def get_books_by_ids(book_ids):
+    return _fetchall("SELECT id, title, author FROM books WHERE id = ANY(%s)",
+                     (list(book_ids),))
+
+
+def fuzzy_search_books(keyword, language=None, limit=10):
+    """
+    pg_trgm version of fuzzy.fuzzy_search_books: books scored by the summed
+    best word similarity of each query word to their title or author key.
+    """
+    words = [w for w in tokenize(normalize_search_text(keyword))
+             if len(w) >= FUZZY_MIN_WORD_LENGTH]
+    if not words:
+        return []
+    sql = '''
+        SELECT id, title, author FROM (
+            SELECT b.id, b.title, b.author,
+                   SUM(GREATEST(word_similarity(w, b.title_key),
+                                CASE WHEN b.author_key <> 'unknown'
+                                     THEN word_similarity(w, b.author_key) ELSE 0 END)) AS score
+            FROM unnest(%s::text[]) AS w
+            JOIN books b ON w <%% b.title_key OR (b.author_key <> 'unknown' AND w <%% b.author_key)
+    '''
+    params = [words]
+    if language:
+        sql += " WHERE b.language = %s"
+        params.append(language)
+    sql += '''
+            GROUP BY b.id, b.title, b.author
+        ) scored
+        ORDER BY score DESC, id
+        LIMIT %s
+    '''
+    params.append(limit)
+    return _fetchall(sql, params)
+
+
+def export_catalog():
+    """db.export_catalog: the whole catalog from one consistent snapshot."""
+    with transaction() as cursor:
+        cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+        cursor.execute("SELECT value FROM meta WHERE key = 'catalog_version'")
+        version = cursor.fetchone()[0]
+        cursor.execute('''
+            SELECT id, title, author, file_id, COALESCE(language, 'English'), category_id,
+                   author_id
+            FROM books ORDER BY id
+        ''')
+        books = cursor.fetchall()
+        cursor.execute("SELECT id, language, name, book_count FROM categories")
+        categories = cursor.fetchall()
+        cursor.execute("SELECT id, language, name, book_count FROM authors")
+        authors = cursor.fetchall()
+    return {"catalog_version": version, "books": books,
+            "categories": categories, "authors": authors}
+
+
+# -------------------------------
+# Legacy queries (backward compatible)
+# -------------------------------
+def get_all_books():
+    rows = _fetchall('SELECT id, title, caption, author, category, tags, mime_type, '
+                     'file_id, file_path, date FROM books')
+    return [
+        {"id": r[0], "title": r[1], "caption": r[2], "author": r[3],
+         "category": r[4], "tags": r[5], "mime_type": r[6], "file_id": r[7],
+         "file_path": r[8], "date": r[9]}
+        for r in rows
+    ]
+
+
+def get_all_categories():
+    rows = _fetchall('SELECT DISTINCT category FROM books ORDER BY category ASC')
+    return [r[0] for r in rows if r[0]]
+
+
+def get_all_authors():
+    rows = _fetchall('SELECT DISTINCT author FROM books ORDER BY author ASC')
+    return [r[0] for r in rows if r[0]]
+
+
+# -------------------------------
+# User Tracking
+# -------------------------------
+def record_user(user_id, username=None, first_name=None):
+    record_users_bulk([(user_id, username, first_name, datetime.utcnow().isoformat())])
+
+
+def record_users_bulk(users):
+    """Insert many (user_id, username, first_name, joined_at) rows in one transaction."""
+    with transaction() as cursor:
+        execute_values(cursor, '''
+            INSERT INTO users (user_id, username, first_name, joined_at) VALUES %s
+            ON CONFLICT (user_id) DO NOTHING
+        ''', list(users))
+
+
+def get_monthly_user_count():
+    month_start = datetime.utcnow().date().replace(day=1).isoformat()
+    return _fetchone("SELECT COALESCE(SUM(value), 0)::bigint FROM daily_stats "
+                     "WHERE metric = 'new_users' AND day >= %s", (month_start,))[0]
+
+
+def get_total_user_count():
+    row = _fetchone("SELECT value FROM meta WHERE key = 'total_users'")
+    return row[0] if row else 0
+
+
+def get_all_users():
+    return [row[0] for row in _fetchall("SELECT user_id FROM users")]
+
+
+# -------------------------------
+# Bot persistence (see bot/persistence.py)
+# -------------------------------
+def load_user_data(user_id):
+    row = _fetchone("SELECT data FROM user_data WHERE user_id = %s", (user_id,))
+    return row[0] if row else None
+
+
+def save_user_data_bulk(rows):
+    now = datetime.utcnow().isoformat()
+    deleted = [user_id for user_id, data in rows if data is None]
+    saved = [(user_id, data, now) for user_id, data in rows if data is not None]
+    with transaction() as cursor:
+        if deleted:
+            cursor.execute("DELETE FROM user_data WHERE user_id = ANY(%s)", (deleted,))
+        if saved:
+            execute_values(cursor, '''
+                INSERT INTO user_data (user_id, data, updated_at) VALUES %s
+                ON CONFLICT (user_id) DO UPDATE SET data = excluded.data,
+                                                    updated_at = excluded.updated_at
+            ''', saved)
+
+
+def load_conversations(name):
+    return _fetchall("SELECT key, state FROM conversations WHERE name = %s", (name,))
+
+
+def save_conversations_bulk(rows):
+    ended = [(name, key) for name, key, state in rows if state is None]
+    saved = [row for row in rows if row[2] is not None]
+    with transaction() as cursor:
+        if ended:
+            execute_values(cursor, '''
+                DELETE FROM conversations c USING (VALUES %s) AS ended (name, key)
+                WHERE c.name = ended.name AND c.key = ended.key
+            ''', ended)
+        if saved:
+            execute_values(cursor, '''
+                INSERT INTO conversations (name, key, state) VALUES %s
+                ON CONFLICT (name, key) DO UPDATE SET state = excluded.state
+            ''', saved)
+
+
+# -------------------------------
+# Webhook redelivery suppression (see bot/update_dedup.py)
+# -------------------------------
+def claim_update(update_id, keep):
+    with transaction() as cursor:
+        cursor.execute("INSERT INTO seen_updates (update_id) VALUES (%s) ON CONFLICT DO NOTHING",
+                       (update_id,))
+        claimed = cursor.rowcount == 1
+        cursor.execute("DELETE FROM seen_updates WHERE update_id < %s", (update_id - keep,))
+    return claimed
+
+
+def release_update(update_id):
+    with transaction() as cursor:
+        cursor.execute("DELETE FROM seen_updates WHERE update_id = %s", (update_id,))
+
+
+# -------------------------------
+# Analytics (see database/analytics.py)
+# -------------------------------
+def record_activity_bulk(rows):
+    # analytics imports this module while it loads, so import from it lazily
+    from database.analytics import ACTIVITY_RETENTION_DAYS
+    active = list({(row[1], row[2]) for row in rows if row[0] == "active"})
+    events = Counter(row[1:] for row in rows if row[0] == "event")
+    cutoff = (datetime.utcnow().date() - timedelta(days=ACTIVITY_RETENTION_DAYS)).isoformat()
+    with transaction() as cursor:
+        if active:
+            execute_values(cursor, '''
+                INSERT INTO user_activity (day, user_id) VALUES %s ON CONFLICT DO NOTHING
+            ''', active)
+        if events:
+            execute_values(cursor, '''
+                INSERT INTO daily_stats (day, metric, language, value) VALUES %s
+                ON CONFLICT (day, metric, language)
+                DO UPDATE SET value = daily_stats.value + excluded.value
+            ''', [(day, metric, language, count)
+                  for (day, metric, language), count in events.items()])
+        cursor.execute("DELETE FROM user_activity WHERE day < %s", (cutoff,))
+
+
+def insert_downloads(rows):
+    with transaction() as cursor:
+        execute_values(cursor, "INSERT INTO downloads (book_id, user_id, downloaded_at) VALUES %s",
+                       list(rows))
+
+
+def rank_popular_books(since, top):
+    with transaction() as cursor:
+        cursor.execute("DELETE FROM popular_books")
+        cursor.execute('''
+            INSERT INTO popular_books (language, rank, book_id, downloads)
+            SELECT language, rank, book_id, downloads FROM (
+                SELECT COALESCE(b.language, 'English') AS language,
+                       d.book_id AS book_id,
+                       COUNT(*) AS downloads,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY COALESCE(b.language, 'English')
+                           ORDER BY COUNT(*) DESC, d.book_id
+                       ) AS rank
+                FROM downloads d JOIN books b ON b.id = d.book_id
+                WHERE d.downloaded_at >= %s
+                GROUP BY d.book_id, b.language
+            ) ranked WHERE rank <= %s
+        ''', (since, top))
+
+
+def read_popular_books(language):
+    return _fetchall('''
+        SELECT p.book_id, b.title, b.author, p.downloads
+        FROM popular_books p JOIN books b ON b.id = p.book_id
+        WHERE p.language = %s
+        ORDER BY p.rank
+    ''', (language,))
+
+
+def metric_total(metric, since, language=None):
+    sql = "SELECT COALESCE(SUM(value), 0)::bigint FROM daily_stats WHERE metric = %s AND day >= %s"
+    params = [metric, since]
+    if language is not None:
+        sql += " AND language = %s"
+        params.append(language)
+    return _fetchone(sql, params)[0]
+
+
+def metric_by_language(metric, since):
+    return dict(_fetchall('''
+        SELECT language, SUM(value)::bigint FROM daily_stats
+        WHERE metric = %s AND day >= %s
+        GROUP BY language ORDER BY language
+    ''', (metric, since)))
+
+
+def metric_by_day(metric, since):
+    return dict(_fetchall('''
+        SELECT day, SUM(value)::bigint FROM daily_stats
+        WHERE metric = %s AND day >= %s
+        GROUP BY day
+    ''', (metric, since)))
+
+
+# -------------------------------
+# Copy an existing SQLite database
+# -------------------------------
+def import_sqlite(path):
+    """
+    Copy books (keeping their ids), users, daily counters, downloads and
+    saved user_data from a SQLite database file, at any schema version;
+    search and dedup keys are recomputed.
+    """
+    source = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    tables = {row[0] for row in source.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    columns = ("id", "title", "caption", "author", "category", "tags", "mime_type",
+               "file_id", "file_path", "date", "language")
+    books = [(row[0], *_book_row(dict(zip(columns[1:], row[1:]))))
+             for row in source.execute(f"SELECT {', '.join(columns)} FROM books ORDER BY id")]
+    users = source.execute("SELECT user_id, username, first_name, joined_at FROM users").fetchall()
+    stats = downloads = []
+    if "daily_stats" in tables:
+        stats = source.execute("SELECT day, metric, language, value FROM daily_stats").fetchall()
+    if "downloads" in tables:
+        downloads = source.execute("SELECT book_id, user_id, downloaded_at FROM downloads").fetchall()
+    user_data = []
+    if "user_data" in tables:
+        user_data = source.execute("SELECT user_id, data, updated_at FROM user_data").fetchall()
+    source.close()
+
+    with transaction() as cursor:
+        execute_values(cursor, '''
+            INSERT INTO books (id, title, caption, author, category, tags, mime_type, file_id,
+                               file_path, date, language, title_key, author_key,
+                               category_key, caption_key, dedup_key)
+            VALUES %s ON CONFLICT DO NOTHING
+        ''', books, page_size=BULK_CHUNK_SIZE)
+        cursor.execute("SELECT setval(pg_get_serial_sequence('books', 'id'), "
+                       "COALESCE((SELECT MAX(id) FROM books), 1))")
+        if users:
+            execute_values(cursor, '''
+                INSERT INTO users (user_id, username, first_name, joined_at) VALUES %s
+                ON CONFLICT (user_id) DO NOTHING
+            ''', users, page_size=BULK_CHUNK_SIZE)
+        if stats:
+            # Overwrites the new_users counts the users trigger just produced
+            # (with the same figures) and brings over every other metric
+            execute_values(cursor, '''
+                INSERT INTO daily_stats (day, metric, language, value) VALUES %s
+                ON CONFLICT (day, metric, language) DO UPDATE SET value = excluded.value
+            ''', stats, page_size=BULK_CHUNK_SIZE)
+        if downloads:
+            execute_values(cursor, "INSERT INTO downloads (book_id, user_id, downloaded_at) VALUES %s",
+                           downloads, page_size=BULK_CHUNK_SIZE)
+        if user_data:
+            execute_values(cursor, '''
+                INSERT INTO user_data (user_id, data, updated_at) VALUES %s
+                ON CONFLICT (user_id) DO NOTHING
+            ''', user_data, page_size=BULK_CHUNK_SIZE)
+        bump_catalog_version(cursor)
+    print(f"✅ Imported {len(books)} books, {len(users)} users, {len(stats)} daily counters, "
+          f"{len(downloads)} downloads and {len(user_data)} users' settings from {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Set up the PostgreSQL backend (DATABASE_URL).")
+    parser.add_argument("--import-sqlite", metavar="PATH",
+                        help="copy an existing SQLite database into PostgreSQL")
+    args = parser.parse_args()
+    create_schema()
+    print(f"✅ PostgreSQL schema ready (pg_trgm fuzzy search: {'on' if has_trigram_search() else 'off'})")
+    if args.import_sqlite:
+        import_sqlite(args.import_sqlite)
+        from database.snapshot import build_snapshot
+        stats = build_snapshot()
+        print(f"🗂 Rebuilt catalog snapshot ({stats['books']} books)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,51 +1,84 @@
 # database/remove_duplicates.py
-import sqlite3
+"""
+Incremental duplicate cleanup.
+
+New books are de-duplicated at insert time by the unique index on
+books.dedup_key (see utils.search.dedup_key). This pass only looks at rows
+added since its last run (meta.dedup_last_id) that still have no key: rows
+that were already duplicates when the index was introduced, or rows written
+by tools that bypass insert_book. Each one either gets its key or, if the
+key is taken by an earlier book, is deleted. A key is the normalized
+(language, author, title), so only copies of the same book by the same
+author in the same language are removed; books that merely share a title
+are kept.
+
+Usage: python database/remove_duplicates.py [--dry-run]
+"""
+import sys
 import os
 
-BASE_DIR = os.path.dirname(os.path.dirname(__file__))
-DB_PATH = os.path.join(BASE_DIR, 'data', 'books.db')
-
-def remove_duplicates():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    # Find duplicates based on exact same title, author, and language
-    # We will keep the one with the lowest ID (the first one added)
-    
-    query = """
-    DELETE FROM books
-    WHERE rowid NOT IN (
-        SELECT MIN(rowid)
-        FROM books
-        GROUP BY title, author, language
-    )
-    """
-    
-    # Let's see how many there are first
-    cursor.execute("""
-        SELECT title, author, COUNT(*) 
-        FROM books 
-        WHERE language = 'Amharic'
-        GROUP BY title, author 
-        HAVING COUNT(*) > 1
-    """)
-    duplicates = cursor.fetchall()
-    
-    duplicate_count = sum([count - 1 for _, _, count in duplicates])
-    
-    if duplicate_count > 0:
-        print(f"Found {duplicate_count} duplicate Amharic books!")
-        for title, author, count in duplicates:
-            print(f" - {title} by {author} ({count} copies)")
-            
-        # Delete them
-        cursor.execute(query)
-        conn.commit()
-        print(f"\n✅ Successfully deleted {duplicate_count} duplicate records.")
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.connection import require_sqlite, write_transaction
+from database.db import bump_catalog_version
+from database.snapshot import build_snapshot
+from utils.search import dedup_key
+
+
+def remove_duplicates(dry_run=False):
+    with write_transaction() as conn:
+        last_id = conn.execute(
+            "SELECT value FROM meta WHERE key = 'dedup_last_id'").fetchone()[0]
+        rows = conn.execute(
+            "SELECT id, title, author, language, dedup_key FROM books WHERE id > ? ORDER BY id",
+            (last_id,)).fetchall()
+        if not rows:
+            print("No books added since the last run.")
+            return 0
+
+        claimed = {}     # keys assigned during this pass (matters for --dry-run)
+        duplicates = []
+        for book_id, title, author, language, key in rows:
+            if key:
+                continue
+            key = dedup_key(title, author, language)
+            if not key:
+                continue
+            original = claimed.get(key) or conn.execute(
+                "SELECT id, title FROM books WHERE dedup_key = ?", (key,)).fetchone()
+            if original:
+                duplicates.append(book_id)
+                print(f" - {title} by {author} [{language}] "
+                      f"(duplicate of #{original[0]}: {original[1]})")
+                continue
+            claimed[key] = (book_id, title)
+            if not dry_run:
+                conn.execute("UPDATE books SET dedup_key = ? WHERE id = ?", (key, book_id))
+
+        if dry_run:
+            conn.rollback()
+            print(f"\n🔎 Dry run: {len(duplicates)} duplicate records would be deleted "
+                  f"({len(rows)} new rows checked).")
+            return len(duplicates)
+
+        conn.executemany("DELETE FROM books WHERE id = ?", [(d,) for d in duplicates])
+        conn.execute("UPDATE meta SET value = ? WHERE key = 'dedup_last_id'", (rows[-1][0],))
+        if duplicates:
+            bump_catalog_version(conn)
+
+    if duplicates:
+        print(f"\n✅ Successfully deleted {len(duplicates)} duplicate records "
+              f"({len(rows)} new rows checked).")
+        stats = build_snapshot()
+        print(f"🗂 Rebuilt catalog snapshot ({stats['books']} books)")
     else:
-        print("No duplicates found based on exact Title + Author match.")
-        
-    conn.close()
+        print(f"No duplicates found among {len(rows)} new rows.")
+    return len(duplicates)
+
 
 if __name__ == "__main__":
-    remove_duplicates()
+    require_sqlite("remove_duplicates.py")
+    from database.models import create_tables
+    create_tables()
+    remove_duplicates(dry_run="--dry-run" in sys.argv[1:])
@@ -0,0 +1,170 @@
+# database/writer.py
+"""
+Write-behind buffers for high-volume, low-value writes.
+
+Handlers put rows on a WriteBehindQueue and return immediately; a
+background thread writes them in one transaction per batch, either every
+`interval` seconds or as soon as `max_batch` rows are waiting. Queues are
+drained at interpreter exit (and from the Application's post_shutdown),
+so a clean shutdown loses nothing.
+
+The trade-off is that a crash can lose up to `interval` seconds of
+buffered rows, so only use this for data where that is acceptable
+(user first-seen records, analytics events), never for the catalog.
+
+A forked child starts with empty buffers: the rows it inherits are the
+parent's to write.
+"""
+import atexit
+import logging
+import os
+import threading
+from datetime import datetime
+
+from database.db import record_users_bulk
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL_SECONDS = 2.0
+FLUSH_BATCH_SIZE = 200
+MAX_BUFFERED_ROWS = 50000     # beyond this a failing writer starts dropping rows
+SEEN_USERS_MAX = 200000       # forget the seen-user set when it grows past this
+
+_queues = []
+
+
+class WriteBehindQueue:
+    def __init__(self, name, flush_fn, interval=FLUSH_INTERVAL_SECONDS,
+                 max_batch=FLUSH_BATCH_SIZE, max_buffered=MAX_BUFFERED_ROWS):
+        self.name = name
+        self.interval = interval
+        self.max_batch = max_batch
+        self.max_buffered = max_buffered
+        self._flush_fn = flush_fn      # called with a list of rows, on a writer thread
+        self._rows = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._closed = False
+        self.flushed = 0
+        self.dropped = 0
+        self.batches = 0
+        _queues.append(self)
+
+    def put(self, row):
+        """Buffer one row; never touches the database."""
+        with self._lock:
+            if len(self._rows) >= self.max_buffered:
+                self.dropped += 1
+                return
+            self._rows.append(row)
+            full = len(self._rows) >= self.max_batch
+        self._ensure_thread()
+        if full:
+            self._wake.set()
+
+    def _ensure_thread(self):
+        # Also restarts the thread in a forked child, where it does not exist
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._closed or (self._thread is not None and self._thread.is_alive()):
+                    return
+                self._thread = threading.Thread(
+                    target=self._run, name=f"write-behind-{self.name}", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Write everything buffered so far. Returns the number of rows written."""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+            if not rows:
+                return 0
+            try:
+                self._flush_fn(rows)
+            except Exception:
+                logger.exception(f"Write-behind flush of {len(rows)} {self.name} rows failed")
+                # Keep them for the next attempt rather than losing them
+                with self._lock:
+                    keep = max(0, self.max_buffered - len(self._rows))
+                    self.dropped += max(0, len(rows) - keep)
+                    self._rows[:0] = rows[:keep]
+                return 0
+            self.flushed += len(rows)
+            self.batches += 1
+            return len(rows)
+
+    def close(self):
+        """Stop the background thread and write what is left."""
+        self._closed = True
+        self._wake.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=5)
+        self.flush()
+
+    def _after_fork(self):
+        self._rows = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._rows)
+        return {"pending": pending, "flushed": self.flushed,
+                "batches": self.batches, "dropped": self.dropped}
+
+
+def flush_all():
+    """Drain every write-behind queue (e.g. at shutdown)."""
+    for queue in _queues:
+        queue.flush()
+
+
+def close_all():
+    for queue in _queues:
+        queue.close()
+
+
+def _after_fork():
+    for queue in _queues:
+        queue._after_fork()
+
+
+atexit.register(close_all)
+os.register_at_fork(after_in_child=_after_fork)
+
+
+# -------------------------------
+# Users
+# -------------------------------
+user_writer = WriteBehindQueue("users", record_users_bulk)
+_seen_users = set()
+_seen_lock = threading.Lock()
+
+
+def queue_user(user_id, username=None, first_name=None):
+    """
+    Record a user on first visit without waiting for a commit.
+
+    Users already seen by this process are skipped entirely; new ones are
+    buffered and inserted (INSERT OR IGNORE) in the next batch.
+    Returns True if the user was queued.
+    """
+    with _seen_lock:
+        if user_id in _seen_users:
+            return False
+        if len(_seen_users) >= SEEN_USERS_MAX:
+            _seen_users.clear()
+        _seen_users.add(user_id)
+    # joined_at is the time of the visit, not of the flush
+    user_writer.put((user_id, username, first_name, datetime.utcnow().isoformat()))
+    return True
@@ -0,0 +1,53 @@
+# gunicorn.conf.py
+"""
+Gunicorn settings for running the Flask webhook (bot/webhook_app.py),
+optionally as several worker processes:
+
+    gunicorn -c gunicorn.conf.py bot.webhook_app:app                      # one worker
+    WEB_CONCURRENCY=4 gunicorn -c gunicorn.conf.py bot.webhook_app:app   # four
+
+The master imports the app once and forks the workers from it. Each worker
+then builds its own event loop, Telegram Application and database
+connections (the module-level fork handlers reset the inherited ones), and
+starts them right after the fork (post_fork below). Telegram spreads its
+deliveries over the workers, so:
+
+- updates are only deduplicated across workers with the shared record
+  (WEBHOOK_DEDUP_SHARED, switched on here unless set);
+- updates from one chat are no longer handled in order: each worker only
+  orders the chats it sees itself (bot/update_queue.py), and gunicorn
+  cannot route a chat to one worker, so a second tap can be handled by
+  another worker while the first is still running. This is why one
+  worker is the default;
+- a user's language change reaches the other workers within a few
+  seconds: it is written sooner, and the others re-read it sooner, than
+  with one process (PERSISTENCE_UPDATE_SECONDS and USER_DATA_RELOAD_SECONDS,
+  lowered here unless set; see bot/persistence.py).
+
+WEB_CONCURRENCY sets the number of workers (default 1), WEBHOOK_THREADS the requests
+each one accepts at once. WEBHOOK_HOST / WEBHOOK_PORT set the address.
+"""
+import os
+
+os.environ.setdefault("WEBHOOK_DEDUP_SHARED", "1")
+os.environ.setdefault("PERSISTENCE_UPDATE_SECONDS", "1")
+os.environ.setdefault("USER_DATA_RELOAD_SECONDS", "2")
+# Warm up in the workers, not in the master (which never serves requests)
+_warm_up_workers = os.getenv("WEBHOOK_WARMUP", "1").strip().lower() in ("1", "true", "yes")
+os.environ["WEBHOOK_WARMUP"] = "0"
+
+bind = f"{os.getenv('WEBHOOK_HOST', '0.0.0.0')}:{os.getenv('WEBHOOK_PORT', '8080')}"
+# More workers trade the per-chat ordering for throughput (see above)
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+# A request only waits until its update is queued, but a few threads keep
+# one slow accept from holding up the others
+worker_class = "gthread"
+threads = int(os.getenv("WEBHOOK_THREADS", "4"))
+# Import once in the master; the workers share its memory until they write
+preload_app = True
+
+
+def post_fork(server, worker):
+    if _warm_up_workers:
+        from bot import webhook_app
+        webhook_app.start_warm_up()
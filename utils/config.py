@@ -0,0 +1,52 @@
+# utils/config.py
+"""
+Deployment settings read from the environment (or .env).
+
+DB_BACKEND selects where the catalog, users and analytics live:
+
+* "sqlite"   - data/books.db (or BOOKS_DB_PATH); the default
+* "postgres" - the database at DATABASE_URL, through a connection pool of
+               PG_POOL_MIN..PG_POOL_MAX connections per process
+
+The async webhook server (bot/async_webhook_app.py) listens on
+WEBHOOK_HOST:WEBHOOK_PORT. Both webhook apps queue incoming updates (at
+most WEBHOOK_QUEUE_SIZE waiting) and process at most WEBHOOK_CONCURRENCY
+at once per process. They drop redelivered updates: the last
+WEBHOOK_DEDUP_SIZE update_ids are remembered per process, and with
+WEBHOOK_DEDUP_SHARED=1 also in the database, across processes. With
+WEBHOOK_FAST_PATH=1 menu and book button presses skip PTB's update parsing
+and handler dispatch (bot/fast_path.py). With WEBHOOK_REPLY_IN_RESPONSE=1
+the Flask webhook waits up to WEBHOOK_REPLY_TIMEOUT seconds for an update's
+first reply and returns it as the response (bot/webhook_reply.py). It
+starts the Telegram Application as soon as it is imported unless
+WEBHOOK_WARMUP=0.
+
+TELEGRAM_API_BASE_URL points the bot at another Bot API server, e.g. a
+self-hosted one or a local fake for tests.
+"""
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DB_BACKEND = os.getenv("DB_BACKEND", "sqlite").strip().lower()
+DATABASE_URL = os.getenv("DATABASE_URL", "postgresql:///books")
+PG_POOL_MIN = int(os.getenv("PG_POOL_MIN", "1"))
+PG_POOL_MAX = int(os.getenv("PG_POOL_MAX", "10"))
+
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_CONCURRENCY = int(os.getenv("WEBHOOK_CONCURRENCY", "32"))
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))
+WEBHOOK_DEDUP_SIZE = int(os.getenv("WEBHOOK_DEDUP_SIZE", "10000"))
+WEBHOOK_DEDUP_SHARED = os.getenv("WEBHOOK_DEDUP_SHARED", "0").strip().lower() in ("1", "true", "yes")
+WEBHOOK_FAST_PATH = os.getenv("WEBHOOK_FAST_PATH", "0").strip().lower() in ("1", "true", "yes")
+WEBHOOK_REPLY_IN_RESPONSE = os.getenv("WEBHOOK_REPLY_IN_RESPONSE", "0").strip().lower() in ("1", "true", "yes")
+WEBHOOK_REPLY_TIMEOUT = float(os.getenv("WEBHOOK_REPLY_TIMEOUT", "0.5"))
+WEBHOOK_WARMUP = os.getenv("WEBHOOK_WARMUP", "1").strip().lower() in ("1", "true", "yes")
+
+TELEGRAM_API_BASE_URL = os.getenv("TELEGRAM_API_BASE_URL", "https://api.telegram.org").rstrip("/")
+
+if DB_BACKEND not in ("sqlite", "postgres"):
+    raise ValueError(f"Unknown DB_BACKEND {DB_BACKEND!r} (expected 'sqlite' or 'postgres')")
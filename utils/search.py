@@ -0,0 +1,214 @@
+# utils/search.py
+"""
+Text helpers for book search: turning what a user typed into an FTS5 query,
+folding Ge'ez (Amharic) spelling variants to one canonical form, and a
+trigram index for typo-tolerant matching.
+"""
+import heapq
+import re
+import time
+import unicodedata
+
+# Same word boundaries as the FTS5 unicode61 tokenizer (underscore separates)
+_TOKEN_RE = re.compile(r"[^\W_]+", re.UNICODE)
+_FILE_EXTENSION_RE = re.compile(r"\.(pdf|epub|docx?|mobi)\s*$", re.IGNORECASE)
+
+MIN_INFIX_LENGTH = 2      # shortest word looked up inside longer terms (gram length)
+
+
+# -------------------------------
+# Ge'ez homophone folding
+# -------------------------------
+# Amharic writes several sounds with more than one letter family. Users
+# (and channel captions) mix them freely, e.g. ጸሐፊ / ፀሐፊ / ጸሀፊ. Each
+# family below is folded onto the first one, order by order (ä, u, i, a,
+# e, ə, o), so all spellings share one search key.
+_GEEZ_FAMILIES = [
+    (0x1210, 0x1200),  # ሐ -> ሀ
+    (0x1280, 0x1200),  # ኀ -> ሀ
+    (0x1220, 0x1230),  # ሠ -> ሰ
+    (0x12D0, 0x12A0),  # ዐ -> አ
+    (0x1340, 0x1338),  # ፀ -> ጸ
+]
+
+
+def _build_geez_fold_table():
+    table = {}
+    for src, dst in _GEEZ_FAMILIES:
+        for order in range(7):
+            table[src + order] = dst + order
+    table[0x1227] = 0x1237  # ሧ -> ሷ
+    # The 1st and 4th orders of the laryngeals are used interchangeably
+    # (ሀ/ሃ, አ/ኣ), so fold the 4th order onto the 1st as well
+    for base in (0x1200, 0x12A0):
+        table[base + 3] = base
+    for src, dst in table.items():
+        if dst in (0x1203, 0x12A3):
+            table[src] = dst - 3
+    return table
+
+
+_GEEZ_FOLD_TABLE = _build_geez_fold_table()
+
+
+def fold_geez(text):
+    """Fold Ge'ez homophone letters to one canonical spelling."""
+    if not text:
+        return text
+    return text.translate(_GEEZ_FOLD_TABLE)
+
+
+def normalize_search_text(text):
+    """Canonical form used for the precomputed search keys and for queries."""
+    if not text:
+        return ""
+    return fold_geez(unicodedata.normalize("NFC", text).casefold())
+
+
+def tokenize(text):
+    """Split free text into lower-cased word tokens."""
+    if not text:
+        return []
+    return [t.lower() for t in _TOKEN_RE.findall(text)]
+
+
+def strip_file_extension(title):
+    """Drop a trailing .pdf/.epub/.doc(x)/.mobi from a file-name title."""
+    return _FILE_EXTENSION_RE.sub("", title) if title else title
+
+
+def dedup_key(title, author=None, language="English"):
+    """
+    Normalized (language, author, title) used to detect duplicate books.
+
+    Extension, case, punctuation, underscores and runs of whitespace are
+    ignored and Ge'ez spellings are folded, so "Christ_Crucified.pdf" and
+    "christ crucified.epub", or መጽሐፍ and መፅሐፍ, share one key as long as
+    the author and language match. Books that only share a title (two
+    "Systematic Theology"s, an English and an Amharic "Bible") do not.
+    Returns None for titles with no words.
+    """
+    title_words = " ".join(tokenize(normalize_search_text(strip_file_extension(title))))
+    if not title_words:
+        return None
+    author_words = " ".join(tokenize(normalize_search_text(author)))
+    return f"{normalize_search_text(language or 'English')}|{author_words}|{title_words}"
+
+
+def infix_grams(text, start=1):
+    """
+    The MIN_INFIX_LENGTH-letter substrings of `text` from `start` on. A term
+    is indexed under its grams after the first letter; a search word found
+    inside it has all of its own grams (start=0) among them.
+    """
+    n = MIN_INFIX_LENGTH
+    return {text[i:i + n] for i in range(start, len(text) - n + 1)}
+
+
+def build_match_query(keyword, infix_terms=None):
+    """
+    Build an FTS5 MATCH expression from a user's search text.
+
+    Every word must match (AND) and each is treated as a prefix, so
+    "spurg calv" finds "Spurgeon" and "Calvin". Amharic attaches particles
+    to the front of a word (የጸሐፊው is "of the writer"), so each word also
+    matches every indexed term `infix_terms(word)` finds it inside (see
+    db.infix_terms). Tokens are quoted, so FTS5 operators typed by the
+    user (AND, NEAR, *, ...) are just words. The index holds folded search
+    keys, so the query is folded the same way. Returns None when the text
+    has no searchable words.
+    """
+    tokens = tokenize(normalize_search_text(keyword))
+    if not tokens:
+        return None
+    words = []
+    for t in tokens:
+        inside = infix_terms(t) if infix_terms and len(t) >= MIN_INFIX_LENGTH else []
+        alternatives = [f'"{t}"*'] + [f'"{term}"' for term in inside]
+        words.append(f"({' OR '.join(alternatives)})" if len(alternatives) > 1 else alternatives[0])
+    return " AND ".join(words)
+
+
+def build_tsquery(keyword, infix_terms=None):
+    """
+    The PostgreSQL equivalent of build_match_query: a to_tsquery() string
+    with every folded word as an AND-ed prefix ("spurg:* & calv:*"), or'ed
+    with the `infix_terms(word)` it appears inside. Tokens are word
+    characters only, so nothing typed can act as a tsquery operator.
+    Returns None when the text has no searchable words.
+    """
+    tokens = tokenize(normalize_search_text(keyword))
+    if not tokens:
+        return None
+    words = []
+    for t in tokens:
+        inside = infix_terms(t) if infix_terms and len(t) >= MIN_INFIX_LENGTH else []
+        alternatives = [f"{t}:*"] + inside
+        words.append(f"({' | '.join(alternatives)})" if len(alternatives) > 1 else alternatives[0])
+    return " & ".join(words)
+
+
+# -------------------------------
+# Typo-tolerant word matching
+# -------------------------------
+def trigrams(word):
+    """Padded character trigrams of one word (pg_trgm style)."""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """
+    Inverted index from character trigrams to vocabulary words.
+
+    Looking up a misspelled word only touches the posting lists of its own
+    trigrams, so the cost depends on how many words share those trigrams,
+    not on the size of the vocabulary. Similarity is the Jaccard overlap of
+    the two trigram sets ("spurgon" vs "spurgeon" = 0.55).
+    """
+
+    def __init__(self):
+        self._words = []         # word id -> word
+        self._gram_counts = []   # word id -> number of trigrams
+        self._payloads = []      # word id -> set of payloads (e.g. book ids)
+        self._word_ids = {}      # word -> word id
+        self._postings = {}      # trigram -> list of word ids
+
+    def __len__(self):
+        return len(self._words)
+
+    def add(self, word, payload):
+        word_id = self._word_ids.get(word)
+        if word_id is None:
+            word_id = self._word_ids[word] = len(self._words)
+            grams = trigrams(word)
+            self._words.append(word)
+            self._gram_counts.append(len(grams))
+            self._payloads.append(set())
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(word_id)
+        self._payloads[word_id].add(payload)
+
+    def lookup(self, word, limit=5, min_similarity=0.3, deadline=None):
+        """
+        Return up to `limit` (similarity, word, payloads) best matches.
+
+        Rare trigrams are scanned first; if `deadline` (a time.perf_counter()
+        value) passes, the best matches found so far are returned.
+        """
+        grams = trigrams(word)
+        postings = sorted((self._postings.get(g, ()) for g in grams), key=len)
+        hits = {}
+        for posting in postings:
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+            for word_id in posting:
+                hits[word_id] = hits.get(word_id, 0) + 1
+
+        scored = []
+        for word_id, shared in hits.items():
+            similarity = shared / (len(grams) + self._gram_counts[word_id] - shared)
+            if similarity >= min_similarity:
+                scored.append((similarity, word_id))
+        best = heapq.nlargest(limit, scored)
+        return [(sim, self._words[i], self._payloads[i]) for sim, i in best]